@@ -0,0 +1,153 @@
+import sys
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.recommendation.services_alchemy import update_alerts_status
+from agent.bg_running.notification_client import NotificationClient, notification_client
+
+logger = logging.getLogger(__name__)
+
+# Messages handed to the notification client per batch (FCM's own batch limit is 500)
+FCM_BATCH_SIZE = min(int(os.environ.get("FCM_BATCH_SIZE", "500")), 500)
+ALERT_DISPATCH_WORKERS = int(os.environ.get("ALERT_DISPATCH_WORKERS", "4"))
+FCM_MAX_RETRIES = int(os.environ.get("FCM_MAX_RETRIES", "3"))
+FCM_RETRY_BACKOFF = float(os.environ.get("FCM_RETRY_BACKOFF", "1.0"))  # seconds, doubled per attempt
+
+
+def build_alert_message(alert: Dict, token: str) -> Dict:
+    """Build the FCM message for one alert and device token"""
+    return NotificationClient.build_message(
+        token,
+        alert['title'],
+        alert['message'],
+        data={
+            'user_id': alert['user_id'],
+            'alert_id': alert['alert_id'],
+            'title': alert['title'],
+            'message': alert['message']
+        }
+    )
+
+
+class AlertDispatcher:
+    """Sends due alerts to every device of their user with batched FCM sends.
+
+    Messages are chunked into batches of up to FCM_BATCH_SIZE sent over the shared notification client,
+    batches run on a bounded thread pool, transient per-token failures are retried with exponential backoff, and alert statuses
+    are written with one bulk update per batch.
+
+    Every alert ends up sent, failed (FCM rejected all its devices) or skipped_no_device (its user has no
+    registered device), except those of batches FCM could not be reached for: they stay pending and are
+    returned as deferred, for the caller to retry later.
+    """
+
+    def __init__(self, client: NotificationClient = None, max_workers: int = ALERT_DISPATCH_WORKERS,
+                 batch_size: int = FCM_BATCH_SIZE, max_retries: int = FCM_MAX_RETRIES, retry_backoff: float = FCM_RETRY_BACKOFF):
+        self.client = client or notification_client
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alert-dispatch")
+        self.invalid_tokens = set()
+
+    def dispatch(self, alerts: List[Dict], tokens_by_user: Dict[str, List[str]]) -> Dict:
+        """Send alerts and update their status.
+
+        Returns sent/failed/skipped counts and deferred, the IDs of the alerts left pending.
+        """
+        # Pack whole alerts into batches (never splitting one alert's devices) so each batch owns its statuses
+        batches: List[List[Tuple[Dict, str]]] = []
+        current: List[Tuple[Dict, str]] = []
+        skipped_ids = []
+        for alert in alerts:
+            user_tokens = tokens_by_user.get(str(alert['user_id'])) or []
+            if not user_tokens:
+                logger.warning(f"⚠️ No FCM token found for user {alert['user_id']}")
+                skipped_ids.append(alert['alert_id'])
+                continue
+            alert_deliveries = [(alert, token) for token in user_tokens[:self.batch_size]]
+            if current and len(current) + len(alert_deliveries) > self.batch_size:
+                batches.append(current)
+                current = []
+            current.extend(alert_deliveries)
+        if current:
+            batches.append(current)
+
+        if skipped_ids:
+            update_alerts_status(skipped_ids, 'skipped_no_device')
+        results = list(self.executor.map(self._send_batch, batches))
+
+        summary = {
+            "sent": sum(result["sent"] for result in results),
+            "failed": sum(result["failed"] for result in results),
+            "skipped": len(skipped_ids),
+            "deferred": [alert_id for result in results for alert_id in result["deferred"]]
+        }
+        logger.info(f"📨 Dispatched {len(alerts)} alerts in {len(batches)} batches: {summary}")
+        return summary
+
+    def _send_batch(self, deliveries: List[Tuple[Dict, str]]) -> Dict:
+        """Send one batch, retrying transient per-token failures, then bulk-update alert statuses"""
+        delivered_alerts = set()
+        pending = deliveries
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Exponential backoff with jitter before retrying the transient failures
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+
+            try:
+                results = self.client.send_each([build_alert_message(alert, token) for alert, token in pending])
+            except Exception as e:
+                # Client could not be initialised (e.g. missing credentials) or FCM is unreachable: alerts already
+                # delivered are recorded, the rest stay pending and are deferred to the caller
+                logger.error(f"❌ FCM batch send failed: {e}")
+                sent_ids = sorted(delivered_alerts)
+                if sent_ids:
+                    update_alerts_status(sent_ids, 'sent')
+                deferred = sorted({alert['alert_id'] for alert, _ in deliveries} - delivered_alerts)
+                return {"sent": len(sent_ids), "failed": 0, "deferred": deferred}
+
+            retry = []
+            for (alert, token), result in zip(pending, results):
+                if result["success"]:
+                    delivered_alerts.add(alert['alert_id'])
+                elif result["retryable"]:
+                    retry.append((alert, token))
+                else:
+                    if result["token_invalid"]:
+                        self.invalid_tokens.add(token)
+                    logger.warning(f"⚠️ FCM rejected token {token[:10]}... for alert {alert['alert_id']}: {result['code']} {result['error']}")
+
+            pending = retry
+            if not pending:
+                break
+
+        # An alert counts as sent when at least one of its user's devices received it
+        alert_ids = {alert['alert_id'] for alert, _ in deliveries}
+        sent_ids = sorted(delivered_alerts)
+        failed_ids = sorted(alert_ids - delivered_alerts)
+        if sent_ids:
+            update_alerts_status(sent_ids, 'sent')
+        if failed_ids:
+            update_alerts_status(failed_ids, 'failed')
+        return {"sent": len(sent_ids), "failed": len(failed_ids), "deferred": []}
+
+    def shutdown(self):
+        """Wait for in-flight batches and release the worker threads"""
+        self.executor.shutdown(wait=True)
+
+
+# Global alert dispatcher instance
+alert_dispatcher = AlertDispatcher()
+
+def dispatch_alerts(alerts: List[Dict], tokens_by_user: Dict[str, List[str]]) -> Dict:
+    """Send due alerts through the global dispatcher"""
+    return alert_dispatcher.dispatch(alerts, tokens_by_user)
@@ -0,0 +1,211 @@
+import sys
+import os
+import heapq
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.base.pg_listener import PgListener
+from agent.recommendation.services_alchemy import (
+    get_scheduled_alerts, get_pending_alerts_by_ids, expire_missed_alerts, update_alerts_status
+)
+
+logger = logging.getLogger(__name__)
+
+ALERT_CHANNEL = "alert_changes"
+# Pending alerts this many seconds past their trigger time are marked failed instead of sent late (0: never expire)
+ALERT_EXPIRE_AFTER = int(os.environ.get("ALERT_EXPIRE_AFTER", "0"))
+# Due alerts that were not delivered are fired again after this many seconds, doubled per attempt up to the max
+ALERT_RETRY_DELAY = float(os.environ.get("ALERT_RETRY_DELAY", "30"))
+ALERT_RETRY_MAX_DELAY = float(os.environ.get("ALERT_RETRY_MAX_DELAY", "900"))
+
+
+class AlertScheduler:
+    """In-memory min-heap of pending alerts keyed on trigger_time.
+
+    Loaded from the database on (re)connect and kept current by LISTEN/NOTIFY on alert inserts and
+    updates. The scheduler thread sleeps exactly until the earliest trigger time, or indefinitely when
+    nothing is scheduled, and hands due alerts to dispatch.
+
+    dispatch returns the IDs of the alerts it could not deliver (or raises); those are re-armed with
+    exponential backoff and fired again while they stay pending. Alerts leave the schedule only once they
+    are no longer pending (sent, failed, cancelled) or expire under the opt-in ALERT_EXPIRE_AFTER policy.
+    """
+
+    def __init__(self, dispatch: Callable[[List[Dict]], Optional[Iterable[int]]], expire_after: int = ALERT_EXPIRE_AFTER,
+                 retry_delay: float = ALERT_RETRY_DELAY, retry_max_delay: float = ALERT_RETRY_MAX_DELAY):
+        self.dispatch = dispatch
+        self.expire_after = timedelta(seconds=expire_after) if expire_after > 0 else None
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.running = False
+        self.thread = None
+        self.fired_count = 0
+        self.last_fired_at: Optional[datetime] = None
+        # Heap entries can go stale; _scheduled holds the current trigger time of every live alert
+        self._heap = []
+        self._scheduled: Dict[int, datetime] = {}
+        # Delivery attempts of the alerts currently being retried
+        self._attempts: Dict[int, int] = {}
+        self._cond = threading.Condition()
+        self.listener = PgListener([ALERT_CHANNEL], self._on_notify, on_reconnect=self.reload)
+
+    def start(self):
+        """Start the scheduler thread and the alert change listener"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="alert-scheduler", daemon=True)
+        self.thread.start()
+        # The listener loads all pending alerts as soon as it is connected
+        self.listener.start()
+        logger.info("⏰ Alert scheduler started")
+
+    def stop(self):
+        """Stop the scheduler thread and the listener"""
+        if not self.running:
+            return
+        self.running = False
+        self.listener.stop()
+        with self._cond:
+            self._cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=5)
+        logger.info("⏰ Alert scheduler stopped")
+
+    # ------------------------------------------------------------------
+    # Schedule maintenance
+    # ------------------------------------------------------------------
+
+    def schedule(self, alert_id: int, trigger_time: datetime):
+        """Add an alert or move it to a new trigger time"""
+        with self._cond:
+            if self._scheduled.get(alert_id) == trigger_time:
+                return
+            self._scheduled[alert_id] = trigger_time
+            heapq.heappush(self._heap, (trigger_time, alert_id))
+            self._cond.notify()
+
+    def unschedule(self, alert_id: int):
+        """Forget an alert (sent, cancelled or deleted); its heap entry is dropped lazily"""
+        with self._cond:
+            self._scheduled.pop(alert_id, None)
+            self._attempts.pop(alert_id, None)
+
+    def reload(self):
+        """Rebuild the schedule from the database; overdue alerts are sent late unless ALERT_EXPIRE_AFTER is set"""
+        if self.expire_after:
+            expired = expire_missed_alerts(datetime.now() - self.expire_after)
+            if expired:
+                logger.warning(f"⚠️ {expired} alerts were not delivered within {self.expire_after} and were marked failed")
+
+        alerts = get_scheduled_alerts()
+        with self._cond:
+            self._scheduled = {alert['alert_id']: alert['trigger_time'] for alert in alerts}
+            self._attempts = {}
+            self._heap = [(trigger_time, alert_id) for alert_id, trigger_time in self._scheduled.items()]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        logger.info(f"⏰ Loaded {len(alerts)} pending alerts into the scheduler")
+
+    def _on_notify(self, channel: str, payload):
+        if not isinstance(payload, dict) or 'alert_id' not in payload:
+            return
+        alert_id = payload['alert_id']
+        if payload.get('op') == 'DELETE' or payload.get('status') != 'pending' or not payload.get('trigger_time'):
+            self.unschedule(alert_id)
+        else:
+            self.schedule(alert_id, datetime.fromisoformat(payload['trigger_time']))
+
+    # ------------------------------------------------------------------
+    # Firing
+    # ------------------------------------------------------------------
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            trigger_time, alert_id = heapq.heappop(self._heap)
+            if self._scheduled.get(alert_id) == trigger_time:
+                del self._scheduled[alert_id]
+                due.append(alert_id)
+        return due
+
+    def _run(self):
+        while self.running:
+            with self._cond:
+                due_ids = self._pop_due(datetime.now())
+                if not due_ids:
+                    timeout = None
+                    if self._heap:
+                        timeout = max((self._heap[0][0] - datetime.now()).total_seconds(), 0)
+                    self._cond.wait(timeout)
+                    continue
+            self._fire(due_ids)
+
+    def _fire(self, alert_ids: List[int]):
+        # Until dispatch reports back, every popped alert counts as undelivered
+        retry_ids = list(alert_ids)
+        try:
+            # Re-read from the database so alerts changed since they were scheduled are not sent
+            alerts = get_pending_alerts_by_ids(alert_ids)
+            now = datetime.now()
+            due, expired = [], []
+            for alert in alerts:
+                if alert['trigger_time'] > now:
+                    self.schedule(alert['alert_id'], alert['trigger_time'])
+                elif alert.get('claim_expires_at') and alert['claim_expires_at'] > now:
+                    # Being sent by the instance holding the claim; checked again when its lease runs out, so the
+                    # alert is taken over if that instance never sends it (crashed, no devices, FCM down)
+                    self.schedule(alert['alert_id'], alert['claim_expires_at'])
+                elif self.expire_after and alert['trigger_time'] < now - self.expire_after:
+                    expired.append(alert['alert_id'])
+                else:
+                    due.append(alert)
+            retry_ids = [alert['alert_id'] for alert in due]
+            if expired:
+                update_alerts_status(expired, 'failed')
+                logger.warning(f"⚠️ {len(expired)} alerts were not delivered within {self.expire_after} and were marked failed")
+            if due:
+                logger.info(f"🔔 {len(due)} alerts due")
+                self.fired_count += len(due)
+                self.last_fired_at = now
+                retry_ids = list(self.dispatch(due) or [])
+        except Exception as e:
+            logger.error(f"❌ Error firing alerts {alert_ids}: {e}")
+        self._retry(alert_ids, retry_ids)
+
+    def _retry(self, fired_ids: List[int], retry_ids: List[int]):
+        """Re-arm the undelivered alerts among the fired ones, backing off exponentially per alert"""
+        now = datetime.now()
+        with self._cond:
+            for alert_id in set(fired_ids) - set(retry_ids):
+                self._attempts.pop(alert_id, None)
+            for alert_id in retry_ids:
+                # A notification may have rescheduled the alert meanwhile (removed ones are dropped by the re-read)
+                if alert_id in self._scheduled:
+                    continue
+                attempts = self._attempts.get(alert_id, 0) + 1
+                self._attempts[alert_id] = attempts
+                retry_at = now + timedelta(seconds=min(self.retry_delay * 2 ** (attempts - 1), self.retry_max_delay))
+                self._scheduled[alert_id] = retry_at
+                heapq.heappush(self._heap, (retry_at, alert_id))
+            if retry_ids:
+                logger.info(f"🔁 {len(retry_ids)} undelivered alerts re-armed")
+                self._cond.notify()
+
+    def get_status(self) -> Dict:
+        """Scheduler status information"""
+        with self._cond:
+            next_trigger = min(self._scheduled.values()) if self._scheduled else None
+            return {
+                "running": self.running,
+                "listener_connected": self.listener.connected,
+                "scheduled_alerts": len(self._scheduled),
+                "next_trigger_time": next_trigger.isoformat() if next_trigger else None,
+                "fired_alerts": self.fired_count,
+                "last_fired_at": self.last_fired_at.isoformat() if self.last_fired_at else None,
+            }
@@ -1,25 +1,36 @@
 import sys
 import streamlit as st
 import os
+import socket
 import threading
 import time
 import logging
-import requests
 from datetime import datetime, timedelta
 from typing import List, Dict
 import asyncio
-import firebase_admin
-from firebase_admin import messaging, credentials
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from agent.recommendation.services import (
-    get_due_alerts, update_alert_status
+from agent.recommendation.services import update_alert_status
+from agent.recommendation.services_alchemy import (
+    get_all_due_alerts, get_users_with_pending_activities, get_users_with_recommendation_data, claim_alerts,
+    release_alerts, get_event_conflicts
 )
+from agent.recommendation.event_conflicts import create_event_conflict_alerts, EVENT_CONFLICT_HOURS
 from agent.recommendation.activity_analyzer import activity_analyzer
-from agent.recommendation.recommendation_engine import generate_recommendations
+from agent.recommendation.recommendation_engine import generate_recommendations, recommendation_engine
+from agent.bg_running.alert_scheduler import AlertScheduler
+from agent.bg_running.alert_dispatcher import alert_dispatcher, dispatch_alerts
+from agent.bg_running.token_directory import token_directory
+from agent.bg_running.notification_client import notification_client, send_notification
+from agent.bg_running.user_shards import user_shards
+from agent.bg_running.job_scheduler import JobScheduler
 from core.base.alchemy_storage import DatabaseManager
+from core.base.leader_lock import AdvisoryLeader
+from core.base.retention import apply_retention
+from database.alchemy_models import DB_PARTITIONING
+from database.partitioning import ensure_partitions
 
 # Configure logging
 logging.basicConfig(
@@ -39,16 +50,49 @@ class BackgroundAlertService:
     
     def __init__(self):
         self.running = False
-        self.thread = None
-        self.check_interval = 60
-        self.last_recommendation_generation = datetime.now() - timedelta(hours=1)
+        self.last_recommendation_generation = None
+        self.last_retention_report = {}
+        # Alerts are fired by the alert scheduler at their trigger time on their own threads, so they never
+        # wait for the periodic LLM/maintenance jobs below
+        self.alert_scheduler = AlertScheduler(self._dispatch_alerts)
+        # Every instance (Streamlit processes, start_services.py) sends alerts, each one only those it claimed;
+        # LLM analysis/recommendations/cleanup run on the leader of the user shard instance only
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.alert_claim_lease = int(os.environ.get("ALERT_CLAIM_LEASE", "300"))
+        self.leader = AdvisoryLeader(
+            f"background-maintenance:{user_shards.instance_index}",
+            retry_interval=float(os.environ.get("LEADER_RETRY_INTERVAL", "15"))
+        )
+        self.job_scheduler = JobScheduler(db, gate=lambda: self.leader.is_leader, gate_retry=self.leader.retry_interval)
+        shard = user_shards.instance_index
+        self.job_scheduler.add_job(
+            f"activity_analysis:{shard}", self._generate_activity_analysis,
+            int(os.environ.get("ACTIVITY_ANALYSIS_INTERVAL", "3600")), job_class="llm"
+        )
+        self.job_scheduler.add_job(
+            f"recommendations:{shard}", self._generate_periodic_recommendations,
+            int(os.environ.get("RECOMMENDATION_INTERVAL", "3600")), job_class="llm"
+        )
+        self.job_scheduler.add_job(
+            f"event_conflicts:{shard}", self._create_event_conflict_alerts,
+            int(os.environ.get("EVENT_CONFLICT_INTERVAL", "900")), job_class="maintenance"
+        )
+        self.job_scheduler.add_job(
+            f"retention:{shard}", self._apply_retention,
+            int(os.environ.get("RETENTION_INTERVAL", "3600")), job_class="maintenance"
+        )
+        if DB_PARTITIONING:
+            # Partitions are shared by all shards; creating them is idempotent
+            self.job_scheduler.add_job("partitions", lambda: ensure_partitions(db.engine), 86400, job_class="maintenance")
         
     def start(self):
         """Start the background service"""
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._run_service, daemon=True)
-            self.thread.start()
+            self.leader.start()
+            token_directory.start()
+            self.alert_scheduler.start()
+            self.job_scheduler.start()
             logger.info("🚀 Background Alert Service started")
         else:
             logger.warning("⚠️ Background Alert Service is already running")
@@ -57,94 +101,67 @@ class BackgroundAlertService:
         """Stop the background service"""
         if self.running:
             self.running = False
-            if self.thread:
-                self.thread.join(timeout=5)
+            self.job_scheduler.stop()
+            self.alert_scheduler.stop()
+            token_directory.stop()
+            self.leader.stop()
             logger.info("🛑 Background Alert Service stopped")
     
-    def _run_service(self):
-        """Main service loop"""
-        while self.running:
-            try:
-                self._generate_activity_analysis()
-                print("🔍 Analyzing user activities...")
-                time.sleep(5)
-
-                self._generate_periodic_recommendations()
-                print("🔄 Checking for due alerts...")
-                time.sleep(5)
-
-                self._process_due_alerts()
-                print("Cleaning up old alerts...")
-                time.sleep(5)
-
-                self._cleanup_old_alerts()
-                print("Finished processing alerts and recommendations")
-                time.sleep(5)
-                
-            except Exception as e:
-                logger.error(f"❌ Error in background service: {e}")
-            
-            time.sleep(self.check_interval)
-
     def _generate_activity_analysis(self):
-        """Generate activity analysis for upcoming events"""
+        """Analyze the pending activities of every owned user (scheduled job)"""
         try:
-            time_since_last = datetime.now() - self.last_recommendation_generation
-            print(f"Last recommendation generation: {self.last_recommendation_generation}, time since last recommendation: {time_since_last}")            
-            if time_since_last.total_seconds() >= 3600:
-                logger.info("🔍 Generating activity analysis for user activities...")
-                activity_analyzer.analyze_activities()
+            user_ids = user_shards.filter_owned(get_users_with_pending_activities())
+            logger.info(f"🔍 Generating activity analysis for {len(user_ids)} users...")
+            user_shards.run(user_ids, activity_analyzer.analyze_activities)
         except Exception as e:
             logger.error(f"❌ Error generating activity analysis: {e}")
 
     def _process_due_alerts(self):
-        """Process alerts that are due to be sent"""
+        """Process alerts of all users that are due to be sent"""
         try:
-            due_alerts = get_due_alerts()
+            due_alerts = get_all_due_alerts()
             if due_alerts:
-                logger.info(f"📋 Found {len(due_alerts)} upcoming alert in 30 minutes")
-                
-                fcm_tokens = self._get_fcm_tokens()
-                if not fcm_tokens:
-                    logger.warning("⚠️ No FCM tokens available")
-                    return
-                    
-                for alert in due_alerts:
-                    # Find matching token for user
-                    user_token = next((token for token in fcm_tokens if token['user_id'] == alert['user_id']), None)
-                    if user_token:
-                        alert['fcm_token'] = user_token['token']
-                        asyncio.run(self._create_browser_notification(alert))
-                        time.sleep(60)
-                    else:
-                        logger.warning(f"⚠️ No FCM token found for user {alert['user_id']}")
+                logger.info(f"📋 Found {len(due_alerts)} upcoming alert in 60 minutes")
+                self._dispatch_alerts(due_alerts)
             else:
                 logger.info("❌ No due alerts found")
         except Exception as e:
             logger.error(f"❌ Error processing due alerts: {e}")
 
-    def _get_fcm_tokens(self):
-        """Get all active FCM tokens from the API"""
+    def _dispatch_alerts(self, due_alerts: List[Dict]) -> List[int]:
+        """Send notifications for the given alerts in batches; returns the IDs to retry later (not delivered)"""
+        owned_ids = []
         try:
-            fcm_service_url = os.environ.get("FCM_SERVICE_URL", "http://localhost:8001")
-            response = requests.get(f"{fcm_service_url}/api/fcm/tokens")
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    tokens = result.get('tokens', [])
-                    logger.info(f"✅ Retrieved {len(tokens)} FCM tokens")
-                    return tokens
-                else:
-                    logger.error(f"❌ API returned error: {result}")
-                    return []
-            else:
-                logger.error(f"❌ HTTP error: {response.status_code}")
-                return []
-                
+            # With several background instances each one sends only the alerts of the users it owns
+            owned_ids = [alert['alert_id'] for alert in due_alerts if user_shards.owns(alert['user_id'])]
+            # Only alerts this instance managed to claim are sent; the others are held by another instance
+            # and retried here in case it never sends them
+            due_alerts = claim_alerts(owned_ids, self.worker_id, self.alert_claim_lease)
+            claimed_ids = {alert['alert_id'] for alert in due_alerts}
+            retry_ids = [alert_id for alert_id in owned_ids if alert_id not in claimed_ids]
+            if not due_alerts:
+                return retry_ids
+
+            # Only the users with due alerts are looked up, with every active device of each; users without
+            # one get their alerts marked skipped_no_device
+            tokens_by_user = token_directory.get_tokens_for_users(alert['user_id'] for alert in due_alerts)
+            summary = dispatch_alerts(due_alerts, tokens_by_user)
+            if summary["deferred"]:
+                # FCM could not be reached for these: hand them back to the scheduler, free for any instance
+                release_alerts(summary["deferred"], self.worker_id)
+                retry_ids.extend(summary["deferred"])
+
+            # Stop sending to devices FCM reported as gone
+            if alert_dispatcher.invalid_tokens:
+                invalid_tokens = list(alert_dispatcher.invalid_tokens)
+                alert_dispatcher.invalid_tokens.difference_update(invalid_tokens)
+                token_directory.deactivate_tokens(invalid_tokens)
+            return retry_ids
         except Exception as e:
-            logger.error(f"❌ Error calling FCM tokens API: {e}")
-            return []
+            logger.error(f"❌ Error dispatching alerts: {e}")
+            # Unsent claims would otherwise block every instance, this one included, until the lease expires
+            release_alerts(owned_ids, self.worker_id)
+            return owned_ids
 
     async def _create_browser_notification(self, alert: Dict):
         """Create browser notification and updating alert status"""
@@ -154,27 +171,22 @@ class BackgroundAlertService:
             if 'fcm_token' not in alert:
                 logger.error("❌ No FCM token provided for alert")
                 return
-                
-            cred = credentials.Certificate(os.environ.get("FIREBASE_CREDENTIALS_PATH"))
             
-            if not firebase_admin._apps:
-                firebase_admin.initialize_app(cred)
-            
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=alert['title'],
-                    body=alert['message']
-                ),
+            result = send_notification(
+                alert['fcm_token'],
+                alert['title'],
+                alert['message'],
                 data={
-                    'user_id': str(alert['user_id']),
-                    'title': str(alert['title']),
-                    'message': str(alert['message'])
-                },
-                token=alert['fcm_token']
+                    'user_id': alert['user_id'],
+                    'title': alert['title'],
+                    'message': alert['message']
+                }
             )
-            
-            response = messaging.send(message)
-            logger.info(f"✅ Notification sent successfully: {response}")
+            if not result['success']:
+                logger.error(f"❌ Error creating browser notification: {result['code']} {result['error']}")
+                return
+
+            logger.info(f"✅ Notification sent successfully: {result['message_id']}")
             
             update_alert_status(alert['alert_id'], 'sent')
             
@@ -182,58 +194,67 @@ class BackgroundAlertService:
             logger.error(f"❌ Error creating browser notification: {e}")
     
     def _generate_periodic_recommendations(self):
-        """Generate new recommendations periodically"""
+        """Generate new recommendations for every owned user (scheduled job)"""
         try:
-            time_since_last = datetime.now() - self.last_recommendation_generation
-            print(f"Last recommendation generation: {self.last_recommendation_generation}, time since last recommendation: {time_since_last}")            
-            if time_since_last.total_seconds() >= 3600:
-                logger.info("🎯 Generating new recommendations...")
-                result = generate_recommendations()
-                
-                if result.get('success'):
-                    recommendations = result.get('recommendations', [])
-                    alerts_created = result.get('alerts_created', 0)
-                    
-                    logger.info(f"✅ Generated {len(recommendations)} recommendations, {alerts_created} alerts created")
-                    self.last_recommendation_generation = datetime.now()
-                else:
-                    logger.warning(f"⚠️ Failed to generate recommendations: {result.get('error', 'Unknown error')}")
-                    
+            user_ids = user_shards.filter_owned(get_users_with_recommendation_data(days=1))
+            logger.info(f"🎯 Generating new recommendations for {len(user_ids)} users...")
+            results = user_shards.run(user_ids, generate_recommendations)
+            
+            succeeded = [result for result in results.values() if result.get('success')]
+            skipped = sum(1 for result in succeeded if result.get('skipped'))
+            recommendations = sum(len(result.get('recommendations', [])) for result in succeeded)
+            alerts_created = sum(result.get('alerts_created', 0) for result in succeeded)
+            logger.info(f"✅ Generated {recommendations} recommendations, {alerts_created} alerts created for {len(succeeded)}/{len(results)} users "
+                        f"({skipped} skipped with unchanged inputs)")
+            
+            for user_id, result in results.items():
+                if not result.get('success'):
+                    logger.warning(f"⚠️ Failed to generate recommendations for user {user_id}: {result.get('error', result.get('message', 'Unknown error'))}")
+            
+            if succeeded:
+                self.last_recommendation_generation = datetime.now()
         except Exception as e:
             logger.error(f"❌ Error generating periodic recommendations: {e}")
     
-    def _cleanup_old_alerts(self):
-        """Clean up old alerts"""
-        with db.get_session() as session:
-            try:
-                from database.alchemy_models import Alert
-                from datetime import datetime, timedelta
-                
-                cutoff_date = datetime.now() - timedelta(days=30)
-                
-                deleted_count = session.query(Alert).filter(
-                    Alert.status == 'sent',
-                    Alert.created_at < cutoff_date
-                ).delete(synchronize_session=False)
-                
-                session.commit()
-                
-                if deleted_count > 0:
-                    logger.info(f"🗑️ Cleanup: {deleted_count} old alerts deleted")
-                    
-            except Exception as e:
-                logger.error(f"❌ Error in cleanup: {e}")
-                session.rollback()
+    def _create_event_conflict_alerts(self):
+        """Alert the owned users about overlapping upcoming events (scheduled job, no LLM)"""
+        try:
+            conflicts = get_event_conflicts(EVENT_CONFLICT_HOURS)
+            owned = set(user_shards.filter_owned({conflict['user_id'] for conflict in conflicts}))
+            created = create_event_conflict_alerts([conflict for conflict in conflicts if conflict['user_id'] in owned])
+            if created:
+                logger.info(f"📅 Created {created} event conflict alerts")
+        except Exception as e:
+            logger.error(f"❌ Error creating event conflict alerts: {e}")
+
+    def _apply_retention(self):
+        """Delete (and archive) expired alerts, chat history, activities and finished jobs in chunks (scheduled job)"""
+        try:
+            report = apply_retention()
+            deleted = {name: result["deleted"] for name, result in report.items() if result["deleted"]}
+            if deleted:
+                logger.info(f"🗑️ Retention: {deleted}")
+            self.last_retention_report = report
+        except Exception as e:
+            logger.error(f"❌ Error in retention: {e}")
 
     def get_service_status(self) -> Dict:
         """Get service status information"""
+        scheduler_status = self.alert_scheduler.get_status()
         return {
             "running": self.running,
-            "check_interval": self.check_interval,
-            "last_recommendation_generation": self.last_recommendation_generation.isoformat(),
-            "thread_alive": self.thread.is_alive() if self.thread else False,
-            "pending_alerts_count": self.alert_queue.qsize()
-
+            "worker_id": self.worker_id,
+            "leader": self.leader.get_status(),
+            "last_recommendation_generation": self.last_recommendation_generation.isoformat() if self.last_recommendation_generation else None,
+            "thread_alive": self.job_scheduler.thread.is_alive() if self.job_scheduler.thread else False,
+            "jobs": self.job_scheduler.get_status(),
+            "retention": self.last_retention_report,
+            "recommendations": recommendation_engine.get_metrics(),
+            "pending_alerts_count": scheduler_status["scheduled_alerts"],
+            "scheduler": scheduler_status,
+            "notifications": notification_client.get_metrics(),
+            "token_cache": dict(token_directory.stats),
+            "user_shards": user_shards.get_status()
         }
     def force_check_alerts(self):
         """Force check for due alerts (for manual triggering)"""
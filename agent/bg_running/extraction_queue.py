@@ -0,0 +1,343 @@
+import sys
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+from core.base.alchemy_storage import DatabaseManager
+from database.alchemy_models import ExtractionJob
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('background_alerts.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_ID = '12345678-1234-1234-1234-123456789012'
+
+# "true" makes the extraction tools enqueue jobs instead of running inline
+ASYNC_CAPTURE = os.environ.get("ASYNC_CAPTURE", "false").lower() == "true"
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", "4"))
+EXTRACTION_MAX_ATTEMPTS = int(os.environ.get("EXTRACTION_MAX_ATTEMPTS", "3"))
+EXTRACTION_JOB_TIMEOUT = int(os.environ.get("EXTRACTION_JOB_TIMEOUT", "300"))  # seconds before a running job is considered lost
+EXTRACTION_RETRY_BACKOFF = float(os.environ.get("EXTRACTION_RETRY_BACKOFF", "30"))  # seconds before a failed job is retried, doubled per attempt
+EXTRACTION_POLL_INTERVAL = float(os.environ.get("EXTRACTION_POLL_INTERVAL", "1.0"))
+# Seconds between sweeps for jobs left running by a crashed worker (they block their user's later jobs)
+EXTRACTION_RECOVERY_INTERVAL = float(os.environ.get("EXTRACTION_RECOVERY_INTERVAL", "60"))
+
+# Claim the oldest queued job whose user has no earlier job still queued or running, unless it is backing off.
+# SKIP LOCKED lets workers claim in parallel; the NOT EXISTS keeps each user's jobs strictly in order.
+CLAIM_JOB_SQL = text("""
+    UPDATE extraction_jobs
+    SET status = 'running', started_at = NOW(), attempts = attempts + 1
+    WHERE job_id = (
+        SELECT j.job_id
+        FROM extraction_jobs j
+        WHERE j.status = 'queued'
+        AND (j.not_before IS NULL OR j.not_before <= NOW())
+        AND NOT EXISTS (
+            SELECT 1 FROM extraction_jobs p
+            WHERE p.user_id = j.user_id
+            AND p.status IN ('queued', 'running')
+            AND p.job_id < j.job_id
+        )
+        ORDER BY j.job_id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING job_id, user_id, session_id, job_type, user_input, attempts
+""")
+
+# Running jobs whose worker died: retry them, or fail them once out of attempts
+RECOVER_JOBS_SQL = text("""
+    UPDATE extraction_jobs
+    SET status = CASE WHEN attempts < :max_attempts THEN 'queued' ELSE 'failed' END,
+        error = 'Worker timed out',
+        finished_at = CASE WHEN attempts < :max_attempts THEN NULL ELSE NOW() END
+    WHERE status = 'running'
+    AND started_at < :cutoff
+""")
+
+
+# Job runners raise on failures (LLM or database errors), which are retried; whatever they return is the
+# job's result, including outcomes such as "no events found" that a retry would not change
+def _run_user_info(user_input: str, session_id: Optional[str]) -> str:
+    from agent.extract_user_info.agent import get_user_info_extraction_agent
+    result = get_user_info_extraction_agent().process(user_input, raise_errors=True)
+    return result.get("message") if result.get("success") else f"Not saved: {result.get('error')}"
+
+def _run_event(user_input: str, session_id: Optional[str]) -> str:
+    from agent.extract_event.agent import get_event_extraction_agent
+    return get_event_extraction_agent().process(user_input, session_id, raise_errors=True)
+
+def _run_activity(user_input: str, session_id: Optional[str]) -> str:
+    from agent.recommendation.activity_extractor import activity_extractor
+    return activity_extractor.process_user_input(user_input, raise_errors=True)
+
+def _run_capture(user_input: str, session_id: Optional[str]) -> str:
+    from agent.unified_extraction.agent import capture_information
+    return capture_information(user_input, session_id, raise_errors=True)
+
+JOB_HANDLERS: Dict[str, Callable[[str, Optional[str]], str]] = {
+    "user_info": _run_user_info,
+    "event": _run_event,
+    "activity": _run_activity,
+    "capture": _run_capture,
+}
+
+
+class ExtractionQueue:
+    """Durable Postgres-backed queue that runs extraction tools off the chat path"""
+
+    def __init__(self, db: DatabaseManager = None, workers: int = EXTRACTION_WORKERS):
+        self.db = db or DatabaseManager()
+        self.workers = workers
+        self.running = False
+        self.threads = []
+        self._stop_event = threading.Event()
+        self._recovery_lock = threading.Lock()
+        self._next_recovery = 0.0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, job_type: str, user_input: str, session_id: str = None, user_id: str = DEFAULT_USER_ID) -> Optional[int]:
+        """Persist a job and return its id"""
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f"Unknown extraction job type: {job_type}")
+
+        with self.db.get_session() as session:
+            try:
+                job = ExtractionJob(
+                    user_id=user_id,
+                    session_id=session_id,
+                    job_type=job_type,
+                    user_input=user_input,
+                    status='queued'
+                )
+                session.add(job)
+                session.commit()
+                logger.info(f"📥 Queued {job_type} extraction job {job.job_id}")
+                return job.job_id
+            except Exception as e:
+                print(f"❌ Error queueing extraction job: {e}")
+                session.rollback()
+                return None
+
+    def get_job_status(self, job_id: int) -> Optional[dict]:
+        """Get the status of one job"""
+        with self.db.get_session() as session:
+            try:
+                job = session.query(ExtractionJob).filter(ExtractionJob.job_id == job_id).first()
+                return self._job_to_dict(job) if job else None
+            except Exception as e:
+                print(f"❌ Error getting extraction job {job_id}: {e}")
+                return None
+
+    def get_session_jobs(self, session_id: str, limit: int = 20) -> list:
+        """Get the most recent jobs queued from a chat session"""
+        with self.db.get_session() as session:
+            try:
+                jobs = session.query(ExtractionJob).filter(
+                    ExtractionJob.session_id == session_id
+                ).order_by(ExtractionJob.job_id.desc()).limit(limit).all()
+                return [self._job_to_dict(job) for job in jobs]
+            except Exception as e:
+                print(f"❌ Error getting extraction jobs for session {session_id}: {e}")
+                return []
+
+    def get_queue_stats(self) -> dict:
+        """Count jobs per status"""
+        with self.db.get_session() as session:
+            try:
+                rows = session.execute(text(
+                    "SELECT status, COUNT(*) FROM extraction_jobs GROUP BY status"
+                )).fetchall()
+                stats = {status: 0 for status in ("queued", "running", "done", "failed")}
+                stats.update({row[0]: row[1] for row in rows})
+                return stats
+            except Exception as e:
+                print(f"❌ Error getting extraction queue stats: {e}")
+                return {}
+
+    @staticmethod
+    def _job_to_dict(job: ExtractionJob) -> dict:
+        return {
+            "job_id": job.job_id,
+            "user_id": str(job.user_id),
+            "session_id": job.session_id,
+            "job_type": job.job_type,
+            "status": job.status,
+            "attempts": job.attempts,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the worker pool"""
+        if self.running:
+            logger.warning("⚠️ Extraction workers are already running")
+            return
+
+        self.running = True
+        self._stop_event.clear()
+        self._next_recovery = 0.0
+        self.threads = [
+            threading.Thread(target=self._worker_loop, name=f"extraction-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+        logger.info(f"🚀 Started {self.workers} extraction workers")
+
+    def stop(self):
+        """Stop the worker pool; in-flight jobs finish first"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=EXTRACTION_JOB_TIMEOUT)
+        self.threads = []
+        logger.info("🛑 Extraction workers stopped")
+
+    def recover_stale_jobs(self) -> int:
+        """Requeue jobs left running by a crashed worker"""
+        with self.db.get_session() as session:
+            try:
+                result = session.execute(RECOVER_JOBS_SQL, {
+                    "max_attempts": EXTRACTION_MAX_ATTEMPTS,
+                    "cutoff": datetime.now() - timedelta(seconds=EXTRACTION_JOB_TIMEOUT)
+                })
+                session.commit()
+                if result.rowcount:
+                    logger.info(f"♻️ Recovered {result.rowcount} stale extraction jobs")
+                return result.rowcount
+            except Exception as e:
+                print(f"❌ Error recovering stale extraction jobs: {e}")
+                session.rollback()
+                return 0
+
+    def _claim_job(self) -> Optional[dict]:
+        with self.db.get_session() as session:
+            try:
+                row = session.execute(CLAIM_JOB_SQL).fetchone()
+                session.commit()
+                return dict(row._mapping) if row else None
+            except Exception as e:
+                print(f"❌ Error claiming extraction job: {e}")
+                session.rollback()
+                return None
+
+    def _finish_job(self, job: dict, result: Optional[str], error: Optional[str]):
+        if error is None:
+            status = 'done'
+        elif job["attempts"] < EXTRACTION_MAX_ATTEMPTS:
+            status = 'queued'
+        else:
+            status = 'failed'
+
+        with self.db.get_session() as session:
+            try:
+                # Only while this worker still owns the job: recovery may have requeued it (and another worker
+                # claimed it again) after EXTRACTION_JOB_TIMEOUT, and that run's outcome must not be overwritten
+                updated = session.query(ExtractionJob).filter(
+                    ExtractionJob.job_id == job["job_id"],
+                    ExtractionJob.status == 'running',
+                    ExtractionJob.attempts == job["attempts"]
+                ).update({
+                    "status": status,
+                    "result": result,
+                    "error": error,
+                    "finished_at": None if status == 'queued' else datetime.now(),
+                    "not_before": datetime.now() + timedelta(seconds=EXTRACTION_RETRY_BACKOFF * 2 ** (job["attempts"] - 1))
+                    if status == 'queued' else None
+                }, synchronize_session=False)
+                session.commit()
+            except Exception as e:
+                print(f"❌ Error finishing extraction job {job['job_id']}: {e}")
+                session.rollback()
+                return
+
+        if not updated:
+            logger.warning(f"⚠️ Extraction job {job['job_id']} was taken over after timing out; result of attempt {job['attempts']} discarded")
+        elif status == 'done':
+            logger.info(f"✅ Extraction job {job['job_id']} ({job['job_type']}) done")
+        else:
+            logger.warning(f"⚠️ Extraction job {job['job_id']} ({job['job_type']}) {status}: {error}")
+
+    def process_next_job(self) -> bool:
+        """Claim and run one job. Returns False when nothing was eligible"""
+        job = self._claim_job()
+        if not job:
+            return False
+
+        try:
+            result = JOB_HANDLERS[job["job_type"]](job["user_input"], job["session_id"])
+            result, error = str(result) if result is not None else "", None
+        except Exception as e:
+            result, error = None, str(e)
+
+        self._finish_job(job, result, error)
+        return True
+
+    def _recover_if_due(self):
+        """Run recover_stale_jobs on one worker every EXTRACTION_RECOVERY_INTERVAL seconds"""
+        with self._recovery_lock:
+            now = time.monotonic()
+            if now < self._next_recovery:
+                return
+            self._next_recovery = now + EXTRACTION_RECOVERY_INTERVAL
+        self.recover_stale_jobs()
+
+    def _worker_loop(self):
+        while self.running:
+            try:
+                self._recover_if_due()
+                if not self.process_next_job():
+                    self._stop_event.wait(EXTRACTION_POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"❌ Error in extraction worker: {e}")
+                self._stop_event.wait(EXTRACTION_POLL_INTERVAL)
+
+
+# Global extraction queue instance
+extraction_queue = ExtractionQueue()
+
+def enqueue_extraction(job_type: str, user_input: str, session_id: str = None) -> str:
+    """Queue an extraction job and return an acknowledgement for the chat model"""
+    job_id = extraction_queue.enqueue(job_type, user_input, session_id)
+    if job_id is None:
+        return "Error: could not queue the information for saving."
+    return f"Queued for saving in the background (job {job_id}). The information will be available shortly."
+
+def get_extraction_job_status(job_id: int) -> Optional[dict]:
+    """Get the status of an extraction job"""
+    return extraction_queue.get_job_status(job_id)
+
+def start_extraction_workers():
+    """Start the extraction worker pool"""
+    extraction_queue.start()
+
+def stop_extraction_workers():
+    """Stop the extraction worker pool"""
+    extraction_queue.stop()
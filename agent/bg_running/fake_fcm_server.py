@@ -0,0 +1,94 @@
+"""Local fake of the FCM HTTP v1 send endpoint for tests and offline development.
+
+Usage:
+    python -m agent.bg_running.fake_fcm_server 9099
+    FCM_BASE_URL=http://localhost:9099 python agent/bg_running/start_services.py
+
+Token conventions:
+    unregistered-*  -> 404 UNREGISTERED (dead device token)
+    invalid-*       -> 400 INVALID_ARGUMENT
+    flaky-*         -> 503 UNAVAILABLE on the first attempt, then success
+    anything else   -> 200 with a message name
+"""
+import sys
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+SEND_PATH = re.compile(r"^/v1/projects/(?P<project>[^/]+)/messages:send$")
+
+
+class FakeFCMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        match = SEND_PATH.match(self.path)
+        if not match:
+            return self._reply(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            message = json.loads(self.rfile.read(length) or b"{}").get("message", {})
+        except ValueError:
+            return self._reply(400, self._error(400, "INVALID_ARGUMENT", "Malformed JSON"))
+
+        token = message.get("token", "")
+        server = self.server
+        with server.lock:
+            server.received.append(message)
+            attempts = server.attempts.get(token, 0) + 1
+            server.attempts[token] = attempts
+
+        if not token or token.startswith("invalid"):
+            return self._reply(400, self._error(400, "INVALID_ARGUMENT", "The registration token is not valid"))
+        if token.startswith("unregistered"):
+            return self._reply(404, self._error(404, "UNREGISTERED", "Requested entity was not found."))
+        if token.startswith("flaky") and attempts == 1:
+            return self._reply(503, self._error(503, "UNAVAILABLE", "The service is currently unavailable."))
+
+        self._reply(200, {"name": f"projects/{match.group('project')}/messages/{uuid.uuid4().hex}"})
+
+    @staticmethod
+    def _error(http_code: int, error_code: str, message: str) -> dict:
+        return {"error": {
+            "code": http_code,
+            "message": message,
+            "status": "NOT_FOUND" if http_code == 404 else "UNAVAILABLE" if http_code == 503 else "INVALID_ARGUMENT",
+            "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": error_code}]
+        }}
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeFCMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int]):
+        super().__init__(address, FakeFCMHandler)
+        self.lock = threading.Lock()
+        self.received = []
+        self.attempts = {}
+
+
+def start_fake_fcm_server(port: int = 0) -> Tuple[FakeFCMServer, str]:
+    """Start the fake server in a background thread; returns (server, base_url)"""
+    server = FakeFCMServer(("127.0.0.1", port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9099
+    server = FakeFCMServer(("0.0.0.0", port))
+    print(f"🧪 Fake FCM server listening on http://localhost:{port}")
+    server.serve_forever()
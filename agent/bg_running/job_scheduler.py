@@ -0,0 +1,217 @@
+import sys
+import os
+import time
+import heapq
+import random
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.base.alchemy_storage import DatabaseManager
+from database.alchemy_models import JobRun
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per job class; jobs of one class never wait for jobs of another
+JOB_CLASS_WORKERS = {
+    "llm": int(os.environ.get("LLM_JOB_WORKERS", "2")),
+    "maintenance": 1,
+}
+
+
+class PeriodicJob:
+    """A function run every interval seconds, plus up to jitter * interval of random delay"""
+
+    def __init__(self, name: str, func: Callable[[], None], interval: float, job_class: str = "maintenance", jitter: float = 0.1):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.job_class = job_class
+        self.jitter = jitter
+        self.next_run: Optional[datetime] = None
+        self.running = False
+        self.last_started_at: Optional[datetime] = None
+        self.last_finished_at: Optional[datetime] = None
+        self.last_status: Optional[str] = None
+        self.skipped_overlaps = 0
+
+    def delay(self) -> timedelta:
+        return timedelta(seconds=self.interval * (1 + random.uniform(0, self.jitter)))
+
+
+class JobScheduler:
+    """Runs periodic jobs on independent schedules.
+
+    Each job class has its own executor, so a slow LLM job only delays other LLM jobs. A job is never run
+    again while its previous run is still going (the run is skipped, not queued). Start and finish times
+    are persisted in job_runs, so a restarted or newly elected instance continues the schedule instead of
+    running everything at once. Jobs only run while gate() is true (e.g. while this instance is leader).
+    """
+
+    def __init__(self, db: DatabaseManager = None, gate: Callable[[], bool] = None, gate_retry: float = 15.0,
+                 class_workers: Dict[str, int] = None):
+        self.db = db or DatabaseManager()
+        self.gate = gate or (lambda: True)
+        self.gate_retry = timedelta(seconds=gate_retry)
+        self.class_workers = class_workers or JOB_CLASS_WORKERS
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self.executors: Dict[str, ThreadPoolExecutor] = {}
+        self.running = False
+        self.thread = None
+        self._heap = []
+        self._cond = threading.Condition()
+
+    def add_job(self, name: str, func: Callable[[], None], interval: float, job_class: str = "maintenance", jitter: float = 0.1):
+        """Register a job; it first runs one interval after its last persisted run (or right away if it never ran)"""
+        if job_class not in self.executors:
+            self.executors[job_class] = ThreadPoolExecutor(
+                max_workers=self.class_workers.get(job_class, 1), thread_name_prefix=f"job-{job_class}"
+            )
+        self.jobs[name] = PeriodicJob(name, func, interval, job_class, jitter)
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self.running:
+            return
+        self.running = True
+        now = datetime.now()
+        with self._cond:
+            self._heap = []
+            for job in self.jobs.values():
+                job.next_run = now
+                heapq.heappush(self._heap, (job.next_run, job.name))
+        self.thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+        self.thread.start()
+        logger.info(f"🗓️ Job scheduler started with {len(self.jobs)} jobs")
+
+    def stop(self):
+        """Stop scheduling; running jobs finish on their executors"""
+        if not self.running:
+            return
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=5)
+        logger.info("🗓️ Job scheduler stopped")
+
+    def run_now(self, name: str) -> bool:
+        """Run a job immediately (outside its schedule). Returns False if it is already running"""
+        job = self.jobs[name]
+        with self._cond:
+            if job.running:
+                return False
+            job.running = True
+        self.executors[job.job_class].submit(self._execute, job)
+        return True
+
+    def _run(self):
+        while self.running:
+            with self._cond:
+                now = datetime.now()
+                if not self._heap or self._heap[0][0] > now:
+                    timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+                _, name = heapq.heappop(self._heap)
+            job = self.jobs[name]
+            job.next_run = self._dispatch(job)
+            with self._cond:
+                heapq.heappush(self._heap, (job.next_run, job.name))
+
+    def _dispatch(self, job: PeriodicJob) -> datetime:
+        """Start a due job if allowed and return its next run time"""
+        now = datetime.now()
+        try:
+            if not self.gate():
+                return now + self.gate_retry
+
+            # Another instance (or a previous life of this one) may have run it recently
+            last_started = self._last_started(job.name)
+            if last_started and last_started != job.last_started_at and last_started + timedelta(seconds=job.interval) > now:
+                return last_started + job.delay()
+
+            with self._cond:
+                if job.running:
+                    job.skipped_overlaps += 1
+                    logger.warning(f"⚠️ Job {job.name} is still running; skipping this run")
+                    return now + job.delay()
+                job.running = True
+            self.executors[job.job_class].submit(self._execute, job)
+        except Exception as e:
+            logger.error(f"❌ Error scheduling job {job.name}: {e}")
+        return now + job.delay()
+
+    def _execute(self, job: PeriodicJob):
+        start = time.perf_counter()
+        job.last_started_at = datetime.now()
+        self._record(job.name, started_at=job.last_started_at, status='running')
+        status, error = 'success', None
+        try:
+            logger.info(f"▶️ Running job {job.name}")
+            job.func()
+        except Exception as e:
+            status, error = 'failed', str(e)
+            logger.error(f"❌ Job {job.name} failed: {e}")
+        finally:
+            job.last_finished_at = datetime.now()
+            job.last_status = status
+            job.running = False
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            self._record(job.name, finished_at=job.last_finished_at, status=status, error=error, duration_ms=duration_ms)
+            logger.info(f"⏹️ Job {job.name} {status} in {duration_ms} ms")
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _last_started(self, name: str) -> Optional[datetime]:
+        with self.db.get_session() as session:
+            try:
+                run = session.get(JobRun, name)
+                return run.last_started_at if run else None
+            except Exception as e:
+                logger.error(f"❌ Error reading last run of {name}: {e}")
+                return None
+
+    def _record(self, name: str, started_at: datetime = None, finished_at: datetime = None,
+                status: str = None, error: str = None, duration_ms: int = None):
+        with self.db.get_session() as session:
+            try:
+                run = session.get(JobRun, name)
+                if run is None:
+                    run = JobRun(job_name=name, run_count=0)
+                    session.add(run)
+                if started_at:
+                    run.last_started_at = started_at
+                    run.run_count = (run.run_count or 0) + 1
+                if finished_at:
+                    run.last_finished_at = finished_at
+                    run.last_error = error
+                    run.last_duration_ms = duration_ms
+                run.last_status = status
+                session.commit()
+            except Exception as e:
+                logger.error(f"❌ Error recording run of {name}: {e}")
+                session.rollback()
+
+    def get_status(self) -> Dict:
+        """Schedule and last outcome of every job"""
+        return {
+            name: {
+                "job_class": job.job_class,
+                "interval": job.interval,
+                "running": job.running,
+                "next_run": job.next_run.isoformat() if job.next_run else None,
+                "last_started_at": job.last_started_at.isoformat() if job.last_started_at else None,
+                "last_finished_at": job.last_finished_at.isoformat() if job.last_finished_at else None,
+                "last_status": job.last_status,
+                "skipped_overlaps": job.skipped_overlaps
+            }
+            for name, job in self.jobs.items()
+        }
@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+import logging
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import requests
+import firebase_admin
+from firebase_admin import credentials
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import AuthorizedSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FCM_BASE_URL = "https://fcm.googleapis.com"
+# Point at a local fake/emulator (e.g. http://localhost:9099) to send without Google credentials
+FCM_BASE_URL = os.environ.get("FCM_BASE_URL", DEFAULT_FCM_BASE_URL).rstrip("/")
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+FCM_POOL_SIZE = int(os.environ.get("FCM_POOL_SIZE", "20"))
+FCM_TIMEOUT = float(os.environ.get("FCM_TIMEOUT", "10"))
+
+# FCM v1 error codes worth retrying, and codes meaning the device token is dead
+RETRYABLE_CODES = {"UNAVAILABLE", "INTERNAL", "QUOTA_EXCEEDED", "DEADLINE_EXCEEDED", "NETWORK_ERROR"}
+INVALID_TOKEN_CODES = {"UNREGISTERED", "SENDER_ID_MISMATCH"}
+
+
+class NotificationClient:
+    """FCM HTTP v1 client that initialises Firebase once and reuses one pooled HTTP session.
+
+    Keeps send counters, per-error-code counts and a rolling window of send latencies.
+    """
+
+    def __init__(self, credentials_path: str = None, project_id: str = None, base_url: str = FCM_BASE_URL,
+                 pool_size: int = FCM_POOL_SIZE, timeout: float = FCM_TIMEOUT, latency_window: int = 1000):
+        self.credentials_path = credentials_path or os.environ.get("FIREBASE_CREDENTIALS_PATH")
+        self.project_id = project_id or os.environ.get("FIREBASE_PROJECT_ID")
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session: Optional[AuthorizedSession] = None
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="fcm-send")
+        self._init_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._errors = Counter()
+        self._sent = 0
+        self._failed = 0
+
+    # ------------------------------------------------------------------
+    # Initialisation
+    # ------------------------------------------------------------------
+
+    def _ensure_initialized(self):
+        """Initialise Firebase and the pooled session once per process"""
+        if self.session is not None:
+            return
+        with self._init_lock:
+            if self.session is not None:
+                return
+
+            if self.base_url != DEFAULT_FCM_BASE_URL:
+                # Local fake FCM endpoint: never send Google credentials to it
+                auth_credentials = AnonymousCredentials()
+                self.project_id = self.project_id or "local-project"
+            else:
+                if not firebase_admin._apps:
+                    firebase_admin.initialize_app(credentials.Certificate(self.credentials_path))
+                    logger.info("🔥 Firebase app initialized")
+                app = firebase_admin.get_app()
+                self.project_id = self.project_id or app.project_id
+                auth_credentials = app.credential.get_credential().with_scopes([FCM_SCOPE])
+
+            session = AuthorizedSession(auth_credentials)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self.session = session
+
+    @property
+    def send_url(self) -> str:
+        return f"{self.base_url}/v1/projects/{self.project_id}/messages:send"
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def build_message(token: str, title: str, body: str, data: Dict = None) -> Dict:
+        """Build an FCM v1 message (data values must be strings)"""
+        return {
+            "token": token,
+            "notification": {"title": title, "body": body},
+            "data": {key: str(value) for key, value in (data or {}).items()}
+        }
+
+    def send(self, message: Dict) -> Dict:
+        """Send one FCM v1 message. Returns a result dict; never raises"""
+        self._ensure_initialized()
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.send_url, json={"message": message}, timeout=self.timeout)
+            if response.status_code == 200:
+                result = {"success": True, "message_id": response.json().get("name"), "error": None, "code": None}
+            else:
+                code, error = self._parse_error(response)
+                result = {"success": False, "message_id": None, "error": error, "code": code}
+        except requests.RequestException as e:
+            result = {"success": False, "message_id": None, "error": str(e), "code": "NETWORK_ERROR"}
+
+        result["retryable"] = result["code"] in RETRYABLE_CODES
+        result["token_invalid"] = result["code"] in INVALID_TOKEN_CODES
+        self._record(result, time.perf_counter() - start)
+        return result
+
+    def send_each(self, messages: List[Dict]) -> List[Dict]:
+        """Send messages concurrently over the pooled session; results keep the input order"""
+        if not messages:
+            return []
+        self._ensure_initialized()
+        return list(self.executor.map(self.send, messages))
+
+    @staticmethod
+    def _parse_error(response: requests.Response):
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            error = {}
+        code = error.get("status")
+        for detail in error.get("details", []):
+            if detail.get("errorCode"):
+                code = detail["errorCode"]
+                break
+        if not code:
+            code = "QUOTA_EXCEEDED" if response.status_code == 429 else "UNAVAILABLE" if response.status_code >= 500 else "UNKNOWN"
+        return code, error.get("message") or f"HTTP {response.status_code}"
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _record(self, result: Dict, elapsed: float):
+        with self._metrics_lock:
+            self._latencies.append(elapsed * 1000)
+            if result["success"]:
+                self._sent += 1
+            else:
+                self._failed += 1
+                self._errors[result["code"]] += 1
+
+    def get_metrics(self) -> Dict:
+        """Send counts, error counts by FCM code and latency percentiles (ms) over the recent window"""
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            errors = dict(self._errors)
+            sent, failed = self._sent, self._failed
+
+        def percentile(p: float) -> Optional[float]:
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 2) if latencies else None
+
+        return {
+            "sent": sent,
+            "failed": failed,
+            "errors": errors,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 2) if latencies else None
+            }
+        }
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self._latencies.clear()
+            self._errors.clear()
+            self._sent = 0
+            self._failed = 0
+
+
+# Global notification client instance
+notification_client = NotificationClient()
+
+def send_notification(token: str, title: str, body: str, data: Dict = None) -> Dict:
+    """Send one notification through the shared client"""
+    return notification_client.send(NotificationClient.build_message(token, title, body, data))
@@ -8,11 +8,13 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from agent.bg_running.background_alert_service import start_alert_service, stop_alert_service, get_service_status
+from agent.bg_running.extraction_queue import start_extraction_workers, stop_extraction_workers, extraction_queue
 
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
     print("\n🛑 Shutting down services...")
     stop_alert_service()
+    stop_extraction_workers()
     sys.exit(0)
 
 def main():
@@ -23,12 +25,14 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    # Start the service
+    # Start the services
     start_alert_service()
+    start_extraction_workers()
     
     print("✅ Background Alert Service started successfully!")
-    print("📋 Service will check for alerts every minute")
-    print("💡 New recommendations will be generated every 4 hours")
+    print("📋 Alerts are sent at their trigger time (Postgres LISTEN/NOTIFY on alert changes)")
+    print("💡 Activity analysis, recommendations and cleanup run as independent periodic jobs (see job_runs)")
+    print(f"📥 {extraction_queue.workers} extraction workers are processing queued captures")
     print("🔔 Press Ctrl+C to stop the service")
     
     try:
@@ -37,10 +41,13 @@ def main():
             if not status['running']:
                 print("⚠️ Service stopped unexpectedly, restarting...")
                 start_alert_service()
+            if not extraction_queue.running:
+                start_extraction_workers()
             time.sleep(60)
     except KeyboardInterrupt:
         print("\n🛑 Service stopped by user")
         stop_alert_service()
+        stop_extraction_workers()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+import sys
+import os
+import time
+import threading
+import logging
+from typing import Dict, Iterable, List
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.base.alchemy_storage import DatabaseManager
+from core.base.pg_listener import PgListener
+from database.alchemy_models import FCMToken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CHANNEL = "fcm_token_changes"
+# Safety net in case a change notification is missed; invalidation normally happens through NOTIFY
+TOKEN_CACHE_TTL = int(os.environ.get("TOKEN_CACHE_TTL", "300"))
+
+
+class TokenDirectory:
+    """Active FCM device tokens per user, read with one indexed query per lookup and cached.
+
+    Entries are invalidated by the fcm_tokens trigger (LISTEN fcm_token_changes), by register/deactivate
+    calls in this process, and by TTL as a fallback.
+    """
+
+    def __init__(self, db: DatabaseManager = None, ttl: int = TOKEN_CACHE_TTL):
+        self.db = db or DatabaseManager()
+        self.ttl = ttl
+        self._cache: Dict[str, tuple] = {}  # user_id -> (loaded_at, [tokens])
+        # Bumped by every invalidation, so a load that raced with one is not cached: per user, and for clear()
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.listener = PgListener([TOKEN_CHANNEL], self._on_notify, on_reconnect=self.clear)
+        self.stats = {"hits": 0, "misses": 0, "queries": 0}
+
+    def start(self):
+        """Follow token changes made by other processes"""
+        self.listener.start()
+
+    def stop(self):
+        self.listener.stop()
+
+    def get_tokens_for_users(self, user_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Return every active device token of each user (users without devices map to [])"""
+        user_ids = {str(user_id) for user_id in user_ids}
+        now = time.monotonic()
+        result, missing = {}, []
+
+        with self._lock:
+            for user_id in user_ids:
+                cached = self._cache.get(user_id)
+                if cached and now - cached[0] < self.ttl:
+                    result[user_id] = list(cached[1])
+                else:
+                    missing.append(user_id)
+            self.stats["hits"] += len(user_ids) - len(missing)
+            self.stats["misses"] += len(missing)
+            epoch = self._epoch
+            generations = {user_id: self._generations.get(user_id, 0) for user_id in missing}
+
+        if missing:
+            loaded = self._load(missing)
+            with self._lock:
+                for user_id in missing:
+                    tokens = loaded.get(user_id, [])
+                    result[user_id] = list(tokens)
+                    # Invalidated while loading: the rows read may predate the change, so leave it uncached
+                    if self._epoch == epoch and self._generations.get(user_id, 0) == generations[user_id]:
+                        self._cache[user_id] = (now, tokens)
+        return result
+
+    def _load(self, user_ids: List[str]) -> Dict[str, List[str]]:
+        """One query for all requested users (served by idx_fcm_tokens_user_active)"""
+        with self.db.get_session() as session:
+            try:
+                self.stats["queries"] += 1
+                rows = session.query(FCMToken.user_id, FCMToken.token).filter(
+                    FCMToken.user_id.in_(user_ids),
+                    FCMToken.is_active == True
+                ).order_by(FCMToken.last_used.desc()).all()
+
+                tokens: Dict[str, List[str]] = {}
+                for user_id, token in rows:
+                    tokens.setdefault(str(user_id), []).append(token)
+                return tokens
+            except Exception as e:
+                # Raised rather than read as "no devices", which would be cached and skip the users' alerts
+                logger.error(f"❌ Error loading FCM tokens: {e}")
+                raise
+
+    def deactivate_tokens(self, tokens: Iterable[str]) -> int:
+        """Mark dead device tokens inactive (e.g. FCM reported UNREGISTERED)"""
+        tokens = list(tokens)
+        if not tokens:
+            return 0
+        with self.db.get_session() as session:
+            try:
+                affected = session.query(FCMToken.user_id).filter(FCMToken.token.in_(tokens)).distinct().all()
+                updated = session.query(FCMToken).filter(
+                    FCMToken.token.in_(tokens)
+                ).update({'is_active': False}, synchronize_session=False)
+                session.commit()
+                for (user_id,) in affected:
+                    self.invalidate(str(user_id))
+                if updated:
+                    logger.info(f"🧹 Deactivated {updated} dead FCM tokens")
+                return updated
+            except Exception as e:
+                logger.error(f"❌ Error deactivating FCM tokens: {e}")
+                session.rollback()
+                return 0
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            user_id = str(user_id)
+            self._cache.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        """Drop the whole cache (after a listener reconnect, notifications may have been missed)"""
+        with self._lock:
+            self._cache.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def _on_notify(self, channel: str, payload):
+        if payload:
+            self.invalidate(str(payload))
+
+
+# Global token directory instance
+token_directory = TokenDirectory()
+
+def get_tokens_for_users(user_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Get all active device tokens for the given users"""
+    return token_directory.get_tokens_for_users(user_ids)
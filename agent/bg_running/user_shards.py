@@ -0,0 +1,88 @@
+import os
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per process; a user's work always runs on the same thread, one job at a time
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", "4"))
+# Run several background processes (e.g. one per host) with the same count and distinct indexes;
+# each one only serves the users that hash to its index
+BACKGROUND_INSTANCE_COUNT = int(os.environ.get("BACKGROUND_INSTANCE_COUNT", "1"))
+BACKGROUND_INSTANCE_INDEX = int(os.environ.get("BACKGROUND_INSTANCE_INDEX", "0"))
+
+
+def user_hash(user_id: str) -> int:
+    """Stable hash of a user id (the same in every process, unlike hash())"""
+    return zlib.crc32(str(user_id).encode("utf-8"))
+
+
+class UserShards:
+    """Partitions per-user background work by a hash of the user id.
+
+    The hash first picks the instance (process) that owns a user, then one of this process's worker
+    threads. Every user is served by exactly one single-threaded shard, so work for one user never runs
+    concurrently while different users are processed in parallel.
+    """
+
+    def __init__(self, workers: int = BACKGROUND_WORKERS, instance_count: int = BACKGROUND_INSTANCE_COUNT,
+                 instance_index: int = BACKGROUND_INSTANCE_INDEX):
+        if instance_count < 1 or not 0 <= instance_index < instance_count:
+            raise ValueError(f"Invalid shard instance {instance_index} of {instance_count}")
+        self.workers = max(workers, 1)
+        self.instance_count = instance_count
+        self.instance_index = instance_index
+        self.executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"user-shard-{shard}")
+            for shard in range(self.workers)
+        ]
+
+    def owns(self, user_id: str) -> bool:
+        """Whether this process is responsible for the user"""
+        return user_hash(user_id) % self.instance_count == self.instance_index
+
+    def shard_for(self, user_id: str) -> int:
+        """Worker thread index of the user within this process"""
+        return (user_hash(user_id) // self.instance_count) % self.workers
+
+    def filter_owned(self, user_ids: Iterable[str]) -> List[str]:
+        return [user_id for user_id in user_ids if self.owns(user_id)]
+
+    def run(self, user_ids: Iterable[str], task: Callable[[str], Dict]) -> Dict[str, Dict]:
+        """Run task(user_id) for every owned user on its shard and wait for all of them.
+
+        Returns the result per user; a task that raises is reported as {"success": False, "error": ...}.
+        """
+        futures = {
+            user_id: self.executors[self.shard_for(user_id)].submit(task, user_id)
+            for user_id in dict.fromkeys(self.filter_owned(user_ids))
+        }
+        results = {}
+        for user_id, future in futures.items():
+            try:
+                results[user_id] = future.result()
+            except Exception as e:
+                logger.error(f"❌ Background task failed for user {user_id}: {e}")
+                results[user_id] = {"success": False, "error": str(e)}
+        return results
+
+    def get_status(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "instance_index": self.instance_index,
+            "instance_count": self.instance_count
+        }
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.shutdown(wait=True)
+
+
+# Global user shards instance
+user_shards = UserShards()
+
+def run_for_users(user_ids: Iterable[str], task: Callable[[str], Dict]) -> Dict[str, Dict]:
+    """Run a per-user task across the worker shards of this process"""
+    return user_shards.run(user_ids, task)
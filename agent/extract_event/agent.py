@@ -15,10 +15,17 @@ import dotenv
 from langchain_openai import ChatOpenAI
 from agent.extract_event.services import create_event, get_all_events, get_upcoming_events, find_similar_events, modify_event
 from agent.extract_event.prompt import EXTRACT_EVENT_SYSTEM_PROMPT, INTENT_DETECTION_PROMPT, UPDATE_EVENT_PROMPT
+from core.base.agent_registry import get_shared_agent
+from agent.extract_event.intent_classifier import intent_classifier
+from core.utils.interval_index import build_event_index, event_interval
+from database.alchemy_models import EVENT_EXCLUSION_CONSTRAINT
 
 dotenv.load_dotenv()
 
 openai_api = os.environ.get("OPENAI_API_KEY")
+# New events are checked for overlaps with the upcoming events of this many days
+EVENT_CONFLICT_DAYS = int(os.environ.get("EVENT_CONFLICT_DAYS", "30"))
+
 class EventState(TypedDict):
     """State for the event extraction agent."""
     user_input: str
@@ -27,19 +34,20 @@ class EventState(TypedDict):
     validated_events: List[dict]
     saved_result: str
     error: Optional[str]
+    failed: bool  # error came from an exception (LLM, database), not from the input, e.g. no events found
     current_datetime: str
     user_timezone: str
 
 class EventExtractionAgent:
     def __init__(self, llm: ChatOpenAI = None, db: DatabaseManager = None):
-        self.llm = ChatOpenAI(
+        self.llm = llm or ChatOpenAI(
             model_name="gpt-4o-mini",
             temperature=0.1,
             max_tokens=1000,
             base_url="https://warranty-api-dev.picontechnology.com:8443",
             openai_api_key=openai_api,
         )
-        self.db = DatabaseManager()
+        self.db = db or DatabaseManager()
         
         self.graph = self._create_graph()
 
@@ -84,7 +92,7 @@ Use the context to better understand relative time references and implicit infor
             
         except Exception as e:
             print(f"❌ Error extracting events: {e}")
-            return {"error": f"Error extracting events: {str(e)}"}
+            return {"error": f"Error extracting events: {str(e)}", "failed": True}
 
     def _update_node(self, state: EventState) -> dict:
         """Modify existing events based on user input."""
@@ -139,7 +147,7 @@ Use the context to better understand relative time references and implicit infor
             
         except Exception as e:
             print(f"❌ Error modifying events: {e}")
-            return {"error": f"Error modifying events: {str(e)}"}
+            return {"error": f"Error modifying events: {str(e)}", "failed": True}
 
     def _search_node(self, state: EventState) -> dict:
         """Search for existing events based on user input."""
@@ -162,10 +170,16 @@ Use the context to better understand relative time references and implicit infor
             
         except Exception as e:
             print(f"❌ Error searching events: {e}")
-            return {"error": f"Error searching events: {str(e)}"}
+            return {"error": f"Error searching events: {str(e)}", "failed": True}
 
     def _detect_intent(self, user_input: str) -> str:
-            """Detect user intent using LLM for multilingual support"""
+        """Detect user intent locally, using the LLM only for low-confidence inputs"""
+        intent, confidence, source = intent_classifier.detect(user_input, self._detect_intent_with_llm)
+        print(f"🎯 Detected intent: {intent} ({source}, confidence {confidence:.2f})")
+        return intent
+
+    def _detect_intent_with_llm(self, user_input: str) -> Optional[str]:
+            """Detect user intent using LLM for multilingual support (None if the LLM gave no valid answer)"""
             prompt =f"""
         {INTENT_DETECTION_PROMPT}
         User input: {user_input}
@@ -180,15 +194,15 @@ Use the context to better understand relative time references and implicit infor
                 # Validate response
                 valid_intents = ["CREATE", "UPDATE", "SEARCH"]
                 if intent not in valid_intents:
-                    print(f"⚠️ Invalid intent detected: {intent}, defaulting to CREATE")
-                    return "CREATE"
+                    print(f"⚠️ Invalid intent detected: {intent}, using the local guess")
+                    return None
                 
                 print(f"🎯 Detected intent: {intent}")
                 return intent
                 
             except Exception as e:
-                print(f"❌ Error detecting intent: {e}, defaulting to CREATE")
-                return "CREATE"
+                print(f"❌ Error detecting intent: {e}, using the local guess")
+                return None
 
     def _validate_node(self, state: EventState) -> dict:
         try:
@@ -198,6 +212,8 @@ Use the context to better understand relative time references and implicit infor
 
             validated_events = []
             current_datetime = state.get("current_datetime", datetime.now().isoformat())
+            # Existing upcoming events plus the ones validated so far, for overlap checks
+            conflict_index = build_event_index(get_upcoming_events(days_ahead=EVENT_CONFLICT_DAYS))
             
             for event in extracted_events:
                 validation_errors = []
@@ -232,8 +248,20 @@ Use the context to better understand relative time references and implicit infor
                     if event['priority'].lower() not in valid_priorities:
                         event['priority'] = 'medium'
                 
+                interval = event_interval(event) if not validation_errors else None
+                if interval:
+                    conflicts = conflict_index.overlapping(*interval)
+                    if conflicts:
+                        names = ", ".join(str(conflict.get("event_name")) for conflict in conflicts)
+                        if EVENT_EXCLUSION_CONSTRAINT:
+                            validation_errors.append(f"Overlaps with: {names}.")
+                        else:
+                            event["warning"] = " ".join(filter(None, [event.get("warning"), f"Overlaps with: {names}."]))
+
                 if not validation_errors:
                     validated_events.append(event)
+                    if interval:
+                        conflict_index.add(*interval, event)
                 else:
                     print(f"❌ Validation errors for event {event.get('event_name')}: {', '.join(validation_errors)}")
             
@@ -245,7 +273,7 @@ Use the context to better understand relative time references and implicit infor
             
         except Exception as e:
             print(f"❌ Error validating events: {e}")
-            return {"error": f"Error validating events: {str(e)}"}
+            return {"error": f"Error validating events: {str(e)}", "failed": True}
         
     def _save_node(self, state: EventState) -> dict:
         """Save validated events to the database."""
@@ -291,12 +319,14 @@ Use the context to better understand relative time references and implicit infor
                     for event in saved_result
                 ]
                 event_locations = [str(event.get("location", "No location")) for event in saved_result]
+                warnings = [f"{event.get('event_name')}: {event['warning']}" for event in validated_events if event.get("warning")]
                 
                 result_message = (
                     f"Saved {save_count} events successfully! Events:\n" +
                     "\n".join(event_names) +
                     "\nTimes: " + ", ".join(event_times) +
-                    "\nLocations: " + ", ".join(event_locations)
+                    "\nLocations: " + ", ".join(event_locations) +
+                    ("\nWarnings: " + "; ".join(warnings) if warnings else "")
                 )
                 print(f"💾 Saved {len(saved_result)} events successfully")
             
@@ -304,7 +334,7 @@ Use the context to better understand relative time references and implicit infor
         
         except Exception as e:
             print(f"❌ Error saving events: {e}")
-            return {"error": f"Error saving events: {str(e)}"}
+            return {"error": f"Error saving events: {str(e)}", "failed": True}
     def _should_continue(self, state: EventState) -> Literal["extract", "update", "search", "delete", "end"]:
         """Enhanced continuation logic with intent detection"""
         if state.get("error"):
@@ -313,7 +343,7 @@ Use the context to better understand relative time references and implicit infor
         user_input = state.get("user_input", "")
         if not user_input.strip():
             return "end"
-        # Detect intent using LLM
+        # Detect intent (local fast path, LLM fallback)
         intent = self._detect_intent(user_input)
         
         if intent == "CREATE":
@@ -387,11 +417,16 @@ Use the context to better understand relative time references and implicit infor
         
         raise ValueError(f"Unable to parse datetime: {datetime_str}")
 
-    def process(self, user_input: str) -> str:
-        """Process user input and extract events"""
+    def process(self, user_input: str, session_id: str = None, raise_errors: bool = False) -> str:
+        """Process user input and extract events.
+
+        With raise_errors, failures (exceptions from the LLM or the database) raise instead of being returned as
+        a message; outcomes such as no events found are still returned.
+        """
         try:
-            initialize_session(self.db)
-            session_id = st.session_state.get('single_session_id')
+            if not session_id:
+                initialize_session(self.db)
+                session_id = st.session_state.get('single_session_id')
             current_datetime = datetime.now().isoformat()
             #current_profile = get_user_profile()
             if session_id:
@@ -407,10 +442,14 @@ Use the context to better understand relative time references and implicit infor
                 "validated_events": [],
                 "saved_result": "",
                 "error": None,
+                "failed": False,
                 "current_datetime": current_datetime,
                 "user_timezone": "UTC"
             })
             
+            if result.get("failed") and raise_errors:
+                raise RuntimeError(result["error"])
+
             if result.get("error"):
                 return f"❌ Error: {result['error']}"
             
@@ -421,16 +460,22 @@ Use the context to better understand relative time references and implicit infor
         except Exception as e:
             error_msg = f"❌ Event processing failed: {str(e)}"
             print(error_msg)
+            if raise_errors:
+                raise
             return error_msg
 
 def create_event_extraction_agent(llm: ChatOpenAI = None, db: DatabaseManager = None) -> EventExtractionAgent:
     """Factory function to create event extraction agent"""
     return EventExtractionAgent(llm, db)
 
-def save_event_extraction_agent(user_input: str) -> Optional[str]:
+def get_event_extraction_agent() -> EventExtractionAgent:
+    """Get the shared event extraction agent (built once per process)"""
+    return get_shared_agent("event_extraction", create_event_extraction_agent)
+
+def save_event_extraction_agent(user_input: str, session_id: str = None) -> Optional[str]:
     """Save the event extraction agent to a file"""
-    agent = create_event_extraction_agent()
-    result = agent.process(user_input)
+    agent = get_event_extraction_agent()
+    result = agent.process(user_input, session_id)
     if not result:
         print(f"❌ Error saving agent: {result}")
         return ""
@@ -0,0 +1,102 @@
+"""Accuracy/latency benchmark for the local event intent classifier.
+
+Usage:
+    python -m agent.extract_event.benchmark_intent            # local classifier only
+    python -m agent.extract_event.benchmark_intent --with-llm # also time the LLM fallback path
+"""
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.extract_event.intent_classifier import IntentClassifier, INTENTS
+
+# Held-out inputs (not part of LABELLED_EXAMPLES)
+BENCHMARK_CASES = [
+    ("I have a doctor's appointment next Tuesday at 9", "CREATE"),
+    ("set up a sync with Sarah on Friday at 3pm", "CREATE"),
+    ("team workshop tomorrow morning at the office", "CREATE"),
+    ("deadline for the thesis is Thursday", "CREATE"),
+    ("plan a dinner with my parents this weekend", "CREATE"),
+    ("add a reminder to pay rent on the 1st", "CREATE"),
+    ("mai tôi có buổi thuyết trình lúc 8 giờ", "CREATE"),
+    ("sáng mai có cuộc hẹn với khách hàng ở quận 1", "CREATE"),
+    ("toi mai toi co cuoc hop voi team", "CREATE"),
+    ("tạo sự kiện sinh nhật bạn vào thứ bảy", "CREATE"),
+    ("push back my call with Sarah by an hour", "UPDATE"),
+    ("cancel tomorrow's workshop", "UPDATE"),
+    ("change the dinner to 8pm instead of 7pm", "UPDATE"),
+    ("reschedule the thesis meeting", "UPDATE"),
+    ("đổi lịch thuyết trình sang chiều mai", "UPDATE"),
+    ("hủy cuộc hẹn với khách hàng", "UPDATE"),
+    ("doi lich hop sang thu sau", "UPDATE"),
+    ("sửa giờ buổi họp thành 10 giờ", "UPDATE"),
+    ("what's on my calendar today?", "SEARCH"),
+    ("do I have anything on Saturday?", "SEARCH"),
+    ("show my appointments this week", "SEARCH"),
+    ("when is the dinner with my parents?", "SEARCH"),
+    ("hôm nay tôi có lịch gì?", "SEARCH"),
+    ("xem các cuộc họp tuần sau", "SEARCH"),
+    ("tim cuoc hen voi khach hang", "SEARCH"),
+    ("buổi thuyết trình là lúc mấy giờ vậy", "SEARCH"),
+]
+
+
+def run_benchmark(with_llm: bool = False) -> dict:
+    """Run the benchmark and print a short report"""
+    classifier = IntentClassifier()
+    llm_fallback = None
+    if with_llm:
+        from agent.extract_event.agent import get_event_extraction_agent
+        llm_fallback = get_event_extraction_agent()._detect_intent_with_llm
+
+    correct, local_correct, local_count = 0, 0, 0
+    latencies, local_latencies = [], []
+    confusion = {expected: {predicted: 0 for predicted in INTENTS} for expected in INTENTS}
+
+    for text, expected in BENCHMARK_CASES:
+        start = time.perf_counter()
+        if with_llm:
+            predicted, confidence, source = classifier.detect(text, llm_fallback)
+        else:
+            predicted, confidence = classifier.classify(text)
+            source = "local" if confidence >= classifier.threshold else "below_threshold"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        latencies.append(elapsed_ms)
+
+        confusion[expected][predicted] += 1
+        correct += predicted == expected
+        if source == "local":
+            local_count += 1
+            local_correct += predicted == expected
+            local_latencies.append(elapsed_ms)
+
+        marker = "✅" if predicted == expected else "❌"
+        print(f"{marker} [{source:>15}] {confidence:.2f} {predicted:<6} (expected {expected:<6}) {text}")
+
+    total = len(BENCHMARK_CASES)
+    report = {
+        "cases": total,
+        "accuracy": correct / total,
+        "local_coverage": local_count / total,
+        "local_accuracy": local_correct / local_count if local_count else 0.0,
+        "median_latency_ms": statistics.median(latencies),
+        "p95_latency_ms": sorted(latencies)[int(0.95 * (total - 1))],
+        "median_local_latency_ms": statistics.median(local_latencies) if local_latencies else 0.0,
+    }
+
+    print("=" * 60)
+    print(f"Overall accuracy:       {report['accuracy']:.1%}")
+    print(f"Handled locally:        {report['local_coverage']:.1%} (threshold {classifier.threshold})")
+    print(f"Local accuracy:         {report['local_accuracy']:.1%}")
+    print(f"Median latency:         {report['median_latency_ms']:.3f} ms")
+    print(f"P95 latency:            {report['p95_latency_ms']:.3f} ms")
+    print("Confusion (rows = expected):")
+    for expected, row in confusion.items():
+        print(f"  {expected:<6} " + "  ".join(f"{predicted}={count}" for predicted, count in row.items()))
+    return report
+
+
+if __name__ == "__main__":
+    run_benchmark(with_llm="--with-llm" in sys.argv)
@@ -0,0 +1,251 @@
+import os
+import re
+import math
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Intents the event graph can route to
+INTENTS = ["CREATE", "UPDATE", "SEARCH"]
+
+# Below this confidence the classifier defers to the LLM
+INTENT_CONFIDENCE_THRESHOLD = float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.7"))
+
+# Keyword/regex rules (English + Vietnamese), written with diacritics and matched on accent-stripped text
+# so "hủy lịch" and "huy lich" both hit. Weights follow the scoring system of INTENT_DETECTION_PROMPT.
+INTENT_RULES = {
+    "CREATE": [
+        (r"^(schedule|book|plan|arrange|set up|create|add|organi[sz]e)\b", 3),
+        (r"\b(schedule|book|arrange|set up|make an? appointment|new event|remind me)\b", 2),
+        (r"\b(i have|i've got|we have|there is) (a|an)? ?(meeting|appointment|call|interview|class|exam|event)\b", 3),
+        (r"\b(meeting|appointment|interview|deadline|conference) (with|at|on)\b", 1),
+        (r"\b(tomorrow|tonight|next (week|month|monday|tuesday|wednesday|thursday|friday|saturday|sunday)|this (evening|weekend))\b", 1),
+        (r"\b(will|going to|planning to)\b", 1),
+        (r"^(đặt lịch|tạo|thêm|sắp xếp|lên lịch|tổ chức|nhắc tôi)\b", 3),
+        (r"\b(đặt lịch|lên lịch|sự kiện mới|nhắc tôi|hẹn)\b", 2),
+        (r"\b(tôi|mình|em|anh|chị)? ?(có|sẽ có) (cuộc họp|buổi|cuộc hẹn|lịch hẹn|meeting|hẹn|lịch)\b", 3),
+        (r"\b(ngày mai|tối mai|sáng mai|chiều mai|tối nay|chiều nay|sáng nay|tuần tới|tháng tới|tuần sau)\b", 1),
+        (r"\b(sẽ|dự định|để chuẩn bị)\b", 1),
+    ],
+    "UPDATE": [
+        (r"^(change|modify|update|reschedule|move|shift|postpone|cancel|edit|adjust)\b", 3),
+        (r"\b(change|modify|update|reschedule|move|shift|postpone|push back|cancel|delete|remove|edit|adjust)\b", 2),
+        (r"\b(instead of|no longer|not (going|attending) anymore)\b", 2),
+        (r"^(thay đổi|sửa|chỉnh sửa|đổi|chuyển|dời|hủy|hoãn|cập nhật|điều chỉnh|xóa)\b", 3),
+        (r"\b(thay đổi|chỉnh sửa|đổi lịch|dời lịch|dời|hoãn|cập nhật|điều chỉnh|hủy|xóa|không tham gia)\b", 2),
+        (r"\b(cuộc họp đã|sự kiện đã|lịch đã|buổi đã|sang ngày|sang lúc)\b", 1),
+    ],
+    "SEARCH": [
+        (r"^(find|search|show|list|what|when|check|look for|view|do i have|what's on|whats on)\b", 3),
+        (r"\b(find|search|show me|list|look up|look for|what's on|do i have any|any (events|meetings))\b", 2),
+        (r"\b(my (schedule|calendar|events|meetings|appointments)|upcoming events)\b", 1),
+        (r"\?\s*$", 1),
+        (r"^(tìm|tìm kiếm|xem|kiểm tra|danh sách|xem lịch|liệt kê)\b", 3),
+        (r"\b(tìm|tìm kiếm|xem lịch|kiểm tra lịch|có gì|lịch nào|có lịch gì|có hẹn gì|những sự kiện)\b", 2),
+        (r"\b(lịch của tôi|sự kiện nào|cuộc họp nào|không nhỉ|không vậy)\b", 1),
+    ],
+}
+
+# Labelled examples for the nearest-centroid model
+LABELLED_EXAMPLES = {
+    "CREATE": [
+        "I have a meeting with John tomorrow at 2 PM in conference room A",
+        "schedule a call with the client next Monday at 10am",
+        "remind me to call mom at 7pm tonight",
+        "book a dentist appointment on Friday morning",
+        "interview at 10 AM on July 5th",
+        "project review with the team this Thursday afternoon",
+        "tối mai tôi có cuộc họp quan trọng với thành viên trong team",
+        "chiều nay tôi có hẹn đi chơi pickle ball lúc 5h chiều",
+        "đặt lịch khám răng vào sáng thứ bảy",
+        "nhắc tôi nộp báo cáo lúc 9 giờ sáng mai",
+        "tuần sau mình có buổi phỏng vấn ở công ty FPT",
+        "lên lịch họp nhóm vào thứ hai tuần tới",
+    ],
+    "UPDATE": [
+        "move my meeting with John to 4 PM",
+        "reschedule the dentist appointment to next week",
+        "cancel the client call tomorrow",
+        "change the location of the team meeting to room B",
+        "postpone the project review until Friday",
+        "update my interview time to 11am",
+        "dời cuộc họp chiều nay sang 4 giờ",
+        "hủy lịch hẹn khám răng ngày mai",
+        "đổi địa điểm buổi họp sang phòng B",
+        "hoãn buổi phỏng vấn sang tuần sau",
+        "cập nhật giờ cuộc họp nhóm thành 3 giờ chiều",
+        "chuyển lịch họp sang thứ năm",
+    ],
+    "SEARCH": [
+        "what meetings do I have tomorrow",
+        "show me my schedule for next week",
+        "do I have any appointments on Friday",
+        "when is my interview",
+        "list all my upcoming events",
+        "find the meeting with John",
+        "ngày mai tôi có lịch gì không",
+        "xem lịch của tôi tuần này",
+        "tìm cuộc họp với anh Nam",
+        "tuần sau có sự kiện nào không",
+        "kiểm tra lịch hẹn ngày thứ sáu",
+        "cuộc phỏng vấn của tôi là lúc mấy giờ",
+    ],
+}
+
+
+def strip_accents(text: str) -> str:
+    """Remove Vietnamese diacritics so accented and unaccented input match the same rules"""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+
+def normalize_input(text: str) -> str:
+    """Normalise user input for rule matching, vectorising and cache keys"""
+    text = unicodedata.normalize("NFC", text or "").lower().strip()
+    text = re.sub(r"\s+", " ", text)
+    return strip_accents(text)
+
+
+class IntentClassifier:
+    """Local fast-path intent classifier for event management.
+
+    Combines weighted keyword/regex rules with a nearest-centroid model over hashed character n-grams
+    of the labelled examples. Confident predictions are returned instantly; anything below the threshold
+    goes to the LLM fallback. Results are cached by normalised input.
+    """
+
+    def __init__(self, threshold: float = INTENT_CONFIDENCE_THRESHOLD, cache_size: int = 1024,
+                 dimensions: int = 4096, rule_weight: float = 0.6):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.dimensions = dimensions
+        self.rule_weight = rule_weight
+        self._cache: "OrderedDict[str, Tuple[str, float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._rules = {
+            intent: [(re.compile(strip_accents(pattern)), weight) for pattern, weight in rules]
+            for intent, rules in INTENT_RULES.items()
+        }
+        self._centroids = self._build_centroids(LABELLED_EXAMPLES)
+        self.stats = {"cache_hits": 0, "local": 0, "llm": 0, "llm_failed": 0}
+
+    # ------------------------------------------------------------------
+    # Features
+    # ------------------------------------------------------------------
+
+    def _vectorize(self, normalized: str) -> Dict[int, float]:
+        """Hash character 3-5 grams (word-padded) into a sparse L2-normalised vector"""
+        vector: Dict[int, float] = {}
+        for word in normalized.split():
+            padded = f" {word} "
+            for n in (3, 4, 5):
+                for i in range(max(len(padded) - n + 1, 1)):
+                    index = zlib.crc32(padded[i:i + n].encode("utf-8")) % self.dimensions
+                    vector[index] = vector.get(index, 0.0) + 1.0
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {k: v / norm for k, v in vector.items()} if norm else vector
+
+    def _build_centroids(self, examples: Dict[str, List[str]]) -> Dict[str, Dict[int, float]]:
+        """Mean vector of each intent's labelled examples"""
+        centroids = {}
+        for intent, texts in examples.items():
+            centroid: Dict[int, float] = {}
+            for text in texts:
+                for k, v in self._vectorize(normalize_input(text)).items():
+                    centroid[k] = centroid.get(k, 0.0) + v / len(texts)
+            norm = math.sqrt(sum(v * v for v in centroid.values()))
+            centroids[intent] = {k: v / norm for k, v in centroid.items()} if norm else centroid
+        return centroids
+
+    def _rule_scores(self, normalized: str) -> Dict[str, float]:
+        return {
+            intent: float(sum(weight for pattern, weight in rules if pattern.search(normalized)))
+            for intent, rules in self._rules.items()
+        }
+
+    def _centroid_scores(self, normalized: str) -> Dict[str, float]:
+        vector = self._vectorize(normalized)
+        return {
+            intent: sum(v * centroid.get(k, 0.0) for k, v in vector.items())
+            for intent, centroid in self._centroids.items()
+        }
+
+    @staticmethod
+    def _softmax(scores: Dict[str, float], temperature: float) -> Dict[str, float]:
+        peak = max(scores.values())
+        exps = {k: math.exp((v - peak) / temperature) for k, v in scores.items()}
+        total = sum(exps.values())
+        return {k: v / total for k, v in exps.items()}
+
+    # ------------------------------------------------------------------
+    # Prediction
+    # ------------------------------------------------------------------
+
+    def classify(self, user_input: str) -> Tuple[str, float]:
+        """Predict (intent, confidence) locally without any network call"""
+        normalized = normalize_input(user_input)
+        rule_scores = self._rule_scores(normalized)
+        centroid_probs = self._softmax(self._centroid_scores(normalized), temperature=0.05)
+
+        if any(rule_scores.values()):
+            rule_probs = self._softmax(rule_scores, temperature=1.0)
+            probs = {
+                intent: self.rule_weight * rule_probs[intent] + (1 - self.rule_weight) * centroid_probs[intent]
+                for intent in INTENTS
+            }
+        else:
+            # No keyword evidence at all: trust the centroid model only half as much
+            probs = {intent: 0.5 * centroid_probs[intent] for intent in INTENTS}
+
+        intent = max(probs, key=probs.get)
+        return intent, probs[intent]
+
+    def _remember(self, normalized: str, intent: str, confidence: float, source: str):
+        with self._lock:
+            self._cache[normalized] = (intent, confidence, source)
+            self._cache.move_to_end(normalized)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def detect(self, user_input: str, llm_fallback: Optional[Callable[[str], Optional[str]]] = None) -> Tuple[str, float, str]:
+        """Return (intent, confidence, source) where source is "cache", "local" or "llm".
+
+        llm_fallback returns None when it has no answer (error, invalid output); the local guess is used then
+        and nothing is cached, so the next call asks the LLM again.
+        """
+        normalized = normalize_input(user_input)
+        with self._lock:
+            cached = self._cache.get(normalized)
+            if cached:
+                self._cache.move_to_end(normalized)
+                self.stats["cache_hits"] += 1
+                return cached[0], cached[1], "cache"
+
+        intent, confidence = self.classify(user_input)
+        source = "local"
+        if confidence < self.threshold and llm_fallback is not None:
+            answer = llm_fallback(user_input)
+            if answer is None:
+                self.stats["llm_failed"] += 1
+                return intent, confidence, source
+            intent, confidence, source = answer, 1.0, "llm"
+
+        self.stats[source] += 1
+        self._remember(normalized, intent, confidence, source)
+        return intent, confidence, source
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Global intent classifier instance
+intent_classifier = IntentClassifier()
+
+def classify_event_intent(user_input: str, llm_fallback: Optional[Callable[[str], Optional[str]]] = None) -> str:
+    """Classify event intent locally, falling back to the LLM below the confidence threshold"""
+    intent, _, _ = intent_classifier.detect(user_input, llm_fallback)
+    return intent
@@ -21,6 +21,7 @@ from agent.extract_user_info.services import update_user_profile
 from core.utils.get_current_profile import get_user_profile
 from core.base.schema import UserInformation
 from agent.extract_user_info.prompt import EXTRACT_USER_INFORMATION_PROMPT
+from core.base.agent_registry import get_shared_agent
 
 class UserInfoState(TypedDict):
     """State for user information extraction"""
@@ -30,6 +31,7 @@ class UserInfoState(TypedDict):
     validated_info: dict
     save_result: str
     error: Optional[str]
+    failed: bool  # error came from an exception (LLM, database), not from the input
 
 class UserInfoExtractionAgent:
     """User information extraction agent"""
@@ -121,7 +123,7 @@ USER INPUT TO ANALYZE:
 
         except Exception as e:
             print(f"❌ Error extracting user information: {e}")
-            return {"error": f"Failed to extract user information: {str(e)}"}
+            return {"error": f"Failed to extract user information: {str(e)}", "failed": True}
     
     def _validate_node(self, state: UserInfoState) -> dict:
         """Validate the extracted user information"""
@@ -166,7 +168,7 @@ USER INPUT TO ANALYZE:
             
         except Exception as e:
             print(f"❌ Error validating user information: {e}")
-            return {"error": f"Failed to validate user information: {str(e)}"}
+            return {"error": f"Failed to validate user information: {str(e)}", "failed": True}
     
     def _save_node(self, state: UserInfoState) -> dict:
         """Save the validated user information to the database"""
@@ -192,7 +194,7 @@ USER INPUT TO ANALYZE:
                 
         except Exception as e:
             print(f"❌ Error saving user information: {e}")
-            return {"error": f"Failed to save user information: {str(e)}"}
+            return {"error": f"Failed to save user information: {str(e)}", "failed": True}
     
     def _should_continue(self, state: UserInfoState) -> Literal["validate", "end"]:
         """Determine if the state should continue to validation"""
@@ -271,8 +273,8 @@ USER INPUT TO ANALYZE:
         """Validate user name"""
         return isinstance(name, str) and len(name.strip()) >= 2
     
-    def process(self, user_input: str) -> dict:
-        """Process user input and extract user information"""
+    def process(self, user_input: str, raise_errors: bool = False) -> dict:
+        """Process user input and extract user information (with raise_errors, failures raise instead of returning an error)"""
         try:
             # Get current profile
             current_profile = get_user_profile() or {}
@@ -286,9 +288,13 @@ USER INPUT TO ANALYZE:
                 "extracted_info": {},
                 "validated_info": {},
                 "save_result": "",
-                "error": None
+                "error": None,
+                "failed": False
             })
             
+            if result.get("failed") and raise_errors:
+                raise RuntimeError(result["error"])
+
             if result.get("error"):
                 error_msg = f"❌ Error: {result['error']}"
                 print(error_msg)
@@ -308,6 +314,8 @@ USER INPUT TO ANALYZE:
         except Exception as e:
             error_msg = f"❌ Processing failed: {str(e)}"
             print(error_msg)
+            if raise_errors:
+                raise
             return {"error": str(e), "success": False}
     
     def get_current_profile(self) -> dict:
@@ -327,10 +335,14 @@ def create_user_info_extraction_agent(llm: ChatOpenAI = None) -> UserInfoExtract
     """Factory function to create user info extraction agent"""
     return UserInfoExtractionAgent(llm)
 
+def get_user_info_extraction_agent() -> UserInfoExtractionAgent:
+    """Get the shared user info extraction agent (built once per process)"""
+    return get_shared_agent("user_info_extraction", create_user_info_extraction_agent)
+
 # Convenience function for backwards compatibility
 def save_user_information(user_input: str) -> str:
     """Process user input and save user information (backwards compatibility)"""
-    agent = create_user_info_extraction_agent()
+    agent = get_user_info_extraction_agent()
     result = agent.process(user_input)
     if result.get("success"):
         return result.get("message", "User information saved successfully heheheheh")
@@ -1,14 +1,22 @@
 # Create: agent/recommendation/activity_analyzer.py
 import sys
 import os
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from langchain_openai import ChatOpenAI
-from agent.recommendation.services_alchemy import get_all_activities, create_activity_analysis, get_activity_analysis, update_activity_analysis, get_pending_activities, mark_activities_analyzed
+from agent.recommendation.services_alchemy import get_all_activities, get_pending_activities, get_activities_since, get_all_activity_analysis, save_activity_analyses, DEFAULT_USER_ID
 from collections import defaultdict, Counter
-from agent.recommendation.prompt import ACTIVITY_ANALYSIS_PROMPT
-from core.base.schema import ActivityAnalysis
+from agent.recommendation.prompt import ACTIVITY_NARRATIVE_PROMPT
+from agent.recommendation.activity_types import resolve_activity_types, normalize_term
+from agent.recommendation.activity_stats import fold_activities, summarize_aggregates, narrative_baseline, narrative_drift
+from core.base.schema import ActivityNarrative
 from core.base.alchemy_storage import DatabaseManager
+from core.utils.rate_limiter import llm_rate_limiter
 import json
 import dotenv
 
@@ -26,6 +34,18 @@ logger = logging.getLogger(__name__)
 dotenv.load_dotenv()
 db = DatabaseManager()
 
+# Activity groups analyzed concurrently (shared by every user being analyzed in this process)
+ANALYSIS_MAX_WORKERS = int(os.environ.get("ANALYSIS_MAX_WORKERS", "4"))
+# Extra attempts for a group whose LLM call failed, with exponential backoff starting at ANALYSIS_RETRY_BACKOFF seconds
+ANALYSIS_MAX_RETRIES = int(os.environ.get("ANALYSIS_MAX_RETRIES", "2"))
+ANALYSIS_RETRY_BACKOFF = float(os.environ.get("ANALYSIS_RETRY_BACKOFF", "2"))
+# Days of history folded in when an activity type has no running aggregates yet
+ACTIVITY_STATS_WINDOW_DAYS = int(os.environ.get("ACTIVITY_STATS_WINDOW_DAYS", "90"))
+# The description is rewritten once the statistics drifted this far (0-1) from the ones it was written for
+ANALYSIS_DRIFT_THRESHOLD = float(os.environ.get("ANALYSIS_DRIFT_THRESHOLD", "0.2"))
+# How many recent occurrences the narrative prompt shows
+NARRATIVE_SAMPLE_SIZE = int(os.environ.get("NARRATIVE_SAMPLE_SIZE", "5"))
+
 class ActivityAnalyzer:
     def __init__(self):
         self.llm = ChatOpenAI(
@@ -34,27 +54,14 @@ class ActivityAnalyzer:
             api_key=os.environ.get("OPENAI_API_KEY"),
             base_url="https://warranty-api-dev.picontechnology.com:8443"
         )
-        
-        self.analysis_prompt = """
-        You are an AI assistant that analyzes user activity patterns to understand their preferences and habits.
-        ### Table Descriptions:
-        - **activities**: Stores detailed records of a user's daily activities, capturing what they do throughout the day based on interactions with the chatbot. 
-        Includes a unique identifier, activity name, optional description, start and end times, and an array of tags for categorization.
-        - **activities_analysis**: Holds aggregated analysis of a user's activities, including the activity type, preferred time (e.g., "morning", "evening")
-        , estimated frequency per week and month, and a last updated timestamp.
-
-        Analyze the following activities for the activity type: "{activity_type}"
+        self.executor = ThreadPoolExecutor(max_workers=ANALYSIS_MAX_WORKERS, thread_name_prefix="activity-analysis")
 
-        Activities data:
-        {activities_data}
-        {ACTIVITY_ANALYSIS_PROMPT}
-        """
 
-    def analyze_activities(self) -> dict:
-        """Analyze only pending activities and update their status"""
+    def analyze_activities(self, user_id: str = DEFAULT_USER_ID) -> dict:
+        """Analyze only pending activities of a user and update their status"""
         try:
-            logger.info("🔍 Starting activity analysis...")
-            pending_activities = get_pending_activities()
+            logger.info(f"🔍 Starting activity analysis for user {user_id}...")
+            pending_activities = get_pending_activities(user_id)
             
             if not pending_activities:
                 return {
@@ -63,46 +70,70 @@ class ActivityAnalyzer:
                     "analyzed_count": 0
                 }
             
-            logger.info(f"🔍 Found {len(pending_activities)} pending activities to analyze...")
+            logger.info(f"🔍 Found {len(pending_activities)} pending activities to analyze for user {user_id}...")
+            
+            pending_groups = self._group_activities(pending_activities, user_id)
+            
+            previous = {}
+            for analysis in get_all_activity_analysis(user_id):
+                previous.setdefault(analysis['activity_type'], analysis)
             
-            activity_groups = self._group_activities(pending_activities)
+            # New rows are folded into each type's running aggregates; a type without aggregates yet
+            # (new, or analyzed before they existed) is seeded once from its recent history
+            activities_to_fold = dict(pending_groups)
+            unseeded = [t for t in pending_groups if not (previous.get(t) or {}).get('aggregates')]
+            if unseeded:
+                history = get_activities_since(datetime.now() - timedelta(days=ACTIVITY_STATS_WINDOW_DAYS), user_id)
+                activities_by_id = {activity['id']: activity for activity in history + pending_activities}
+                history_groups = self._group_activities(list(activities_by_id.values()), user_id)
+                for activity_type in unseeded:
+                    activities_to_fold[activity_type] = history_groups[activity_type]
+            
+            # Groups are independent: run them on the bounded pool, then save everything at once
+            futures = {
+                activity_type: self.executor.submit(
+                    self._analyze_activity_group, activity_type, activities_to_fold[activity_type], previous.get(activity_type)
+                )
+                for activity_type in pending_groups
+            }
             
-            analyzed_count = 0
             results = []
+            analysis_records = []
             analyzed_activity_ids = []
             
-            for activity_type, activities in activity_groups.items():
-                try:
-                    analysis_result = self._analyze_activity_group(activity_type, activities)
-                    
-                    if analysis_result:
-                        stored = self._store_analysis(activity_type, analysis_result)
-                        
-                        if stored:
-                            analyzed_count += 1
-                            results.append({
-                                "activity_type": activity_type,
-                                "analysis": analysis_result,
-                                "activity_count": len(activities)
-                            })
-                            
-                            for activity in activities:
-                                if activity.get('id'):
-                                    analyzed_activity_ids.append(activity['id'])
-                            
-                            print(f"✅ Analyzed '{activity_type}' ({len(activities)} instances)")
-                        
-                except Exception as e:
-                    print(f"❌ Error analyzing {activity_type}: {e}")
+            for activity_type, future in futures.items():
+                activities = pending_groups[activity_type]
+                analysis_result = future.result()
+                if not analysis_result:
+                    print(f"❌ Failed to analyze {activity_type}, its activities stay pending")
                     continue
+                
+                analysis_records.append({"activity_type": activity_type, **analysis_result})
+                results.append({
+                    "activity_type": activity_type,
+                    "analysis": {key: value for key, value in analysis_result.items() if key != "aggregates"},
+                    "activity_count": len(activities)
+                })
+                for activity in activities:
+                    if activity.get('id'):
+                        analyzed_activity_ids.append(activity['id'])
+                print(f"✅ Analyzed '{activity_type}' ({len(activities)} new instances)")
             
-            if analyzed_activity_ids:
-                mark_activities_analyzed(analyzed_activity_ids)
-            logger.info(f"✅ Successfully analyzed {analyzed_count} activity types")
+            if analysis_records and not save_activity_analyses(analysis_records, analyzed_activity_ids, user_id):
+                return {
+                    "success": False,
+                    "error": "Failed to save activity analyses",
+                    "analyzed_count": 0
+                }
+            
+            analyzed_count = len(analysis_records)
+            narratives_reused = sum(1 for result in results if result["analysis"]["narrative_reused"])
+            logger.info(f"✅ Successfully analyzed {analyzed_count} activity types ({narratives_reused} without an LLM call)")
             return {
                 "success": True,
                 "message": f"Successfully analyzed {analyzed_count} activity types",
                 "analyzed_count": analyzed_count,
+                "llm_calls_skipped": narratives_reused,
                 "activities_processed": len(analyzed_activity_ids),
                 "results": results
             }
@@ -116,72 +147,109 @@ class ActivityAnalyzer:
                 "analyzed_count": 0
             }
 
-    def _group_activities(self, activities: list) -> dict:
-        """Group activities by similar types/names"""
-        groups = defaultdict(list)
+    def _group_activities(self, activities: list, user_id: str = DEFAULT_USER_ID) -> dict:
+        """Group activities by canonical activity type, one group per activity.
+
+        The type comes from the activity name (tags only when there is no name), resolved through the
+        embedding-based synonym map so that e.g. "jogging", "chạy bộ" and "morning run" share one group.
+        """
+        terms = {}
+        for activity in activities:
+            candidates = [activity.get('activity_name') or activity.get('name')] + list(activity.get('tags') or [])
+            term = next((normalize_term(candidate) for candidate in candidates if normalize_term(candidate)), None)
+            if term:
+                terms[id(activity)] = term
         
+        canonical_types = resolve_activity_types(terms.values(), user_id)
+        groups = defaultdict(list)
         for activity in activities:
-            tags = activity.get('tags', [])
-            activity_name = activity.get('activity_name', '').lower().strip()
-            if tags:
-                for tag in tags:
-                    normalized_tag = tag.lower().strip()
-                    groups[normalized_tag].append(activity)
-                    
-            elif activity_name:
-                normalized_name = activity_name.lower().strip()
-                groups[normalized_name].append(activity)
+            if id(activity) in terms:
+                groups[canonical_types[terms[id(activity)]]].append(activity)
         
         return dict(groups)
 
-    def _analyze_activity_group(self, activity_type: str, activities: list) -> dict:
-        """Analyze a group of similar activities using LLM"""
+    def _analyze_activity_group(self, activity_type: str, activities: list, previous: Optional[dict] = None) -> Optional[dict]:
+        """Fold new activities into the type's running aggregates; the LLM only writes the description.
+
+        The previous description is kept (no LLM call) until the statistics drift ANALYSIS_DRIFT_THRESHOLD
+        away from the ones it was written for.
+        """
         try:
-            activities_summary = []
-            
-            for activity in activities:
-                activity_info = {
-                    "activity_name": activity.get('activity_name'),
-                    "description": activity.get('description'),
-                    "start_time": str(activity.get('start_at')) if activity.get('start_at') else None,
-                    "end_time": str(activity.get('end_at')) if activity.get('end_at') else None,
-                    "tags": activity.get('tags', []),
-                }
-                activities_summary.append(activity_info)
+            aggregates = fold_activities(previous.get('aggregates') if previous else None, activities)
+            stats = summarize_aggregates(aggregates)
+            analysis = self._validate_analysis({
+                "preferred_time": stats["preferred_time"],
+                "frequency_per_week": stats["frequency_per_week"],
+                "frequency_per_month": stats["frequency_per_month"],
+                "description": previous.get('description') if previous else None
+            })
+            baseline = previous.get('narrative_baseline') if previous else None
+            drift = narrative_drift(baseline, stats)
             
-            activities_data = json.dumps(activities_summary, indent=2)
-            prompt = self.analysis_prompt.format(
-                activity_type=activity_type,
-                activities_data=activities_data,
-                ACTIVITY_ANALYSIS_PROMPT=ACTIVITY_ANALYSIS_PROMPT
-            )
-            try:
-                response = self.llm.with_structured_output(ActivityAnalysis).invoke(prompt)
-                if isinstance(response, ActivityAnalysis):
-                    response = response.model_dump()
-                else:
-                    print(f"❌ Unexpected response type for {activity_type}: {type(response)}")
-                    response = None
+            narrative_reused = bool(analysis["description"]) and drift < ANALYSIS_DRIFT_THRESHOLD
+            if not narrative_reused:
+                description = self._describe_activity_group(activity_type, activities, stats)
+                if description is None:
                     return None
-                cleaned_analysis = self._validate_analysis(response)
-                
-                return cleaned_analysis
-                
-            except json.JSONDecodeError:
-                print(f"❌ Failed to parse JSON response for {activity_type}")
-                return None
+                analysis["description"] = description
+                baseline = narrative_baseline(stats)
+            
+            return {
+                **analysis,
+                "stats": stats,
+                "aggregates": aggregates,
+                "narrative_baseline": baseline,
+                "occurrence_count": aggregates["count"],
+                "last_seen": datetime.fromisoformat(aggregates["last_seen"]) if aggregates["last_seen"] else None,
+                "drift": round(drift, 3),
+                "narrative_reused": narrative_reused
+            }
                 
         except Exception as e:
             print(f"❌ Error analyzing activity group {activity_type}: {e}")
             return None
 
+    def _describe_activity_group(self, activity_type: str, activities: list, stats: dict) -> Optional[str]:
+        """Ask the LLM for the narrative description of a group's statistics, retrying failed calls"""
+        recent = sorted((a for a in activities if a.get('start_at')), key=lambda a: a['start_at'], reverse=True)
+        recent_lines = [
+            f"- {a['start_at']:%Y-%m-%d %H:%M} {a.get('activity_name') or a.get('name') or ''}"
+            + (f": {a['description']}" if a.get('description') else "")
+            for a in recent[:NARRATIVE_SAMPLE_SIZE]
+        ]
+        prompt = ACTIVITY_NARRATIVE_PROMPT.format(
+            activity_type=activity_type,
+            stats=json.dumps(stats, indent=2),
+            recent="\n".join(recent_lines) or "(none)"
+        )
+        
+        for attempt in range(ANALYSIS_MAX_RETRIES + 1):
+            if attempt:
+                # Exponential backoff with jitter so parallel retries do not hit the API together
+                time.sleep(ANALYSIS_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(1, 1.5))
+            try:
+                llm_rate_limiter.acquire()
+                response = self.llm.with_structured_output(ActivityNarrative).invoke(prompt)
+                if isinstance(response, ActivityNarrative) and response.description:
+                    return response.description
+                print(f"❌ Unexpected response for {activity_type}: {response!r}")
+            except Exception as e:
+                print(f"⚠️ Attempt {attempt + 1}/{ANALYSIS_MAX_RETRIES + 1} failed for {activity_type}: {e}")
+        
+        print(f"❌ Giving up on activity group {activity_type}")
+        return None
+
     def _validate_analysis(self, analysis_data: dict) -> dict:
-        """Validate and clean analysis data"""
+        """Validate and clean analysis data.
+
+        The frequencies are exact counts from the aggregates and are stored as they are (an activity done twice
+        a day counts 14 a week), so they agree with stats and narrative_baseline; only preferred_time is checked.
+        """
         try:
             cleaned = {
                 "preferred_time": analysis_data.get("preferred_time", "mixed"),
-                "frequency_per_week": min(max(int(analysis_data.get("frequency_per_week", 0)), 0), 7),
-                "frequency_per_month": min(max(int(analysis_data.get("frequency_per_month", 0)), 0), 30),
+                "frequency_per_week": int(analysis_data.get("frequency_per_week", 0)),
+                "frequency_per_month": int(analysis_data.get("frequency_per_month", 0)),
                 "description": analysis_data.get("description", "No description provided")
             }
             
@@ -201,39 +269,17 @@ class ActivityAnalyzer:
                 "description": ""
             }
 
-    def _store_analysis(self, activity_type: str, analysis_data: dict) -> bool:
-        """Store or update activity analysis in database"""
-        try:
-            existing_analysis = get_activity_analysis(activity_type)
-            
-            analysis_record = {
-                "activity_type": activity_type,
-                "preferred_time": analysis_data.get("preferred_time"),
-                "frequency_per_week": analysis_data.get("frequency_per_week", 0),
-                "frequency_per_month": analysis_data.get("frequency_per_month", 0),
-                "description": analysis_data.get("description", "No description provided")
-            }
-            
-            if existing_analysis:
-                return update_activity_analysis(existing_analysis['id'], analysis_record)
-            else:
-                analysis_id = create_activity_analysis(analysis_record)
-                return analysis_id is not None
-                
-        except Exception as e:
-            print(f"❌ Error storing analysis for {activity_type}: {e}")
-            return False
+    def analyze_single_activity_type(self, activity_type: str, user_id: str = DEFAULT_USER_ID) -> dict:
+        """Analyze a single activity type of a user from scratch (aggregates and description are rebuilt).
 
-    def analyze_single_activity_type(self, activity_type: str) -> dict:
-        """Analyze a single activity type"""
+        Every activity of the type is folded in, so its pending ones are marked analyzed in the same save;
+        otherwise the next analyze_activities pass would fold them in a second time.
+        """
         try:
-            all_activities = get_all_activities()
+            all_activities = get_all_activities(user_id)
             
-            filtered_activities = [
-                activity for activity in all_activities 
-                if (activity.get('activity_name', '').lower()) == activity_type.lower()
-                or activity_type.lower() in [tag.lower() for tag in activity.get('tags', [])]
-            ]
+            activity_type = resolve_activity_types([activity_type], user_id).get(normalize_term(activity_type), activity_type)
+            filtered_activities = self._group_activities(all_activities, user_id).get(activity_type, [])
             
             if not filtered_activities:
                 return {
@@ -244,13 +290,14 @@ class ActivityAnalyzer:
             analysis_result = self._analyze_activity_group(activity_type, filtered_activities)
             
             if analysis_result:
-                stored = self._store_analysis(activity_type, analysis_result)
+                pending_ids = [activity['id'] for activity in filtered_activities if activity.get('status') == 'pending']
+                stored = save_activity_analyses([{"activity_type": activity_type, **analysis_result}], pending_ids, user_id)
                 
                 if stored:
                     return {
                         "success": True,
                         "message": f"Successfully analyzed {activity_type}",
-                        "analysis": analysis_result,
+                        "analysis": {key: value for key, value in analysis_result.items() if key != "aggregates"},
                         "activity_count": len(filtered_activities)
                     }
             
@@ -271,8 +318,10 @@ class ActivityAnalyzer:
             if conn:
                 with conn.cursor() as cur:
                     cur.execute("UPDATE activities SET status = 'pending'")
-                    conn.commit()
                     reset_count = cur.rowcount
+                    # Every activity is folded in again, so the running aggregates start over
+                    cur.execute("UPDATE activities_analysis SET aggregates = NULL")
+                    conn.commit()
                     print(f"🔄 Reset {reset_count} activities to pending status")
                 conn.close()
             
@@ -286,13 +335,13 @@ class ActivityAnalyzer:
 # Global activity analyzer instance
 activity_analyzer = ActivityAnalyzer()
 
-def analyze_activity_type(activity_type: str) -> dict:
+def analyze_activity_type(activity_type: str, user_id: str = DEFAULT_USER_ID) -> dict:
     """Analyze a specific activity type"""
-    return activity_analyzer.analyze_single_activity_type(activity_type)
+    return activity_analyzer.analyze_single_activity_type(activity_type, user_id)
 
-def analyze_pending_activities() -> dict:
+def analyze_pending_activities(user_id: str = DEFAULT_USER_ID) -> dict:
     """Analyze only activities with 'pending' status"""
-    return activity_analyzer.analyze_activities()
+    return activity_analyzer.analyze_activities(user_id)
 
 def reanalyze_all_activities() -> dict:
     """Force reanalysis of all activities"""
@@ -35,8 +35,8 @@ class ActivityExtractor:
         {EXTRACT_ACTIVITIES_PROMPT}
         """
 
-    def extract_activities(self, user_input: str) -> list:
-        """Extract activities from user input"""
+    def extract_activities(self, user_input: str, raise_errors: bool = False) -> list:
+        """Extract activities from user input (with raise_errors, LLM failures raise instead of returning [])"""
         try:
             current_datetime = datetime.now().isoformat()
             prompt = f"""
@@ -66,6 +66,8 @@ class ActivityExtractor:
             
         except Exception as e:
             print(f"❌ Error extracting activities: {e}")
+            if raise_errors:
+                raise
             return []
 
     def store_activities(self, activities: list) -> list:
@@ -109,17 +111,18 @@ class ActivityExtractor:
             print(f"⚠️ Could not parse datetime: {datetime_str}")
             return None
 
-    def process_user_input(self, user_input: str) -> str:
+    def process_user_input(self, user_input: str, raise_errors: bool = False) -> str:
         """
         Extracts activities from user input, stores them, and returns a summary string.
 
         This method orchestrates the entire process of handling a user's text
         input. It first calls the extractor to find potential activities,
         then attempts to store them in the database. It returns a string
-        summarizing the outcome of these operations.
+        summarizing the outcome of these operations. With raise_errors, failures
+        (the LLM call, or none of the activities could be stored) raise instead.
         """
         try:
-            activities = self.extract_activities(user_input)
+            activities = self.extract_activities(user_input, raise_errors)
             
             if not activities:
                 return "No activities were found in the user input."
@@ -127,6 +130,8 @@ class ActivityExtractor:
             stored_activities = self.store_activities(activities)
             num_extracted = len(activities)
             num_stored = len(stored_activities)
+            if not stored_activities and raise_errors:
+                raise RuntimeError(f"None of the {num_extracted} extracted activities could be stored")
             
             print(f"📊 Processed {num_stored} activities from user input")
             return (
@@ -136,6 +141,8 @@ class ActivityExtractor:
             
         except Exception as e:
             print(f"❌ Error processing user input: {e}")
+            if raise_errors:
+                raise
             return f"An error occurred during processing: {e}"
 
 # Global activity extractor instance
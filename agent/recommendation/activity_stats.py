@@ -0,0 +1,149 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+
+# Time-of-day buckets by start hour: night 0-6, morning 6-12, afternoon 12-18, evening 18-24
+TIME_BUCKETS = ["night", "morning", "afternoon", "evening"]
+# Duration buckets in minutes (upper bounds; the last bucket is everything longer)
+DURATION_BUCKETS = [15, 30, 60, 120]
+# Share of occurrences one bucket needs to become the preferred time (otherwise "mixed")
+PREFERRED_TIME_SHARE = float(os.environ.get("PREFERRED_TIME_SHARE", "0.5"))
+# Per-day counts are kept this long, enough for the rolling weekly and monthly frequency
+DAILY_COUNT_DAYS = 30
+
+
+def _naive(value: datetime) -> datetime:
+    """Wall-clock time of value (numpy datetime64 has no time zones)"""
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def empty_aggregates() -> Dict:
+    """Running aggregates of an activity type before any occurrence was folded in"""
+    return {
+        "count": 0,
+        "time_of_day": dict.fromkeys(TIME_BUCKETS, 0),
+        "daily_counts": {},
+        "duration_buckets": [0] * (len(DURATION_BUCKETS) + 1),
+        "duration_total_minutes": 0.0,
+        "duration_count": 0,
+        "first_seen": None,
+        "last_seen": None,
+        "streak_end": None,
+        "current_streak_days": 0,
+        "longest_streak_days": 0
+    }
+
+
+def fold_activities(aggregates: Optional[Dict], activities: List[Dict], now: Optional[datetime] = None) -> Dict:
+    """Merge new occurrences into running aggregates; costs O(len(activities)), whatever the history size.
+
+    Every activity must be folded in exactly once. Streaks are extended by days after the current streak;
+    a late-arriving day before it is counted everywhere else but does not reconnect older streaks.
+    """
+    merged = empty_aggregates()
+    for key, value in (aggregates or {}).items():
+        merged[key] = dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value
+    merged["count"] += len(activities)
+
+    timed = [a for a in activities if a.get('start_at')]
+    if timed:
+        starts = np.array([_naive(a['start_at']) for a in timed], dtype='datetime64[m]')
+        start_days = starts.astype('datetime64[D]')
+
+        hours = ((starts - start_days) // np.timedelta64(1, 'h')).astype(int)
+        for bucket, count in zip(TIME_BUCKETS, np.bincount(hours // 6, minlength=len(TIME_BUCKETS)).tolist()):
+            merged["time_of_day"][bucket] += count
+
+        days, day_counts = np.unique(start_days, return_counts=True)
+        for day, count in zip(days.astype(str).tolist(), day_counts.tolist()):
+            merged["daily_counts"][day] = merged["daily_counts"].get(day, 0) + count
+
+        ends = np.array([_naive(a['end_at']) if a.get('end_at') else None for a in timed], dtype='datetime64[m]')
+        minutes = (ends - starts) / np.timedelta64(1, 'm')
+        minutes = minutes[~np.isnan(minutes) & (minutes >= 0)]
+        if minutes.size:
+            buckets = np.bincount(np.searchsorted(DURATION_BUCKETS, minutes, side='right'), minlength=len(DURATION_BUCKETS) + 1)
+            merged["duration_buckets"] = (np.array(merged["duration_buckets"]) + buckets).tolist()
+            merged["duration_total_minutes"] += float(minutes.sum())
+            merged["duration_count"] += int(minutes.size)
+
+        first, last = str(starts.min().astype(datetime)), str(starts.max().astype(datetime))
+        merged["first_seen"] = min(filter(None, [merged["first_seen"], first]))
+        merged["last_seen"] = max(filter(None, [merged["last_seen"], last]))
+
+        streak_end = date.fromisoformat(merged["streak_end"]) if merged["streak_end"] else None
+        for day in days.astype(date).tolist():
+            if streak_end is None or day > streak_end + timedelta(days=1):
+                merged["current_streak_days"], streak_end = 1, day
+            elif day == streak_end + timedelta(days=1):
+                merged["current_streak_days"], streak_end = merged["current_streak_days"] + 1, day
+            merged["longest_streak_days"] = max(merged["longest_streak_days"], merged["current_streak_days"])
+        merged["streak_end"] = streak_end.isoformat()
+
+    # Older per-day counts no longer affect any frequency
+    oldest = (_naive(now or datetime.now()).date() - timedelta(days=DAILY_COUNT_DAYS - 1)).isoformat()
+    merged["daily_counts"] = {day: count for day, count in merged["daily_counts"].items() if day >= oldest}
+    return merged
+
+
+def summarize_aggregates(aggregates: Dict, now: Optional[datetime] = None) -> Dict:
+    """Frequency, time-of-day histogram, preferred time, streaks and durations from running aggregates.
+
+    Frequencies count occurrences on the last 7 and 30 calendar days (today included); the current streak
+    is 0 unless it reached today or yesterday.
+    """
+    today = _naive(now or datetime.now()).date()
+    week_start, month_start = (today - timedelta(days=6)).isoformat(), (today - timedelta(days=DAILY_COUNT_DAYS - 1)).isoformat()
+    daily = aggregates["daily_counts"]
+    time_of_day = aggregates["time_of_day"]
+    timed_count = sum(time_of_day.values())
+
+    preferred_time = "mixed"
+    if timed_count:
+        top = max(TIME_BUCKETS, key=lambda bucket: time_of_day[bucket])
+        if time_of_day[top] >= PREFERRED_TIME_SHARE * timed_count:
+            preferred_time = top
+
+    streak_end = date.fromisoformat(aggregates["streak_end"]) if aggregates["streak_end"] else None
+    duration_count = aggregates["duration_count"]
+    return {
+        "count": aggregates["count"],
+        "frequency_per_week": sum(count for day, count in daily.items() if week_start <= day <= today.isoformat()),
+        "frequency_per_month": sum(count for day, count in daily.items() if month_start <= day <= today.isoformat()),
+        "time_of_day": dict(time_of_day),
+        "preferred_time": preferred_time,
+        "current_streak_days": aggregates["current_streak_days"] if streak_end and today - streak_end <= timedelta(days=1) else 0,
+        "longest_streak_days": aggregates["longest_streak_days"],
+        "duration_minutes": {
+            "mean": round(aggregates["duration_total_minutes"] / duration_count, 1),
+            "buckets": dict(zip([f"<{limit}" for limit in DURATION_BUCKETS] + [f">={DURATION_BUCKETS[-1]}"], aggregates["duration_buckets"]))
+        } if duration_count else None,
+        "last_seen": aggregates["last_seen"]
+    }
+
+
+def compute_activity_stats(activities: List[Dict], now: Optional[datetime] = None) -> Dict:
+    """Statistics of one activity group computed from scratch"""
+    return summarize_aggregates(fold_activities(None, activities, now), now)
+
+
+def narrative_baseline(stats: Dict) -> Dict:
+    """The part of the statistics a narrative describes, stored to measure drift later"""
+    return {key: stats[key] for key in ("preferred_time", "frequency_per_week", "frequency_per_month", "time_of_day")}
+
+
+def narrative_drift(baseline: Optional[Dict], stats: Dict) -> float:
+    """How far the statistics moved since the narrative was written: 0 (same) to 1 (no longer describes them)"""
+    if not baseline or baseline.get("preferred_time") != stats["preferred_time"]:
+        return 1.0
+
+    # Total variation distance between the time-of-day distributions
+    before = np.array([baseline["time_of_day"].get(bucket, 0) for bucket in TIME_BUCKETS], dtype=float)
+    after = np.array([stats["time_of_day"][bucket] for bucket in TIME_BUCKETS], dtype=float)
+    shift = 0.5 * float(np.abs(before / max(before.sum(), 1) - after / max(after.sum(), 1)).sum()) if after.sum() else 0.0
+
+    # Monthly rather than weekly frequency: one extra occurrence should not count as a new habit
+    before_month, after_month = baseline["frequency_per_month"], stats["frequency_per_month"]
+    frequency_change = abs(after_month - before_month) / max(after_month, before_month, 1)
+    return max(shift, frequency_change)
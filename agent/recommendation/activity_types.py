@@ -0,0 +1,117 @@
+import sys
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.recommendation.services_alchemy import (
+    get_activity_type_synonyms, get_canonical_activity_types, save_activity_type_synonyms,
+    get_all_activity_analysis, DEFAULT_USER_ID
+)
+from core.utils.get_embedding import get_embeddings
+
+# Cosine similarity a new term needs to join an existing activity type (text-embedding-ada-002 scores
+# unrelated short phrases around 0.75-0.8, so keep this high to avoid merging different activities)
+ACTIVITY_TYPE_SIMILARITY = float(os.environ.get("ACTIVITY_TYPE_SIMILARITY", "0.9"))
+# (user, term) -> canonical type entries kept in memory
+ACTIVITY_TYPE_CACHE_SIZE = int(os.environ.get("ACTIVITY_TYPE_CACHE_SIZE", "10000"))
+
+
+def normalize_term(term) -> str:
+    """Lower-cased, whitespace-collapsed activity name or tag (as stored in the synonym map)"""
+    return " ".join(str(term or "").lower().split())[:100]
+
+
+class ActivityTypeResolver:
+    """Maps activity names and tags to canonical activity types by embedding similarity.
+
+    Known terms resolve from an in-process LRU cache or the persistent synonym map (activity_type_synonyms)
+    without any API call. New terms are embedded in one batch; each joins the user's most similar canonical
+    type when the cosine similarity reaches the threshold and otherwise becomes a canonical type itself.
+    If embeddings are unavailable, new terms resolve to themselves and are retried on the next call.
+    """
+
+    def __init__(self, similarity: float = ACTIVITY_TYPE_SIMILARITY, cache_size: int = ACTIVITY_TYPE_CACHE_SIZE, embed=None):
+        self.similarity = similarity
+        self.cache_size = cache_size
+        self.embed = embed or get_embeddings
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, terms: Iterable[str], user_id: str = DEFAULT_USER_ID) -> Dict[str, str]:
+        """Canonical activity type of every term, keyed by the normalized term"""
+        wanted = list(dict.fromkeys(term for term in map(normalize_term, terms) if term))
+        resolved, missing = {}, []
+        with self._lock:
+            for term in wanted:
+                key = (str(user_id), term)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    resolved[term] = self._cache[key]
+                else:
+                    missing.append(term)
+        if not missing:
+            return resolved
+
+        known = get_activity_type_synonyms(missing, user_id)
+        new_terms = [term for term in missing if term not in known]
+        if new_terms and self._cluster(new_terms, user_id):
+            # Read back what was stored: another instance may have mapped the same term first
+            known.update(get_activity_type_synonyms(new_terms, user_id))
+
+        with self._lock:
+            for term, canonical_type in known.items():
+                self._cache[(str(user_id), term)] = canonical_type
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        resolved.update(known)
+        for term in missing:
+            resolved.setdefault(term, term)
+        return resolved
+
+    def _cluster(self, terms: List[str], user_id: str) -> bool:
+        """Assign new terms to canonical types and store them in the synonym map. False if nothing was stored"""
+        canonical = get_canonical_activity_types(user_id)
+        if not canonical:
+            # First use for this user: the types of existing analyses become canonical types first
+            seeds = [normalize_term(a['activity_type']) for a in get_all_activity_analysis(user_id)]
+            terms = list(dict.fromkeys([term for term in seeds if term] + terms))
+
+        try:
+            vectors = np.array(self.embed(terms), dtype=float)
+        except Exception as e:
+            print(f"⚠️ Activity type embeddings unavailable ({e}); {len(terms)} terms stay ungrouped for now")
+            return False
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        names = [c['canonical_type'] for c in canonical]
+        matrix = np.array([c['embedding'] for c in canonical], dtype=float).reshape(len(canonical), vectors.shape[1])
+        if len(names):
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        synonyms = []
+        for term, vector in zip(terms, vectors):
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities)) if len(names) else -1
+            if best >= 0 and similarities[best] >= self.similarity:
+                synonyms.append({'term': term, 'canonical_type': names[best], 'similarity': float(similarities[best]), 'embedding': vector.tolist()})
+            else:
+                # Later terms of this batch can join the new type
+                names.append(term)
+                matrix = np.vstack([matrix, vector])
+                synonyms.append({'term': term, 'canonical_type': term, 'similarity': 1.0, 'embedding': vector.tolist()})
+
+        merged = sum(1 for synonym in synonyms if synonym['term'] != synonym['canonical_type'])
+        print(f"🏷️ {len(synonyms)} new activity terms: {merged} joined an existing type, {len(synonyms) - merged} new types")
+        return save_activity_type_synonyms(synonyms, user_id)
+
+
+# Global activity type resolver instance
+activity_type_resolver = ActivityTypeResolver()
+
+def resolve_activity_types(terms: Iterable[str], user_id: str = DEFAULT_USER_ID) -> Dict[str, str]:
+    """Map activity names/tags to the user's canonical activity types"""
+    return activity_type_resolver.resolve(terms, user_id)
@@ -0,0 +1,56 @@
+import sys
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.recommendation.services_alchemy import get_event_conflicts, create_system_alerts, get_alerted_events
+from agent.recommendation.recommendation_templates import TEMPLATES, RECOMMENDATION_LANGUAGE
+
+# Overlapping events starting within this many hours get a conflict alert
+EVENT_CONFLICT_HOURS = int(os.environ.get("EVENT_CONFLICT_HOURS", "24"))
+# Conflict alerts fire this many minutes before the earlier of the two events
+EVENT_CONFLICT_LEAD_MINUTES = int(os.environ.get("EVENT_CONFLICT_LEAD_MINUTES", "60"))
+
+
+def conflict_alert(conflict: Dict, now: Optional[datetime] = None, language: str = RECOMMENDATION_LANGUAGE) -> Dict:
+    """Alert data for one pair of overlapping events (a conflict from get_event_conflicts)"""
+    texts = TEMPLATES.get(language, TEMPLATES["en"])
+    first, second = conflict['event_name'], conflict['conflict_event']
+    return {
+        "alert_type": "event",
+        "title": texts["conflict_title"].format(first=first, second=second)[:100],
+        "message": texts["conflict_content"].format(
+            first=first, first_time=conflict['start_time'].strftime("%H:%M %d/%m"),
+            second=second, second_time=conflict['conflict_start_time'].strftime("%H:%M %d/%m")
+        ),
+        "trigger_time": max(now or datetime.now(), conflict['start_time'] - timedelta(minutes=EVENT_CONFLICT_LEAD_MINUTES)),
+        "priority": "high",
+        "status": "pending",
+        "source": "conflict",
+        "event_id": conflict['event_id']
+    }
+
+
+def create_event_conflict_alerts(conflicts: Optional[List[Dict]] = None, user_id: Optional[str] = None) -> int:
+    """Create an alert for every pair of overlapping upcoming events, one bulk insert per user.
+
+    conflicts defaults to get_event_conflicts(EVENT_CONFLICT_HOURS, user_id). A pair is alerted once: pairs
+    that already have a conflict alert in any status (pending, sent, failed or cancelled) are skipped, so this
+    can run on every schedule tick without notifying again after the alert went out.
+    """
+    if conflicts is None:
+        conflicts = get_event_conflicts(EVENT_CONFLICT_HOURS, user_id)
+    now = datetime.now()
+    alerts_by_user = {}
+    for conflict in conflicts:
+        alerts_by_user.setdefault(conflict['user_id'], []).append(conflict_alert(conflict, now))
+
+    created = 0
+    for owner, alerts in alerts_by_user.items():
+        alerted = get_alerted_events([alert['event_id'] for alert in alerts], "conflict", owner)
+        alerts = [alert for alert in alerts if (alert['event_id'], alert['title']) not in alerted]
+        if alerts:
+            created += len(create_system_alerts(alerts, owner))
+    return created
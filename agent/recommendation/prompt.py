@@ -36,6 +36,22 @@ Your goal is to analyze the user input and extract the following details:
   }
 """
 
+ACTIVITY_NARRATIVE_PROMPT = """
+You are an AI assistant that describes a user's habits around one activity type.
+The statistics below were computed from the user's activity history and are exact; do not recompute or contradict them.
+
+Activity type: "{activity_type}"
+
+Statistics:
+{stats}
+
+Most recent occurrences:
+{recent}
+
+Write a brief description (2-3 sentences) of the user's habits for this activity type: when they usually do it,
+how regularly, notable trends (streaks, durations) and, if useful, one suggestion.
+"""
+
 ACTIVITY_ANALYSIS_PROMPT = """
 
 Based on this data, provide analysis in the following format:
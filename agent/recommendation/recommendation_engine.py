@@ -1,14 +1,21 @@
 import sys
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from langchain_openai import ChatOpenAI
 from agent.recommendation.services_alchemy import (
     get_all_activity_analysis, get_upcoming_events, 
-    create_system_alert, alert_exists, create_recommendation, update_recommendation_status
+    create_system_alerts, create_recommendation, update_recommendation_status,
+    get_recommendation_fingerprint, save_recommendation_fingerprint, get_recent_recommendations, DEFAULT_USER_ID
 )
 from agent.recommendation.prompt import RECOMMENDATION_PROMPT
-from core.base.schema import Recommendation
+from agent.recommendation.recommendation_scorer import rank_recommendations, RECOMMENDATION_FEEDBACK_DAYS
+from agent.recommendation.recommendation_templates import template_recommendations, RECOMMENDATION_TEMPLATE_SHARE
+from core.base.schema import Recommendation, RecommendationBatch
+from core.utils.rate_limiter import llm_rate_limiter
 from datetime import datetime, timedelta
 import json
 import dotenv
@@ -26,6 +33,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Candidate recommendations requested per generation (one structured call returns all of them); only the
+# RECOMMENDATION_TOP_K best by the local scorer are saved and alerted
+RECOMMENDATION_COUNT = int(os.environ.get("RECOMMENDATION_COUNT", "6"))
+# Parallel single-recommendation calls when the list output fails
+RECOMMENDATION_FANOUT_WORKERS = int(os.environ.get("RECOMMENDATION_FANOUT_WORKERS", "4"))
+# Recommendations are timely: identical inputs are regenerated once per bucket of this many hours
+RECOMMENDATION_TIME_BUCKET_HOURS = float(os.environ.get("RECOMMENDATION_TIME_BUCKET_HOURS", "3"))
+
+
+def recommendation_fingerprint(analyses: list, events: list, now: datetime = None) -> str:
+    """Hash of everything a generation depends on: analyses, upcoming events and the current time bucket"""
+    bucket_seconds = RECOMMENDATION_TIME_BUCKET_HOURS * 3600
+    payload = {
+        "time_bucket": int((now or datetime.now()).timestamp() // bucket_seconds),
+        # last_updated changes on every analysis run, even when nothing else does
+        "analyses": sorted(
+            [[a.get('activity_type'), a.get('preferred_time'), a.get('frequency_per_week'),
+              a.get('frequency_per_month'), a.get('description')] for a in analyses],
+            key=json.dumps
+        ),
+        "events": sorted(
+            [[e.get('event_id'), e.get('event_name'), e.get('start_time'), e.get('end_time'),
+              e.get('location'), e.get('priority'), e.get('description')] for e in events],
+            key=lambda event: json.dumps(event, default=str)
+        )
+    }
+    return hashlib.sha256(json.dumps(payload, default=str).encode("utf-8")).hexdigest()
+
+
 class RecommendationEngine:
     def __init__(self):
         self.llm = ChatOpenAI(
@@ -34,6 +70,9 @@ class RecommendationEngine:
             api_key=os.environ.get("OPENAI_API_KEY"),
             base_url="https://warranty-api-dev.picontechnology.com:8443"
         )
+        self.executor = ThreadPoolExecutor(max_workers=RECOMMENDATION_FANOUT_WORKERS, thread_name_prefix="recommendation")
+        self.metrics = {"generated": 0, "skipped_unchanged": 0, "llm_calls": 0, "llm_calls_avoided": 0, "candidates_dropped": 0, "template_recommendations": 0}
+        self._metrics_lock = threading.Lock()
         
         self.recommendation_prompt = """
 {RECOMMENDATION_PROMPT}
@@ -63,12 +102,15 @@ Consider user's events to create recommendations event that event is not happeni
 Pay attention to the timing of activities and events to ensure recommendations time are relevant and actionable.
 """
 
-    def generate_recommendations(self) -> dict:
-        """Generate recommendations based on activity analysis and events"""
+    def generate_recommendations(self, user_id: str = DEFAULT_USER_ID, force: bool = False) -> dict:
+        """Generate recommendations for a user based on their activity analysis and events.
+
+        Skipped (no LLM call) when the inputs fingerprint matches the last generation, unless force is set.
+        """
         try:
-            activity_analyses = get_all_activity_analysis()
+            activity_analyses = get_all_activity_analysis(user_id)
             
-            upcoming_events = get_upcoming_events(days=1)
+            upcoming_events = get_upcoming_events(days=1, user_id=user_id)
             
             if not activity_analyses and not upcoming_events:
                 return {
@@ -77,6 +119,20 @@ Pay attention to the timing of activities and events to ensure recommendations t
                     "recommendations": []
                 }
             
+            fingerprint = recommendation_fingerprint(activity_analyses, upcoming_events)
+            if not force:
+                previous = get_recommendation_fingerprint(user_id)
+                if previous and previous['fingerprint'] == fingerprint:
+                    self._count("skipped_unchanged")
+                    self._count("llm_calls_avoided")
+                    return {
+                        "success": True,
+                        "skipped": True,
+                        "message": f"Inputs unchanged since {previous['generated_at']}",
+                        "recommendations": [],
+                        "alerts_created": 0
+                    }
+            
             activity_data = self._format_activity_analysis(activity_analyses)
             event_data = self._format_upcoming_events(upcoming_events)
             bangkok_tz = pytz.timezone('Asia/Bangkok')
@@ -89,46 +145,33 @@ Pay attention to the timing of activities and events to ensure recommendations t
                 current_datetime=current_datetime
             )
 
-            try:
-                structured_llm = self.llm.with_structured_output(
-                    Recommendation,
-                    method="function_calling"
-                )
-
-                recommendations = []
-                for i in range(4):
-                    try:
-                        response = structured_llm.invoke(f"{prompt}\n\nGenerate recommendation #{i+1}:")
-                        rec_data = response.model_dump()
-                        print(f"✅ Generated recommendation {i+1}: {rec_data.get('title', 'No title')}")
-                        if rec_data.get('title') and rec_data.get('content'):
-                            recommendations.append(rec_data)
-                        
-                    except Exception as e:
-                        print(f"⚠️ Error generating recommendation {i+1}: {e}")
-                        continue
-
-                if recommendations:
-                    for rec in recommendations:
-                        rec['recommendation_type'] = rec.get('recommendation_type', 'general')
-                        rec['title'] = rec.get('title', 'No title')
-                        rec['content'] = rec.get('content', 'No content')
-                        rec['score'] = min(max(int(rec.get('score', 5)), 1), 10)
-                        rec['reason'] = rec.get('reason', '')
-                        rec['status'] = 'pending'
-                        rec['shown_at'] = rec.get('shown_at')
-                        logger.info(f"Saving recommendation: {rec['title']} at {rec['shown_at']} hẹ hẹ")
-                    rec_ids = create_recommendation(recommendations)
-                    print(f"✅ Saved {len(rec_ids)} recommendations to database")
-    
-                print(f"✅ Generated {len(recommendations)} recommendations using structured output")
-                
-            except Exception as struct_error:
-                print(f"⚠️ Structured output failed: {struct_error}")
-                recommendations = self._fallback_parse_recommendations(prompt)
+            # Routine reminders come from templates; the LLM fills the remaining slots with novel suggestions
+            candidates = template_recommendations(activity_analyses, upcoming_events, round(RECOMMENDATION_COUNT * RECOMMENDATION_TEMPLATE_SHARE))
+            self._count("template_recommendations", len(candidates))
+            llm_count = RECOMMENDATION_COUNT - len(candidates)
+            if llm_count > 0:
+                if candidates:
+                    prompt += "\n\nAlready covered by routine reminders, suggest something different:\n" + "\n".join(
+                        f"- {rec['title']}: {rec['content']}" for rec in candidates)
+                candidates += [self._clean_recommendation(rec) for rec in self._generate_batch(prompt, llm_count)]
+            else:
+                self._count("llm_calls_avoided")
+            history = get_recent_recommendations(RECOMMENDATION_FEEDBACK_DAYS, user_id)
+            recommendations = rank_recommendations(candidates, activity_analyses, upcoming_events, history)
+            if len(recommendations) < len(candidates):
+                print(f"🔽 Kept {len(recommendations)} of {len(candidates)} candidate recommendations")
+                self._count("candidates_dropped", len(candidates) - len(recommendations))
+            rec_ids = []
+            if recommendations:
+                for rec in recommendations:
+                    logger.info(f"Saving recommendation: {rec['title']} at {rec['shown_at']} hẹ hẹ")
+                rec_ids = create_recommendation(recommendations, user_id) or []
+                print(f"✅ Saved {len(rec_ids)} recommendations to database")
+                save_recommendation_fingerprint(fingerprint, len(recommendations), user_id)
+                self._count("generated")
             
             try:
-                created_alerts = self._create_alerts_from_recommendations(recommendations)
+                created_alerts = self._create_alerts_from_recommendations(recommendations, user_id)
                 if created_alerts:
                     for rec_id in rec_ids:
                         update_recommendation_status(rec_id, 'alert_created')
@@ -159,6 +202,72 @@ Pay attention to the timing of activities and events to ensure recommendations t
                 "alerts_created": 0
             }
 
+    def _generate_batch(self, prompt: str, count: int) -> list:
+        """Generate count recommendations with one structured call returning the whole list.
+
+        If the list output fails, count single-recommendation calls run in parallel instead, and as a last
+        resort the JSON-parsing fallback is used.
+        """
+        try:
+            llm_rate_limiter.acquire()
+            self._count("llm_calls")
+            structured_llm = self.llm.with_structured_output(RecommendationBatch, method="function_calling")
+            response = structured_llm.invoke(f"{prompt}\n\nGenerate exactly {count} distinct recommendations:")
+            recommendations = [
+                rec.model_dump() for rec in response.recommendations
+                if rec.title and rec.content
+            ][:count]
+            if recommendations:
+                print(f"✅ Generated {len(recommendations)} recommendations in one call")
+                return recommendations
+            print("⚠️ Recommendation list came back empty, falling back to parallel calls")
+        except Exception as e:
+            print(f"⚠️ Recommendation list output failed, falling back to parallel calls: {e}")
+        
+        futures = [self.executor.submit(self._generate_one, prompt, i, count) for i in range(count)]
+        recommendations = [rec for rec in (future.result() for future in futures) if rec]
+        if recommendations:
+            print(f"✅ Generated {len(recommendations)} recommendations with parallel calls")
+            return recommendations
+        return self._fallback_parse_recommendations(prompt)
+
+    def _generate_one(self, prompt: str, index: int, count: int):
+        """One recommendation of a fan-out; None if the call failed"""
+        try:
+            llm_rate_limiter.acquire()
+            self._count("llm_calls")
+            structured_llm = self.llm.with_structured_output(Recommendation, method="function_calling")
+            response = structured_llm.invoke(f"{prompt}\n\nGenerate recommendation #{index + 1} of {count}:")
+            rec_data = response.model_dump()
+            if rec_data.get('title') and rec_data.get('content'):
+                return rec_data
+        except Exception as e:
+            print(f"⚠️ Error generating recommendation {index + 1}: {e}")
+        return None
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._metrics_lock:
+            self.metrics[metric] += amount
+
+    def get_metrics(self) -> dict:
+        """Generations, skips on unchanged inputs, LLM calls made/avoided, template recommendations and candidates dropped by ranking since start"""
+        with self._metrics_lock:
+            return dict(self.metrics)
+
+    def _clean_recommendation(self, rec: dict) -> dict:
+        """Fill defaults and clamp the score of a generated recommendation"""
+        rec['recommendation_type'] = rec.get('recommendation_type') or 'general'
+        rec['title'] = rec.get('title') or 'No title'
+        rec['content'] = rec.get('content') or 'No content'
+        try:
+            rec['score'] = min(max(int(rec.get('score') or 5), 1), 10)
+        except (TypeError, ValueError):
+            rec['score'] = 5
+        rec['reason'] = rec.get('reason') or ''
+        rec['status'] = 'pending'
+        rec['shown_at'] = rec.get('shown_at')
+        return rec
+
     def _parse_datetime(self, datetime_str: str):
         """Parse datetime string"""
         if not datetime_str:
@@ -256,50 +365,27 @@ Pay attention to the timing of activities and events to ensure recommendations t
         
         return json.dumps(formatted_data, indent=2)
 
-    def _create_alerts_from_recommendations(self, recommendations: list) -> int:
-        """Create system alerts from high-score recommendations"""
-        created_count = 0
-        
-        for rec in recommendations:
-            try:
-                score = rec.get('score', 0)
-                
-                if score >= 7:
-                    title = rec.get('title', '')
-                    
-                    if not alert_exists(title, 'system'):
-                        shown_at = rec.get('shown_at')
-                        if shown_at:
-                            try:
-                                trigger_time = shown_at
-                            except Exception as parse_error:
-                                print(f"⚠️ Error parsing shown_at time: {parse_error}")
-                                trigger_time = datetime.now() + timedelta(minutes=30)
-                        else:
-                            trigger_time = datetime.now() + timedelta(minutes=30)
-                        
-                        alert_data = {
-                            "alert_type": "system",
-                            "title": title,
-                            "message": rec.get('content', ''),
-                            "trigger_time": trigger_time,
-                            "recurrence": "once",
-                            "priority": "high" if score >= 9 else "medium",
-                            "status": "pending",
-                            "source": "recommendation"
-                        }
-                        
-                        alert_id = create_system_alert(alert_data)
-                        if alert_id:
-                            created_count += 1
-                            print(f"✅ Created alert: {title} (Score: {score})")
-                    else:
-                        print(f"⚠️ Alert already exists: {title}")
-                
-            except Exception as e:
-                print(f"❌ Error creating alert for recommendation! {e}")
-                continue
-        
+    def _create_alerts_from_recommendations(self, recommendations: list, user_id: str = DEFAULT_USER_ID) -> int:
+        """Create system alerts from ranked recommendations (one bulk insert; existing pending alerts are kept).
+
+        recommendations are the top RECOMMENDATION_TOP_K of rank_recommendations, best first, so every one of
+        them is alerted and the best gets high priority; their local scores are only comparable within a batch.
+        """
+        alerts = [{
+            "alert_type": "system",
+            "title": rec.get('title', ''),
+            "message": rec.get('content', ''),
+            "trigger_time": rec.get('shown_at') or datetime.now() + timedelta(minutes=30),
+            "priority": "high" if rank == 0 else "medium",
+            "status": "pending",
+            "source": "recommendation"
+        } for rank, rec in enumerate(recommendations)]
+        if not alerts:
+            return 0
+
+        created_count = len(create_system_alerts(alerts, user_id))
+        if created_count < len(alerts):
+            print(f"⚠️ {len(alerts) - created_count} alerts already pending, skipped")
         return created_count
 
     def generate_activity_specific_recommendations(self, activity_type: str) -> dict:
@@ -334,29 +420,9 @@ Pay attention to the timing of activities and events to ensure recommendations t
             Each recommendation should be specific to this activity type and include actionable advice.
             """
             
-            try:
-                structured_llm = self.llm.with_structured_output(
-                    Recommendation,
-                    method="function_calling"
-                )
-                
-                recommendations = []
-                for i in range(3):
-                    try:
-                        response = structured_llm.invoke(f"{focused_prompt}\n\nGenerate specific recommendation #{i+1}:")
-                        
-                        if response and hasattr(response, 'model_dump'):
-                            rec_data = response.model_dump()
-                            if rec_data.get('title') and rec_data.get('content'):
-                                recommendations.append(rec_data)
-                                
-                    except Exception as e:
-                        print(f"⚠️ Error generating specific recommendation {i+1}: {e}")
-                        continue
-                
-            except Exception as struct_error:
-                print(f"⚠️ Structured output failed for activity-specific: {struct_error}")
-                recommendations = self._fallback_parse_recommendations(focused_prompt)
+            candidates = [self._clean_recommendation(rec) for rec in self._generate_batch(focused_prompt, 3)]
+            history = get_recent_recommendations(RECOMMENDATION_FEEDBACK_DAYS)
+            recommendations = rank_recommendations(candidates, [analysis], upcoming_events, history)
             
             return {
                 "success": True,
@@ -374,9 +440,9 @@ Pay attention to the timing of activities and events to ensure recommendations t
 # Global recommendation engine instance
 recommendation_engine = RecommendationEngine()
 
-def generate_recommendations() -> dict:
-    """Generate all recommendations"""
-    return recommendation_engine.generate_recommendations()
+def generate_recommendations(user_id: str = DEFAULT_USER_ID, force: bool = False) -> dict:
+    """Generate all recommendations for a user (skipped when its inputs did not change)"""
+    return recommendation_engine.generate_recommendations(user_id, force)
 
 def generate_activity_recommendations(activity_type: str) -> dict:
     """Generate recommendations for specific activity"""
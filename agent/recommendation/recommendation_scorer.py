@@ -0,0 +1,177 @@
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+from agent.recommendation.activity_stats import TIME_BUCKETS
+
+# Recommendations kept (saved and alerted) per generation, best first
+RECOMMENDATION_TOP_K = int(os.environ.get("RECOMMENDATION_TOP_K", "3"))
+# Days of past recommendations used for repeat detection and accept/reject feedback
+RECOMMENDATION_FEEDBACK_DAYS = int(os.environ.get("RECOMMENDATION_FEEDBACK_DAYS", "30"))
+# A similar recommendation shown this many hours ago costs half of the novelty
+RECOMMENDATION_REPEAT_HALF_LIFE_HOURS = float(os.environ.get("RECOMMENDATION_REPEAT_HALF_LIFE_HOURS", "24"))
+# Events this many hours away still give half of the event proximity
+RECOMMENDATION_EVENT_HALF_LIFE_HOURS = float(os.environ.get("RECOMMENDATION_EVENT_HALF_LIFE_HOURS", "6"))
+# Title similarity (word Jaccard) at which two recommendations count as the same suggestion
+RECOMMENDATION_SIMILARITY = float(os.environ.get("RECOMMENDATION_SIMILARITY", "0.6"))
+
+# Weight of every feature in the final score (they add up to 1)
+SCORE_WEIGHTS = {"llm": 0.2, "novelty": 0.25, "pattern": 0.2, "event": 0.2, "feedback": 0.15}
+ACCEPTED_STATUSES = {"accepted", "completed"}
+REJECTED_STATUSES = {"rejected", "dismissed"}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _words(text) -> set:
+    """Lower-cased words of text (single letters and digits dropped)"""
+    return {word for word in _WORD.findall(str(text or "").lower()) if len(word) > 1 and not word.isdigit()}
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    """Naive datetime of a datetime or ISO string; None if it cannot be read"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    return None
+
+
+def _word_matrix(texts: List[set], vocabulary: Dict[str, int]) -> np.ndarray:
+    """Binary bag-of-words matrix, one row per text"""
+    matrix = np.zeros((len(texts), len(vocabulary)), dtype=float)
+    for row, words in enumerate(texts):
+        matrix[row, [vocabulary[word] for word in words]] = 1.0
+    return matrix
+
+
+def _jaccard(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Pairwise Jaccard similarity of the rows of two binary matrices"""
+    overlap = left @ right.T
+    union = left.sum(axis=1)[:, None] + right.sum(axis=1)[None, :] - overlap
+    return np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+
+def _coverage(text: np.ndarray, names: np.ndarray) -> np.ndarray:
+    """Share of every name's words that appear in every text (1.0: the text mentions the name)"""
+    sizes = names.sum(axis=1)[None, :]
+    overlap = text @ names.T
+    return np.divide(overlap, sizes, out=np.zeros_like(overlap), where=sizes > 0)
+
+
+class RecommendationScorer:
+    """Ranks candidate recommendations locally instead of trusting the score the LLM made up.
+
+    Every candidate gets five features in [0, 1], scored for the whole batch at once with matrix operations:
+    - llm: the generated 1-10 score, as a weak prior
+    - novelty: 1 minus the similarity to recommendations already made, decayed with their age
+    - pattern: mentions an analyzed activity, weighted by its weekly frequency and by shown_at falling
+      into the activity's preferred time of day
+    - event: mentions an upcoming event, decaying with the hours until it starts
+    - feedback: smoothed acceptance rate of past recommendations similar to it (or of the same type)
+    Candidates similar to a rejected recommendation or to a better candidate of the same batch are dropped.
+    """
+
+    def __init__(self, top_k: int = RECOMMENDATION_TOP_K, weights: Optional[Dict[str, float]] = None,
+                 similarity: float = RECOMMENDATION_SIMILARITY):
+        self.top_k = top_k
+        self.weights = weights or SCORE_WEIGHTS
+        self.similarity = similarity
+
+    def score(self, candidates: List[Dict], analyses: List[Dict], events: List[Dict],
+              history: List[Dict], now: Optional[datetime] = None) -> np.ndarray:
+        """Feature matrix (candidates x SCORE_WEIGHTS keys) of the candidates"""
+        now = _to_datetime(now) or datetime.now()
+        titles = [_words(c.get('title')) for c in candidates]
+        texts = [_words(f"{c.get('title')} {c.get('content')}") for c in candidates]
+        past = [_words(h.get('title')) for h in history]
+        activities = [_words(a.get('activity_type')) for a in analyses]
+        event_names = [_words(e.get('event_name')) for e in events]
+
+        vocabulary = {}
+        for words in titles + texts + past + activities + event_names:
+            for word in words:
+                vocabulary.setdefault(word, len(vocabulary))
+        title_matrix, text_matrix = _word_matrix(titles, vocabulary), _word_matrix(texts, vocabulary)
+
+        llm = np.array([float(c.get('score') or 5) for c in candidates]) / 10.0
+
+        # Similarity to the history, used for novelty, feedback and suppression
+        history_similarity = _jaccard(title_matrix, _word_matrix(past, vocabulary))
+        ages = np.array([
+            max((now - (_to_datetime(h.get('shown_at')) or _to_datetime(h.get('created_at')) or now)).total_seconds(), 0.0) / 3600
+            for h in history
+        ])
+        decay = 0.5 ** (ages / RECOMMENDATION_REPEAT_HALF_LIFE_HOURS)
+        novelty = 1.0 - (history_similarity * decay[None, :]).max(axis=1, initial=0.0)
+
+        shown_buckets = np.array([
+            TIME_BUCKETS[shown.hour // 6] if shown else "" for shown in (_to_datetime(c.get('shown_at')) for c in candidates)
+        ])
+        preferred = np.array([str(a.get('preferred_time') or "").lower() for a in analyses])
+        time_match = np.where(shown_buckets[:, None] == preferred[None, :], 1.0, np.where(preferred[None, :] == "mixed", 0.5, 0.0))
+        frequency = np.minimum(np.array([float(a.get('frequency_per_week') or 0) for a in analyses]) / 7.0, 1.0)
+        activity_mentions = _coverage(text_matrix, _word_matrix(activities, vocabulary))
+        pattern = (activity_mentions * (0.5 * frequency[None, :] + 0.5 * time_match)).max(axis=1, initial=0.0)
+
+        hours_until = np.array([
+            max(((_to_datetime(e.get('start_time')) or now) - now).total_seconds(), 0.0) / 3600 for e in events
+        ])
+        proximity = 0.5 ** (hours_until / RECOMMENDATION_EVENT_HALF_LIFE_HOURS)
+        event_mentions = _coverage(text_matrix, _word_matrix(event_names, vocabulary))
+        event = (np.where(event_mentions >= 0.5, event_mentions, 0.0) * proximity[None, :]).max(axis=1, initial=0.0)
+
+        # Past recommendations weigh by title similarity, or a little for the same type: Beta(1, 1) smoothing
+        statuses = [str(h.get('status') or "").lower() for h in history]
+        accepted = np.array([status in ACCEPTED_STATUSES for status in statuses], dtype=float)
+        rejected = np.array([status in REJECTED_STATUSES for status in statuses], dtype=float)
+        same_type = np.array([
+            [c.get('recommendation_type') == h.get('recommendation_type') for h in history] for c in candidates
+        ], dtype=float).reshape(len(candidates), len(history))
+        relevance = np.maximum(history_similarity, 0.3 * same_type)
+        feedback = (relevance @ accepted + 1.0) / (relevance @ (accepted + rejected) + 2.0)
+
+        return np.column_stack([{"llm": llm, "novelty": novelty, "pattern": pattern, "event": event, "feedback": feedback}[name]
+                                for name in self.weights])
+
+    def rank(self, candidates: List[Dict], analyses: List[Dict], events: List[Dict],
+             history: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+        """The top_k best candidates, best first, with score replaced by the local 1-10 score"""
+        if not candidates:
+            return []
+        features = self.score(candidates, analyses, events, history, now)
+        totals = features @ np.array(list(self.weights.values()))
+
+        titles = [_words(c.get('title')) for c in candidates]
+        rejected_titles = [_words(h.get('title')) for h in history if str(h.get('status') or "").lower() in REJECTED_STATUSES]
+        vocabulary = {}
+        for words in titles + rejected_titles:
+            for word in words:
+                vocabulary.setdefault(word, len(vocabulary))
+        title_matrix = _word_matrix(titles, vocabulary)
+        suppressed = _jaccard(title_matrix, _word_matrix(rejected_titles, vocabulary)).max(axis=1, initial=0.0) >= self.similarity
+        batch_similarity = _jaccard(title_matrix, title_matrix)
+
+        ranked = []
+        for index in np.argsort(-totals, kind="stable"):
+            if len(ranked) == self.top_k:
+                break
+            if suppressed[index] or any(batch_similarity[index, kept] >= self.similarity for kept in ranked):
+                continue
+            ranked.append(int(index))
+
+        return [dict(candidates[index], score=round(1.0 + 9.0 * float(totals[index]), 1)) for index in ranked]
+
+
+# Global recommendation scorer instance
+recommendation_scorer = RecommendationScorer()
+
+def rank_recommendations(candidates: List[Dict], analyses: List[Dict], events: List[Dict],
+                         history: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+    """Score candidate recommendations locally and keep the top RECOMMENDATION_TOP_K"""
+    return recommendation_scorer.rank(candidates, analyses, events, history, now)
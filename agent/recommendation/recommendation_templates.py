@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from agent.recommendation.activity_stats import TIME_BUCKETS
+
+# Language of template recommendations: "vi" or "en"
+RECOMMENDATION_LANGUAGE = os.environ.get("RECOMMENDATION_LANGUAGE", "vi")
+# Share of each generation's candidates that templates may fill (0: LLM only; 1: the LLM only fills what templates leave open)
+RECOMMENDATION_TEMPLATE_SHARE = float(os.environ.get("RECOMMENDATION_TEMPLATE_SHARE", "0.5"))
+# Events starting within this many hours get a preparation reminder
+RECOMMENDATION_TEMPLATE_EVENT_HOURS = float(os.environ.get("RECOMMENDATION_TEMPLATE_EVENT_HOURS", "3"))
+# Activities need this many occurrences per week to count as a routine
+RECOMMENDATION_ROUTINE_MIN_PER_WEEK = float(os.environ.get("RECOMMENDATION_ROUTINE_MIN_PER_WEEK", "2"))
+# Minutes between the shown_at times of template recommendations (as the prompt asks of the LLM)
+TEMPLATE_SPACING_MINUTES = 20
+# Event reminders show this many minutes before the event
+EVENT_LEAD_MINUTES = 30
+
+TEMPLATES = {
+    "vi": {
+        "event_title": "Sắp tới: {event}",
+        "event_content": "{event} bắt đầu lúc {time}{location}. Hãy chuẩn bị trước khoảng {lead} phút.",
+        "event_location": " tại {location}",
+        "event_reason": "Sự kiện trong lịch của bạn sắp diễn ra.",
+        "routine_title": "Đến giờ {activity} rồi",
+        "routine_content": "Bạn thường {activity} vào {time_of_day} (khoảng {per_week} lần/tuần). Dành thời gian cho nó ngay bây giờ nhé.",
+        "routine_reason": "Thói quen quen thuộc của bạn vào khung giờ này.",
+        "time_of_day": {"night": "ban đêm", "morning": "buổi sáng", "afternoon": "buổi chiều", "evening": "buổi tối"},
+        "conflict_title": "Trùng lịch: {first} / {second}",
+        "conflict_content": "{first} ({first_time}) bị trùng giờ với {second} ({second_time}). Bạn có muốn dời một trong hai không?"
+    },
+    "en": {
+        "event_title": "Coming up: {event}",
+        "event_content": "{event} starts at {time}{location}. Get ready about {lead} minutes ahead.",
+        "event_location": " at {location}",
+        "event_reason": "An event on your calendar is about to start.",
+        "routine_title": "Time for your {activity}",
+        "routine_content": "You usually do {activity} in the {time_of_day} (about {per_week} times a week). Now is a good time for it.",
+        "routine_reason": "A regular habit of yours at this time of day.",
+        "time_of_day": {"night": "night", "morning": "morning", "afternoon": "afternoon", "evening": "evening"},
+        "conflict_title": "Schedule conflict: {first} / {second}",
+        "conflict_content": "{first} ({first_time}) overlaps with {second} ({second_time}). Consider moving one of them."
+    }
+}
+
+
+def _naive(value: datetime) -> datetime:
+    """Wall-clock time of value"""
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def template_recommendations(analyses: List[Dict], events: List[Dict], limit: int,
+                             now: Optional[datetime] = None, language: str = RECOMMENDATION_LANGUAGE) -> List[Dict]:
+    """Routine recommendations built from templates, without an LLM call (at most limit, most important first).
+
+    - event: an upcoming event starting within RECOMMENDATION_TEMPLATE_EVENT_HOURS, shown EVENT_LEAD_MINUTES before it
+    - activity: a routine activity whose preferred time of day is now or starts within the next hour
+    """
+    if limit <= 0:
+        return []
+    now = _naive(now or datetime.now())
+    texts = TEMPLATES.get(language, TEMPLATES["en"])
+    candidates = []
+
+    for event in events:
+        start = event.get('start_time')
+        if not isinstance(start, datetime):
+            continue
+        start = _naive(start)
+        if not now <= start <= now + timedelta(hours=RECOMMENDATION_TEMPLATE_EVENT_HOURS):
+            continue
+        name = event.get('event_name') or ''
+        location = texts["event_location"].format(location=event['location']) if event.get('location') else ""
+        candidates.append({
+            "recommendation_type": "event",
+            "title": texts["event_title"].format(event=name)[:50],
+            "content": texts["event_content"].format(event=name, time=start.strftime("%H:%M"), location=location, lead=EVENT_LEAD_MINUTES),
+            "score": 9 if str(event.get('priority') or '').lower() == 'high' else 7,
+            "reason": texts["event_reason"],
+            "status": "pending",
+            "shown_at": max(now, start - timedelta(minutes=EVENT_LEAD_MINUTES))
+        })
+
+    # Current time-of-day bucket, and the next one if it starts within the hour
+    bucket = now.hour // 6
+    windows = {TIME_BUCKETS[bucket]: now}
+    next_start = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(hours=6 * (bucket + 1))
+    if next_start - now <= timedelta(hours=1):
+        windows[TIME_BUCKETS[(bucket + 1) % len(TIME_BUCKETS)]] = next_start
+
+    for analysis in sorted(analyses, key=lambda a: -(a.get('frequency_per_week') or 0)):
+        preferred_time = str(analysis.get('preferred_time') or '').lower()
+        per_week = analysis.get('frequency_per_week') or 0
+        if preferred_time not in windows or per_week < RECOMMENDATION_ROUTINE_MIN_PER_WEEK:
+            continue
+        activity = analysis.get('activity_type') or ''
+        candidates.append({
+            "recommendation_type": "activity",
+            "title": texts["routine_title"].format(activity=activity)[:50],
+            "content": texts["routine_content"].format(activity=activity, time_of_day=texts["time_of_day"][preferred_time], per_week=per_week),
+            "score": 8 if per_week >= 5 else 6,
+            "reason": texts["routine_reason"],
+            "status": "pending",
+            "shown_at": windows[preferred_time]
+        })
+
+    # Most important first, then spread the chosen ones TEMPLATE_SPACING_MINUTES apart
+    chosen = sorted(candidates, key=lambda c: (-c['score'], c['shown_at']))[:limit]
+    previous = None
+    for rec in sorted(chosen, key=lambda c: c['shown_at']):
+        if previous and rec['shown_at'] < previous + timedelta(minutes=TEMPLATE_SPACING_MINUTES):
+            rec['shown_at'] = previous + timedelta(minutes=TEMPLATE_SPACING_MINUTES)
+        previous = rec['shown_at']
+    return chosen
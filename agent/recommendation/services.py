@@ -3,6 +3,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from core.base.storage import DatabaseManager
+from core.utils.interval_index import build_event_index
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import psycopg2
@@ -444,23 +445,29 @@ def alert_exists(title: str, alert_type: str, user_id: str = DEFAULT_USER_ID) ->
             conn.close()
     return False
 
-def get_event_conflicts(hours_ahead: int = 24) -> List[dict]:
-    """Get overlapping events in the next specified hours"""
+def get_event_conflicts(hours_ahead: int = 24, user_id: Optional[str] = None) -> List[dict]:
+    """Get pairs of overlapping events in the next specified hours (sorted sweep per user, each pair once)"""
     conn = db.get_connection()
     if conn:
         try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
-                    SELECT e1.*, e2.event_name as conflict_event, e2.event_id as conflict_id
-                    FROM event e1
-                    JOIN event e2 ON e1.event_id != e2.event_id
-                    WHERE e1.start_time BETWEEN NOW() AND NOW() + INTERVAL '%s hours'
-                    AND e2.start_time BETWEEN NOW() AND NOW() + INTERVAL '%s hours'
-                    AND (e1.start_time, COALESCE(e1.end_time, e1.start_time + INTERVAL '1 hour')) 
-                        OVERLAPS 
-                        (e2.start_time, COALESCE(e2.end_time, e2.start_time + INTERVAL '1 hour'))
-                """, (hours_ahead, hours_ahead))
-                return [dict(row) for row in cur.fetchall()]
+                    SELECT event_id, user_id, event_name, start_time, end_time, location, priority
+                    FROM event
+                    WHERE start_time BETWEEN NOW() AND NOW() + INTERVAL '%s hours'
+                    AND (%s IS NULL OR user_id = %s::uuid)
+                    ORDER BY user_id, start_time
+                """, (hours_ahead, user_id, user_id))
+                events_by_user = {}
+                for row in cur.fetchall():
+                    events_by_user.setdefault(str(row['user_id']), []).append(dict(row, user_id=str(row['user_id'])))
+
+            conflicts = []
+            for events in events_by_user.values():
+                for first, second in build_event_index(events).overlapping_pairs():
+                    conflicts.append(dict(first, conflict_id=second['event_id'], conflict_event=second['event_name'],
+                                          conflict_start_time=second['start_time'], conflict_end_time=second['end_time']))
+            return conflicts
         except psycopg2.Error as e:
             print(f"Error getting event conflicts: {e}")
             return []
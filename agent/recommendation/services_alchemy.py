@@ -3,8 +3,10 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from core.base.alchemy_storage import DatabaseManager
-from database.alchemy_models import Activity, ActivityAnalysis, Event, Alert, Recommendation
-from sqlalchemy import func
+from core.utils.interval_index import build_event_index
+from database.alchemy_models import Activity, ActivityAnalysis, ActivityTypeSynonym, Event, Alert, Recommendation, RecommendationFingerprint, DB_PARTITIONING
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 
@@ -13,6 +15,22 @@ db = DatabaseManager()
 # Hardcoded default user ID for now
 DEFAULT_USER_ID = '12345678-1234-1234-1234-123456789012'
 
+# Lease pending alerts to one sender. SKIP LOCKED lets concurrent instances claim disjoint rows without
+# waiting on each other; an expired lease (sender died mid-dispatch) can be claimed again.
+CLAIM_ALERTS_SQL = text("""
+    UPDATE alert
+    SET claimed_by = :worker_id, claim_expires_at = :expires_at
+    WHERE alert_id IN (
+        SELECT alert_id
+        FROM alert
+        WHERE alert_id = ANY(:alert_ids)
+        AND status = 'pending'
+        AND (claim_expires_at IS NULL OR claim_expires_at < :now)
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING alert_id, user_id, alert_type, title, message, trigger_time, priority, status, source, created_at
+""")
+
 def create_activity(activity_data: Dict, user_id: str = DEFAULT_USER_ID) -> Optional[int]:
     """Create a new activity with user_id"""
     with db.get_session() as session:
@@ -149,6 +167,30 @@ def get_all_activities(user_id: str = DEFAULT_USER_ID) -> List[Dict]:
             print(f"Error getting all activities: {e}")
             return []
 
+def get_activities_since(since: datetime, user_id: str = DEFAULT_USER_ID) -> List[Dict]:
+    """Get a user's activities that started at or after since"""
+    with db.get_session() as session:
+        try:
+            activities = session.query(Activity).filter(
+                Activity.user_id == user_id,
+                Activity.start_at >= since
+            ).order_by(Activity.start_at.desc()).all()
+            
+            return [{
+                'id': a.id,
+                'user_id': str(a.user_id),
+                'name': a.name,
+                'description': a.description,
+                'start_at': a.start_at,
+                'end_at': a.end_at,
+                'tags': a.tags,
+                'status': a.status,
+                'created_at': a.created_at
+            } for a in activities]
+        except Exception as e:
+            print(f"Error getting activities since {since}: {e}")
+            return []
+
 def mark_activities_analyzed(activity_ids: List[int], user_id: str = DEFAULT_USER_ID) -> bool:
     """Mark multiple activities as analyzed for a specific user"""
     with db.get_session() as session:
@@ -166,6 +208,59 @@ def mark_activities_analyzed(activity_ids: List[int], user_id: str = DEFAULT_USE
             session.rollback()
             return False
 
+#======================================================
+# Activity Type Synonyms
+#======================================================
+
+def get_activity_type_synonyms(terms: List[str], user_id: str = DEFAULT_USER_ID) -> Dict[str, str]:
+    """Map the given terms a user already has in the synonym map to their canonical activity type"""
+    if not terms:
+        return {}
+    with db.get_session() as session:
+        try:
+            rows = session.query(ActivityTypeSynonym.term, ActivityTypeSynonym.canonical_type).filter(
+                ActivityTypeSynonym.user_id == user_id,
+                ActivityTypeSynonym.term.in_(terms)
+            ).all()
+            return {term: canonical_type for term, canonical_type in rows}
+        except Exception as e:
+            print(f"Error getting activity type synonyms: {e}")
+            return {}
+
+def get_canonical_activity_types(user_id: str = DEFAULT_USER_ID) -> List[Dict]:
+    """Get a user's canonical activity types with their embeddings"""
+    with db.get_session() as session:
+        try:
+            rows = session.query(ActivityTypeSynonym.canonical_type, ActivityTypeSynonym.embedding).filter(
+                ActivityTypeSynonym.user_id == user_id,
+                ActivityTypeSynonym.term == ActivityTypeSynonym.canonical_type,
+                ActivityTypeSynonym.embedding.isnot(None)
+            ).all()
+            return [{'canonical_type': canonical_type, 'embedding': embedding} for canonical_type, embedding in rows]
+        except Exception as e:
+            print(f"Error getting canonical activity types: {e}")
+            return []
+
+def save_activity_type_synonyms(synonyms: List[Dict], user_id: str = DEFAULT_USER_ID) -> bool:
+    """Add terms (term, canonical_type, similarity, embedding) to a user's synonym map; known terms are kept as they are"""
+    if not synonyms:
+        return True
+    with db.get_session() as session:
+        try:
+            session.execute(insert(ActivityTypeSynonym).values([{
+                'user_id': user_id,
+                'term': synonym['term'],
+                'canonical_type': synonym['canonical_type'],
+                'similarity': synonym.get('similarity'),
+                'embedding': synonym.get('embedding')
+            } for synonym in synonyms]).on_conflict_do_nothing(index_elements=['user_id', 'term']))
+            session.commit()
+            return True
+        except Exception as e:
+            print(f"Error saving activity type synonyms: {e}")
+            session.rollback()
+            return False
+
 #======================================================
 # Activity Analysis Functions
 #======================================================
@@ -211,7 +306,11 @@ def get_activity_analysis(activity_type: str, user_id: str = DEFAULT_USER_ID) ->
                     'frequency_per_week': analysis.frequency_per_week,
                     'frequency_per_month': analysis.frequency_per_month,
                     'last_updated': analysis.last_updated,
-                    'description': analysis.description
+                    'description': analysis.description,
+                    'occurrence_count': analysis.occurrence_count,
+                    'last_seen': analysis.last_seen,
+                    'aggregates': analysis.aggregates,
+                    'narrative_baseline': analysis.narrative_baseline
                 }
             return None
         except Exception as e:
@@ -242,11 +341,57 @@ def update_activity_analysis(analysis_id: int, analysis_data: Dict) -> bool:
             session.rollback()
             return False
 
-def get_all_activity_analysis() -> List[Dict]:
-    """Get all activity analyses"""
+def save_activity_analyses(analysis_records: List[Dict], activity_ids: List[int], user_id: str = DEFAULT_USER_ID) -> bool:
+    """Upsert a user's analyses and mark the analyzed activities in one transaction (all or nothing)"""
     with db.get_session() as session:
         try:
-            analyses = session.query(ActivityAnalysis).order_by(
+            activity_types = [record["activity_type"] for record in analysis_records]
+            existing = {}
+            for analysis in session.query(ActivityAnalysis).filter(
+                ActivityAnalysis.user_id == user_id,
+                ActivityAnalysis.activity_type.in_(activity_types)
+            ).order_by(ActivityAnalysis.last_updated.desc()):
+                # Same row get_activity_analysis would pick: the most recently updated one
+                existing.setdefault(analysis.activity_type, analysis)
+
+            for record in analysis_records:
+                analysis = existing.get(record["activity_type"])
+                if analysis is None:
+                    analysis = ActivityAnalysis(user_id=user_id, activity_type=record["activity_type"])
+                    session.add(analysis)
+                analysis.preferred_time = record.get("preferred_time")
+                analysis.frequency_per_week = record.get("frequency_per_week", 0)
+                analysis.frequency_per_month = record.get("frequency_per_month", 0)
+                analysis.description = record.get("description", "No description provided")
+                analysis.last_updated = func.current_timestamp()
+                if "aggregates" in record:
+                    analysis.aggregates = record["aggregates"]
+                    analysis.narrative_baseline = record.get("narrative_baseline")
+                    analysis.occurrence_count = record.get("occurrence_count", 0)
+                    analysis.last_seen = record.get("last_seen")
+
+            if activity_ids:
+                session.query(Activity).filter(
+                    Activity.id.in_(activity_ids),
+                    Activity.user_id == user_id
+                ).update({'status': 'analyzed'}, synchronize_session=False)
+            session.commit()
+
+            print(f"✅ Saved {len(analysis_records)} analyses and marked {len(activity_ids)} activities as analyzed for user {user_id}")
+            return True
+        except Exception as e:
+            print(f"Error saving activity analyses: {e}")
+            session.rollback()
+            return False
+
+def get_all_activity_analysis(user_id: Optional[str] = None) -> List[Dict]:
+    """Get all activity analyses (of one user when user_id is given)"""
+    with db.get_session() as session:
+        try:
+            query = session.query(ActivityAnalysis)
+            if user_id is not None:
+                query = query.filter(ActivityAnalysis.user_id == user_id)
+            analyses = query.order_by(
                 ActivityAnalysis.last_updated.desc()
             ).all()
             
@@ -258,7 +403,11 @@ def get_all_activity_analysis() -> List[Dict]:
                 'frequency_per_week': a.frequency_per_week,
                 'frequency_per_month': a.frequency_per_month,
                 'last_updated': a.last_updated,
-                'description': a.description
+                'description': a.description,
+                'occurrence_count': a.occurrence_count,
+                'last_seen': a.last_seen,
+                'aggregates': a.aggregates,
+                'narrative_baseline': a.narrative_baseline
             } for a in analyses]
         except Exception as e:
             print(f"Error getting all activity analyses: {e}")
@@ -301,7 +450,6 @@ def get_upcoming_events(days: int = 7, user_id: str = DEFAULT_USER_ID) -> List[D
                 'location': e.location,
                 'priority': e.priority,
                 'description': e.description,
-                'source': e.source,
                 'created_at': e.created_at,
                 'updated_at': e.updated_at
             } for e in events]
@@ -337,6 +485,71 @@ def create_recommendation(recommendation_data: List[Dict], user_id: str = DEFAUL
             session.rollback()
             return None
 
+def get_recent_recommendations(days: int = 30, user_id: str = DEFAULT_USER_ID) -> List[Dict]:
+    """Get a user's recommendations of the last days (with their accept/reject status), newest first"""
+    with db.get_session() as session:
+        try:
+            since = datetime.now() - timedelta(days=days)
+            recommendations = session.query(Recommendation).filter(
+                Recommendation.user_id == user_id,
+                Recommendation.created_at >= since
+            ).order_by(Recommendation.created_at.desc()).all()
+
+            return [{
+                'recommendation_id': r.recommendation_id,
+                'recommendation_type': r.recommendation_type,
+                'title': r.title,
+                'content': r.content,
+                'score': r.score,
+                'status': r.status,
+                'created_at': r.created_at,
+                'shown_at': r.shown_at
+            } for r in recommendations]
+        except Exception as e:
+            print(f"Error getting recent recommendations: {e}")
+            return []
+
+def get_recommendation_fingerprint(user_id: str = DEFAULT_USER_ID) -> Optional[Dict]:
+    """Get the inputs fingerprint of a user's last recommendation generation"""
+    with db.get_session() as session:
+        try:
+            row = session.get(RecommendationFingerprint, user_id)
+            if row:
+                return {
+                    'fingerprint': row.fingerprint,
+                    'generated_at': row.generated_at,
+                    'recommendation_count': row.recommendation_count
+                }
+            return None
+        except Exception as e:
+            print(f"Error getting recommendation fingerprint: {e}")
+            return None
+
+def save_recommendation_fingerprint(fingerprint: str, recommendation_count: int, user_id: str = DEFAULT_USER_ID) -> bool:
+    """Store the inputs fingerprint of a user's latest recommendation generation"""
+    with db.get_session() as session:
+        try:
+            statement = insert(RecommendationFingerprint).values(
+                user_id=user_id,
+                fingerprint=fingerprint,
+                generated_at=func.current_timestamp(),
+                recommendation_count=recommendation_count
+            )
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['user_id'],
+                set_={
+                    'fingerprint': statement.excluded.fingerprint,
+                    'generated_at': statement.excluded.generated_at,
+                    'recommendation_count': statement.excluded.recommendation_count
+                }
+            ))
+            session.commit()
+            return True
+        except Exception as e:
+            print(f"Error saving recommendation fingerprint: {e}")
+            session.rollback()
+            return False
+
 def update_recommendation_status(recommendation_id: int, status: str) -> bool:
     """Update recommendation status"""
     with db.get_session() as session:
@@ -354,6 +567,32 @@ def update_recommendation_status(recommendation_id: int, status: str) -> bool:
             session.rollback()
             return False
 
+def record_alert_feedback(alert_id: int, status: str) -> Optional[int]:
+    """Record feedback given on a recommendation alert (e.g. from its notification) on the recommendation it came from.
+
+    Alerts do not reference their recommendation; it is the user's newest one with the alert's title.
+    Returns the recommendation_id, or None if the alert is not a recommendation alert.
+    """
+    with db.get_session() as session:
+        try:
+            alert = session.query(Alert).filter(Alert.alert_id == alert_id).first()
+            if not alert or alert.source != 'recommendation':
+                return None
+            recommendation = session.query(Recommendation).filter(
+                Recommendation.user_id == alert.user_id,
+                Recommendation.title == alert.title
+            ).order_by(Recommendation.recommendation_id.desc()).first()
+            if not recommendation:
+                return None
+            recommendation.status = status
+            session.commit()
+            print(f"✅ Recorded '{status}' for recommendation {recommendation.recommendation_id} (alert {alert_id})")
+            return recommendation.recommendation_id
+        except Exception as e:
+            print(f"Error recording alert feedback: {e}")
+            session.rollback()
+            return None
+
 def create_system_alert(alert_data: Dict, user_id: str = DEFAULT_USER_ID) -> Optional[int]:
     """Create a system alert in the database for a specific user"""
     with db.get_session() as session:
@@ -379,6 +618,60 @@ def create_system_alert(alert_data: Dict, user_id: str = DEFAULT_USER_ID) -> Opt
             session.rollback()
             return None
 
+def create_system_alerts(alerts_data: List[Dict], user_id: str = DEFAULT_USER_ID) -> List[int]:
+    """Create several system alerts in one INSERT, skipping any that duplicates a pending alert (same type and title).
+
+    The unique partial index on pending (user_id, alert_type, title) makes the check race-free. Partitioned
+    alert tables cannot have it, so there the user's alert inserts are serialized with an advisory lock.
+    Returns the IDs of the alerts actually created.
+    """
+    rows = {}
+    for alert_data in alerts_data:
+        row = {
+            "user_id": user_id,
+            "alert_type": alert_data.get("alert_type", "system"),
+            "title": alert_data.get("title"),
+            "message": alert_data.get("message"),
+            "trigger_time": alert_data.get("trigger_time", datetime.now()),
+            "priority": alert_data.get("priority", "medium"),
+            "status": alert_data.get("status", "pending"),
+            "source": alert_data.get("source", "recommendation"),
+            "event_id": alert_data.get("event_id")
+        }
+        # One statement cannot conflict with itself, so duplicates within the batch are dropped here
+        rows.setdefault((row["alert_type"], row["title"], row["status"]), row)
+    if not rows:
+        return []
+
+    with db.get_session() as session:
+        try:
+            if DB_PARTITIONING:
+                session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"alerts:{user_id}"})
+                pending = session.query(Alert.alert_type, Alert.title).filter(
+                    Alert.user_id == user_id,
+                    Alert.status == 'pending',
+                    Alert.title.in_([title for _, title, _ in rows])
+                ).all()
+                for alert_type, title in pending:
+                    rows.pop((alert_type, title, 'pending'), None)
+                if not rows:
+                    return []
+                statement = insert(Alert).values(list(rows.values()))
+            else:
+                statement = insert(Alert).values(list(rows.values())).on_conflict_do_nothing(
+                    index_elements=['user_id', 'alert_type', 'title'],
+                    index_where=text("status = 'pending'")
+                )
+            alert_ids = session.execute(statement.returning(Alert.alert_id)).scalars().all()
+            session.commit()
+
+            print(f"✅ Created {len(alert_ids)} of {len(alerts_data)} alerts for user {user_id}")
+            return list(alert_ids)
+        except Exception as e:
+            print(f"❌ Error creating alerts: {e}")
+            session.rollback()
+            return []
+
 def alert_exists(title: str, alert_type: str, user_id: str = DEFAULT_USER_ID) -> bool:
     """Check if alert already exists for a specific user"""
     with db.get_session() as session:
@@ -394,25 +687,54 @@ def alert_exists(title: str, alert_type: str, user_id: str = DEFAULT_USER_ID) ->
             print(f"Error checking alert existence: {e}")
             return False
 
-def get_event_conflicts(hours_ahead: int = 24) -> List[dict]:
-    """Get overlapping events in the next specified hours"""
+def get_alerted_events(event_ids: List[int], source: str, user_id: str = DEFAULT_USER_ID) -> set:
+    """(event_id, title) of every alert from source on these events, in any status (sent and cancelled ones too)"""
+    if not event_ids:
+        return set()
+    with db.get_session() as session:
+        try:
+            rows = session.query(Alert.event_id, Alert.title).filter(
+                Alert.user_id == user_id,
+                Alert.source == source,
+                Alert.event_id.in_(event_ids)
+            ).all()
+            return {(event_id, title) for event_id, title in rows}
+        except Exception as e:
+            print(f"Error getting alerted events: {e}")
+            return set()
+
+def get_event_conflicts(hours_ahead: int = 24, user_id: Optional[str] = None) -> List[dict]:
+    """Get pairs of overlapping events starting in the next specified hours (of one user when user_id is given).
+
+    One range query on (user_id, start_time); overlaps are then found per user with a sorted sweep instead of
+    a self-join. Every pair is returned once, the earlier event first.
+    """
     with db.get_session() as session:
         try:
-            from sqlalchemy.sql import text
             end_time = datetime.now() + timedelta(hours=hours_ahead)
-            
-            result = session.execute(text("""
-                SELECT e1.*, e2.event_name as conflict_event, e2.event_id as conflict_id
-                FROM event e1
-                JOIN event e2 ON e1.event_id != e2.event_id
-                WHERE e1.start_time BETWEEN NOW() AND :end_time
-                AND e2.start_time BETWEEN NOW() AND :end_time
-                AND (e1.start_time, COALESCE(e1.end_time, e1.start_time + INTERVAL '1 hour')) 
-                    OVERLAPS 
-                    (e2.start_time, COALESCE(e2.end_time, e2.start_time + INTERVAL '1 hour'))
-            """), {'end_time': end_time})
-            
-            return [dict(row) for row in result]
+            query = session.query(Event).filter(
+                Event.start_time >= func.current_timestamp(),
+                Event.start_time <= end_time
+            )
+            if user_id:
+                query = query.filter(Event.user_id == user_id)
+            events_by_user = {}
+            for e in query.order_by(Event.user_id, Event.start_time).all():
+                events_by_user.setdefault(str(e.user_id), []).append({
+                    'event_id': e.event_id,
+                    'event_name': e.event_name,
+                    'start_time': e.start_time,
+                    'end_time': e.end_time,
+                    'location': e.location,
+                    'priority': e.priority
+                })
+
+            conflicts = []
+            for owner, events in events_by_user.items():
+                for first, second in build_event_index(events).overlapping_pairs():
+                    conflicts.append(dict(first, user_id=owner, conflict_id=second['event_id'], conflict_event=second['event_name'],
+                                          conflict_start_time=second['start_time'], conflict_end_time=second['end_time']))
+            return conflicts
         except Exception as e:
             print(f"Error getting event conflicts: {e}")
             return []
@@ -456,7 +778,6 @@ def get_today_events() -> List[dict]:
                 'location': e.location,
                 'priority': e.priority,
                 'description': e.description,
-                'source': e.source,
                 'created_at': e.created_at,
                 'updated_at': e.updated_at
             } for e in events]
@@ -543,6 +864,35 @@ def get_due_alerts(user_id: str = DEFAULT_USER_ID) -> List[Dict]:
             print(f"Error getting due alerts: {e}")
             return []
 
+def get_all_due_alerts() -> List[Dict]:
+    """Get alerts of all users that are upcoming in 60 minutes, in one query"""
+    with db.get_session() as session:
+        try:
+            now = datetime.now()
+            future = now + timedelta(minutes=60)
+            
+            alerts = session.query(Alert).filter(
+                Alert.status == 'pending',
+                Alert.trigger_time >= now,
+                Alert.trigger_time <= future
+            ).order_by(Alert.priority.desc(), Alert.trigger_time.asc()).all()
+            
+            return [{
+                'alert_id': a.alert_id,
+                'user_id': str(a.user_id),
+                'alert_type': a.alert_type,
+                'title': a.title,
+                'message': a.message,
+                'trigger_time': a.trigger_time,
+                'priority': a.priority,
+                'status': a.status,
+                'source': a.source,
+                'created_at': a.created_at
+            } for a in alerts]
+        except Exception as e:
+            print(f"Error getting due alerts of all users: {e}")
+            return []
+
 def update_alert_status(alert_id: int, status: str, user_id: str = DEFAULT_USER_ID) -> bool:
     """Update alert status for a specific user"""
     with db.get_session() as session:
@@ -556,4 +906,145 @@ def update_alert_status(alert_id: int, status: str, user_id: str = DEFAULT_USER_
         except Exception as e:
             print(f"Error updating alert status: {e}")
             session.rollback()
-            return False
\ No newline at end of file
+            return False
+def get_scheduled_alerts(since: Optional[datetime] = None) -> List[Dict]:
+    """Get pending alerts of all users, with trigger_time at or after since if given (scheduler initial load)"""
+    with db.get_session() as session:
+        try:
+            query = session.query(Alert.alert_id, Alert.trigger_time).filter(Alert.status == 'pending')
+            if since is not None:
+                query = query.filter(Alert.trigger_time >= since)
+            alerts = query.all()
+            return [{'alert_id': a.alert_id, 'trigger_time': a.trigger_time} for a in alerts]
+        except Exception as e:
+            print(f"Error getting scheduled alerts: {e}")
+            return []
+
+def get_pending_alerts_by_ids(alert_ids: List[int]) -> List[Dict]:
+    """Get the alerts among alert_ids that are still pending"""
+    if not alert_ids:
+        return []
+    with db.get_session() as session:
+        try:
+            alerts = session.query(Alert).filter(
+                Alert.alert_id.in_(alert_ids),
+                Alert.status == 'pending'
+            ).order_by(Alert.priority.desc(), Alert.trigger_time.asc()).all()
+            
+            return [{
+                'alert_id': a.alert_id,
+                'user_id': str(a.user_id),
+                'alert_type': a.alert_type,
+                'title': a.title,
+                'message': a.message,
+                'trigger_time': a.trigger_time,
+                'priority': a.priority,
+                'status': a.status,
+                'source': a.source,
+                'created_at': a.created_at,
+                'claimed_by': a.claimed_by,
+                'claim_expires_at': a.claim_expires_at
+            } for a in alerts]
+        except Exception as e:
+            print(f"Error getting pending alerts by ids: {e}")
+            return []
+
+def expire_missed_alerts(before: datetime) -> int:
+    """Mark pending alerts whose trigger_time is older than before as failed (missed delivery window)"""
+    with db.get_session() as session:
+        try:
+            updated = session.query(Alert).filter(
+                Alert.status == 'pending',
+                Alert.trigger_time < before
+            ).update({'status': 'failed'}, synchronize_session=False)
+            session.commit()
+            return updated
+        except Exception as e:
+            print(f"Error expiring missed alerts: {e}")
+            session.rollback()
+            return 0
+
+def update_alerts_status(alert_ids: List[int], status: str) -> int:
+    """Update the status of many alerts in one statement"""
+    if not alert_ids:
+        return 0
+    with db.get_session() as session:
+        try:
+            updated = session.query(Alert).filter(
+                Alert.alert_id.in_(alert_ids)
+            ).update({'status': status}, synchronize_session=False)
+            session.commit()
+            return updated
+        except Exception as e:
+            print(f"Error updating alerts status: {e}")
+            session.rollback()
+            return 0
+
+def get_users_with_pending_activities() -> List[str]:
+    """Get the ids of all users that have activities waiting for analysis"""
+    with db.get_session() as session:
+        try:
+            rows = session.query(Activity.user_id).filter(
+                Activity.status == 'pending'
+            ).distinct().all()
+            return [str(user_id) for (user_id,) in rows]
+        except Exception as e:
+            print(f"Error getting users with pending activities: {e}")
+            return []
+
+def get_users_with_recommendation_data(days: int = 1) -> List[str]:
+    """Get the ids of all users that have activity analyses or upcoming events to recommend from"""
+    with db.get_session() as session:
+        try:
+            end_date = datetime.now() + timedelta(days=days)
+            analysed = session.query(ActivityAnalysis.user_id)
+            upcoming = session.query(Event.user_id).filter(
+                Event.start_time >= func.current_timestamp(),
+                Event.start_time <= end_date
+            )
+            rows = analysed.union(upcoming).all()
+            return [str(user_id) for (user_id,) in rows]
+        except Exception as e:
+            print(f"Error getting users with recommendation data: {e}")
+            return []
+
+def claim_alerts(alert_ids: List[int], worker_id: str, lease_seconds: int = 300) -> List[Dict]:
+    """Claim the still-pending, unclaimed alerts among alert_ids for worker_id; returns only the claimed ones"""
+    if not alert_ids:
+        return []
+    with db.get_session() as session:
+        try:
+            now = datetime.now()
+            rows = session.execute(CLAIM_ALERTS_SQL, {
+                'worker_id': worker_id,
+                'alert_ids': list(alert_ids),
+                'now': now,
+                'expires_at': now + timedelta(seconds=lease_seconds)
+            }).fetchall()
+            session.commit()
+            alerts = [dict(row._mapping) for row in rows]
+            for alert in alerts:
+                alert['user_id'] = str(alert['user_id'])
+            return alerts
+        except Exception as e:
+            print(f"Error claiming alerts: {e}")
+            session.rollback()
+            return []
+
+def release_alerts(alert_ids: List[int], worker_id: str) -> int:
+    """Drop worker_id's claim on the still-pending alerts among alert_ids so they can be claimed again at once"""
+    if not alert_ids:
+        return 0
+    with db.get_session() as session:
+        try:
+            updated = session.query(Alert).filter(
+                Alert.alert_id.in_(alert_ids),
+                Alert.status == 'pending',
+                Alert.claimed_by == worker_id
+            ).update({'claimed_by': None, 'claim_expires_at': None}, synchronize_session=False)
+            session.commit()
+            return updated
+        except Exception as e:
+            print(f"Error releasing alerts: {e}")
+            session.rollback()
+            return 0
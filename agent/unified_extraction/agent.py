@@ -0,0 +1,271 @@
+import sys
+import os
+import streamlit as st
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from langgraph.graph import StateGraph, START, END
+from datetime import datetime
+from typing import List, Optional, Literal
+from typing_extensions import TypedDict
+from langchain_openai import ChatOpenAI
+import dotenv
+from core.base.schema import UnifiedExtraction
+from core.base.mcp_client import initialize_session
+from core.base.agent_registry import get_shared_agent
+from core.utils.get_current_profile import get_user_profile
+from tools.retrieve_history import retrieval_tool
+from agent.extract_user_info.agent import get_user_info_extraction_agent
+from agent.extract_event.agent import get_event_extraction_agent
+from agent.recommendation.activity_extractor import activity_extractor
+from agent.unified_extraction.prompt import UNIFIED_EXTRACTION_PROMPT
+
+dotenv.load_dotenv()
+
+openai_api = os.environ.get("OPENAI_API_KEY")
+
+class UnifiedExtractionState(TypedDict):
+    """State for the unified (single-pass) extraction agent"""
+    user_input: str
+    current_context: str
+    current_profile: dict
+    current_datetime: str
+    user_timezone: str
+    user_info: dict
+    event_intent: str
+    events: List[dict]
+    activities: List[dict]
+    user_info_result: str
+    event_result: str
+    activity_result: str
+    error: Optional[str]
+    failed: bool  # a step failed with an exception (LLM, database), not because of the input
+
+class UnifiedExtractionAgent:
+    """Extracts user info, events and activities from one message with one structured-output call,
+    then hands each part to the existing validate/save nodes of the specialised agents"""
+
+    def __init__(self, llm: ChatOpenAI = None):
+        self.llm = llm or ChatOpenAI(
+            model_name="gpt-4o-mini",
+            temperature=0.1,
+            max_tokens=1500,
+            base_url="https://warranty-api-dev.picontechnology.com:8443",
+            openai_api_key=openai_api,
+        )
+        self.user_info_agent = get_user_info_extraction_agent()
+        self.event_agent = get_event_extraction_agent()
+        self.activity_extractor = activity_extractor
+
+        self.graph = self._create_graph()
+
+    def _create_graph(self) -> StateGraph:
+        """Create the unified extraction graph: extract once, then route each result to its saver"""
+        graph = StateGraph(UnifiedExtractionState)
+
+        graph.add_node("extract", self._extract_node)
+        graph.add_node("user_info", self._user_info_node)
+        graph.add_node("events", self._events_node)
+        graph.add_node("activities", self._activities_node)
+
+        graph.add_edge(START, "extract")
+        graph.add_conditional_edges("extract", self._should_continue, {
+            "route": "user_info",
+            "end": END
+        })
+        graph.add_edge("user_info", "events")
+        graph.add_edge("events", "activities")
+        graph.add_edge("activities", END)
+
+        return graph.compile()
+
+    def _extract_node(self, state: UnifiedExtractionState) -> dict:
+        """Single structured-output call against the merged schema"""
+        print("🔍 Running unified extraction...")
+        try:
+            prompt = f"""{UNIFIED_EXTRACTION_PROMPT}
+
+Current date/time: {state.get("current_datetime")}
+User timezone: {state.get("user_timezone")}
+
+CURRENT USER PROFILE:
+{self.user_info_agent._format_user_profile(state.get("current_profile", {}))}
+
+Previous conversation context: {state.get("current_context", "")}
+
+USER INPUT TO ANALYZE:
+{state.get("user_input", "")}
+"""
+            response = self.llm.with_structured_output(UnifiedExtraction).invoke(prompt)
+
+            user_info = {}
+            if response.user_info:
+                for key, value in response.user_info.model_dump().items():
+                    if isinstance(value, str) and value.strip():
+                        user_info[key] = value.strip()
+                    elif value is not None and not isinstance(value, str):
+                        user_info[key] = value
+
+            events = []
+            for event in response.events or []:
+                filtered_event = {k: v for k, v in event.model_dump().items() if v is not None and str(v).strip()}
+                if filtered_event.get('event_name') or len(filtered_event) >= 2:
+                    events.append(filtered_event)
+
+            activities = [
+                activity.model_dump() for activity in response.activities or []
+                if activity.activity_name
+            ]
+
+            event_intent = (response.event_intent or "NONE").strip().upper()
+            if event_intent not in ("CREATE", "UPDATE", "SEARCH"):
+                event_intent = "CREATE" if events else "NONE"
+
+            print(f"🔍 Extracted: {len(user_info)} profile fields, {len(events)} events ({event_intent}), {len(activities)} activities")
+            return {
+                "user_info": user_info,
+                "event_intent": event_intent,
+                "events": events,
+                "activities": activities
+            }
+
+        except Exception as e:
+            print(f"❌ Error in unified extraction: {e}")
+            return {"error": f"Failed to extract information: {str(e)}", "failed": True}
+
+    def _user_info_node(self, state: UnifiedExtractionState) -> dict:
+        """Validate and save profile fields through the user info agent"""
+        user_info = state.get("user_info") or {}
+        if not user_info:
+            return {"user_info_result": ""}
+
+        validated = self.user_info_agent._validate_node({"extracted_info": user_info})
+        if validated.get("error"):
+            return {"user_info_result": f"❌ User info not saved: {validated['error']}", **self._failure(validated)}
+
+        saved = self.user_info_agent._save_node({"validated_info": validated["validated_info"]})
+        return {"user_info_result": saved.get("save_result") or f"❌ {saved.get('error', 'Failed to save user information')}",
+                **self._failure(saved)}
+
+    def _events_node(self, state: UnifiedExtractionState) -> dict:
+        """Create, update or search events through the event agent's nodes"""
+        event_intent = state.get("event_intent", "NONE")
+        if event_intent == "NONE":
+            return {"event_result": ""}
+
+        event_state = {
+            "user_input": state.get("user_input", ""),
+            "current_context": state.get("current_context", ""),
+            "extracted_events": state.get("events", []),
+            "validated_events": [],
+            "saved_result": "",
+            "error": None,
+            "current_datetime": state.get("current_datetime"),
+            "user_timezone": state.get("user_timezone", "UTC")
+        }
+
+        if event_intent == "UPDATE":
+            result = self.event_agent._update_node(event_state)
+        elif event_intent == "SEARCH":
+            result = self.event_agent._search_node(event_state)
+        else:
+            if not event_state["extracted_events"]:
+                return {"event_result": ""}
+            result = self.event_agent._validate_node(event_state)
+            if not result.get("error"):
+                event_state.update(result)
+                result = self.event_agent._save_node(event_state)
+
+        if result.get("error"):
+            return {"event_result": f"❌ Events: {result['error']}", **self._failure(result)}
+        return {"event_result": f"✅{result.get('saved_result', '')}"}
+
+    def _activities_node(self, state: UnifiedExtractionState) -> dict:
+        """Store extracted activities through the activity extractor"""
+        activities = state.get("activities") or []
+        if not activities:
+            return {"activity_result": ""}
+
+        stored_activities = self.activity_extractor.store_activities(activities)
+        result = {"activity_result": f"Stored {len(stored_activities)} of {len(activities)} activities: {[a['activity_name'] for a in stored_activities]}"}
+        if not stored_activities:
+            # Nothing could be written: a database failure, not an outcome of the input
+            result["failed"] = True
+        return result
+
+    @staticmethod
+    def _failure(node_result: dict) -> dict:
+        """State update marking the run failed when a specialised agent's node failed with an exception"""
+        return {"failed": True} if node_result.get("failed") else {}
+
+    def _should_continue(self, state: UnifiedExtractionState) -> Literal["route", "end"]:
+        """Stop on extraction errors, otherwise route the results"""
+        if state.get("error"):
+            print(f"❌ Stopping due to error: {state['error']}")
+            return "end"
+        return "route"
+
+    def _get_context(self, session_id: Optional[str]) -> str:
+        """Get conversation context the same way the event agent does"""
+        if not session_id:
+            initialize_session(self.event_agent.db)
+            session_id = st.session_state.get('single_session_id')
+        if session_id:
+            return retrieval_tool(session_id)
+        print("No session ID found, using empty context.")
+        return ""
+
+    def process(self, user_input: str, session_id: str = None, raise_errors: bool = False) -> str:
+        """Process one user message and save everything found in it.
+
+        With raise_errors, a step that failed with an exception raises (after the other steps ran) instead of only
+        being reported in the returned summary.
+        """
+        try:
+            print(f"🚀 Processing unified extraction for: {user_input[:50]}...")
+            result = self.graph.invoke({
+                "user_input": user_input,
+                "current_context": self._get_context(session_id),
+                "current_profile": get_user_profile() or {},
+                "current_datetime": datetime.now().isoformat(),
+                "user_timezone": "UTC",
+                "user_info": {},
+                "event_intent": "NONE",
+                "events": [],
+                "activities": [],
+                "user_info_result": "",
+                "event_result": "",
+                "activity_result": "",
+                "error": None,
+                "failed": False
+            })
+
+            parts = [
+                result.get("user_info_result"),
+                result.get("event_result"),
+                result.get("activity_result")
+            ]
+            summary = "\n".join(part for part in parts if part)
+            if result.get("failed") and raise_errors:
+                raise RuntimeError(result.get("error") or summary)
+
+            if result.get("error"):
+                return f"❌ Error: {result['error']}"
+            return summary or "No user information, events or activities were found in the input."
+
+        except Exception as e:
+            error_msg = f"❌ Unified extraction failed: {str(e)}"
+            print(error_msg)
+            if raise_errors:
+                raise
+            return error_msg
+
+def create_unified_extraction_agent(llm: ChatOpenAI = None) -> UnifiedExtractionAgent:
+    """Factory function to create the unified extraction agent"""
+    return UnifiedExtractionAgent(llm)
+
+def get_unified_extraction_agent() -> UnifiedExtractionAgent:
+    """Get the shared unified extraction agent (built once per process)"""
+    return get_shared_agent("unified_extraction", create_unified_extraction_agent)
+
+def capture_information(user_input: str, session_id: str = None, raise_errors: bool = False) -> str:
+    """Extract and save user info, events and activities from one message"""
+    return get_unified_extraction_agent().process(user_input, session_id, raise_errors)
@@ -0,0 +1,49 @@
+import threading
+from typing import Any, Callable, Dict
+
+
+class AgentRegistry:
+    """Process-wide registry that builds each agent once and hands out the shared instance"""
+
+    def __init__(self):
+        self._agents: Dict[str, Any] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the agent registered under name, building it with factory on first use"""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        # Per-name lock so a slow build (LLM client, DB pool, graph compile) only blocks callers of that agent
+        with build_lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                print(f"🔧 Building shared agent: {name}")
+                agent = factory()
+                self._agents[name] = agent
+            return agent
+
+    def reset(self, name: str = None):
+        """Drop one cached agent (or all of them) so the next call rebuilds it"""
+        with self._lock:
+            if name is None:
+                self._agents.clear()
+            else:
+                self._agents.pop(name, None)
+
+    def registered(self) -> list:
+        """Names of the agents currently built"""
+        return list(self._agents.keys())
+
+
+# Global registry instance
+agent_registry = AgentRegistry()
+
+def get_shared_agent(name: str, factory: Callable[[], Any]) -> Any:
+    """Get a shared agent instance from the global registry"""
+    return agent_registry.get(name, factory)
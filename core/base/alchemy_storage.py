@@ -1,15 +1,22 @@
 print('hello from storage.py - SQLAlchemy Enhanced Version')
 from sqlalchemy import create_engine, text, func
 from sqlalchemy.orm import sessionmaker, Session
-from database.alchemy_models import Base, User, ChatSession, ChatMessage, ChatSummary, Activity, Event, Alert, FCMToken, Recommendation
+from database.alchemy_models import Base, SCHEMA_UPGRADES, DB_PARTITIONING, User, ChatSession, ChatMessage, ChatSummary, Activity, Event, Alert, FCMToken, Recommendation
+from database.partitioning import ensure_partitions
 from typing import List, Optional, Dict, Any
 import os
 import uuid
+import threading
 from datetime import datetime, timedelta
 import dotenv
 dotenv.load_dotenv()
 import google.generativeai as genai
 
+# Many modules build their own DatabaseManager; the schema is created and upgraded by the first one only, so the
+# DDL (and its ACCESS EXCLUSIVE locks) does not run once per instance against live traffic
+_schema_lock = threading.Lock()
+_schema_ready = False
+
 class DatabaseManager:
     def __init__(self):
         # Database configuration
@@ -57,10 +64,17 @@ class DatabaseManager:
 
     def _initialize_database(self):
         """Initialize database tables and test connection"""
+        global _schema_ready
         try:
-            # Create all tables if they don't exist he he he
-            Base.metadata.create_all(bind=self.engine)
-            print("✅ Database tables created/verified")
+            with _schema_lock:
+                if not _schema_ready:
+                    # Create all tables if they don't exist he he he
+                    Base.metadata.create_all(bind=self.engine)
+                    print("✅ Database tables created/verified")
+                    self._apply_schema_upgrades()
+                    if DB_PARTITIONING:
+                        ensure_partitions(self.engine)
+                    _schema_ready = True
             
             with self.get_session() as session:
                 session.execute(text("SELECT 1"))
@@ -71,6 +85,15 @@ class DatabaseManager:
         except Exception as e:
             print(f"❌ Database initialization failed: {e}")
 
+    def _apply_schema_upgrades(self):
+        """Apply idempotent DDL (triggers, functions) that create_all() does not manage"""
+        for statement in SCHEMA_UPGRADES:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text(statement))
+            except Exception as e:
+                print(f"⚠️ Schema upgrade skipped: {e}")
+
     def get_session(self) -> Session:
         """Get database session with context manager support"""
         return self.SessionLocal()
@@ -219,12 +242,24 @@ class DatabaseManager:
                 session.rollback()
                 return False
 
+    def _message_filters(self, session: Session, session_id: str) -> list:
+        """Filters for the messages of a session; with partitioning, bounded by the session start so
+        only the partitions since then are scanned"""
+        filters = [ChatMessage.session_id == session_id]
+        if DB_PARTITIONING:
+            started_at = session.query(ChatSession.created_at)\
+                .filter(ChatSession.session_id == session_id)\
+                .scalar()
+            if started_at:
+                filters.append(ChatMessage.created_at >= started_at)
+        return filters
+
     def get_chat_history(self, session_id: str, limit: int = 100) -> List[dict]:
         """Get chat history with limit (performance optimized)"""
         with self.get_session() as session:
             try:
                 messages = session.query(ChatMessage)\
-                    .filter(ChatMessage.session_id == session_id)\
+                    .filter(*self._message_filters(session, session_id))\
                     .order_by(ChatMessage.created_at.asc())\
                     .limit(limit)\
                     .all()
@@ -240,6 +275,21 @@ class DatabaseManager:
                 print(f"❌ Error getting chat history: {e}")
                 return []
 
+    def get_recent_messages(self, session_id: str, limit: int = 12) -> List[dict]:
+        """Get the most recent messages of a session in chronological order"""
+        with self.get_session() as session:
+            try:
+                messages = session.query(ChatMessage.role, ChatMessage.content)\
+                    .filter(*self._message_filters(session, session_id))\
+                    .order_by(ChatMessage.created_at.desc(), ChatMessage.message_id.desc())\
+                    .limit(limit)\
+                    .all()
+                
+                return [{'role': m.role, 'content': m.content} for m in reversed(messages)]
+            except Exception as e:
+                print(f"❌ Error getting recent messages: {e}")
+                return []
+
     # ============================================================================
     # SMART SUMMARIZATION (OPTIMIZED)
     # ============================================================================
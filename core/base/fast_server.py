@@ -5,9 +5,13 @@ from datetime import datetime
 from core.base.alchemy_storage import DatabaseManager
 from database.alchemy_models import FCMToken, User
 from sqlalchemy import func
+from agent.bg_running.extraction_queue import ExtractionQueue
+from agent.recommendation.services_alchemy import update_recommendation_status, record_alert_feedback
+from agent.recommendation.recommendation_scorer import ACCEPTED_STATUSES, REJECTED_STATUSES
 
 app = FastAPI(title="FCM Token API", version="1.0.0")
 db = DatabaseManager()
+extraction_queue = ExtractionQueue(db)
 
 class TokenRequest(BaseModel):
     token: str
@@ -61,6 +65,33 @@ async def register_fcm_token(token_request: TokenRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error storing token: {str(e)}")
 
+class TokenDeactivateRequest(BaseModel):
+    token: str
+
+@app.post("/api/fcm/deactivate")
+async def deactivate_fcm_token(deactivate_request: TokenDeactivateRequest):
+    """Mark an FCM token inactive (e.g. the user disabled notifications on that device)"""
+    try:
+        with db.get_session() as session:
+            updated = session.query(FCMToken).filter(
+                FCMToken.token == deactivate_request.token
+            ).update({"is_active": False}, synchronize_session=False)
+            session.commit()
+        
+        if not updated:
+            raise HTTPException(status_code=404, detail="Token not found")
+        
+        return {
+            "success": True,
+            "message": "Token deactivated successfully",
+            "token_preview": deactivate_request.token[:10] + "..."
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deactivating token: {str(e)}")
+
 @app.get("/api/fcm/tokens")
 async def get_active_tokens():
     """Get all active FCM tokens from database using SQLAlchemy"""
@@ -88,6 +119,51 @@ async def get_active_tokens():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving tokens: {str(e)}")
 
+@app.get("/api/extraction/jobs/{job_id}")
+async def get_extraction_job(job_id: int):
+    """Get the status of a queued extraction job"""
+    job = extraction_queue.get_job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Extraction job {job_id} not found")
+    return {"success": True, "job": job}
+
+@app.get("/api/extraction/sessions/{session_id}/jobs")
+async def get_session_extraction_jobs(session_id: str, limit: int = 20):
+    """Get the most recent extraction jobs of a chat session"""
+    jobs = extraction_queue.get_session_jobs(session_id, limit)
+    return {"success": True, "jobs": jobs, "total_count": len(jobs)}
+
+@app.get("/api/extraction/stats")
+async def get_extraction_stats():
+    """Get the number of extraction jobs per status"""
+    return {"success": True, "stats": extraction_queue.get_queue_stats()}
+
+class FeedbackRequest(BaseModel):
+    status: str  # accepted / completed or rejected / dismissed
+
+def _feedback_status(feedback_request: FeedbackRequest) -> str:
+    status = feedback_request.status.strip().lower()
+    if status not in ACCEPTED_STATUSES | REJECTED_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown feedback status: {feedback_request.status}")
+    return status
+
+@app.post("/api/recommendations/{recommendation_id}/feedback")
+async def record_recommendation_feedback(recommendation_id: int, feedback_request: FeedbackRequest):
+    """Record whether the user accepted or rejected a recommendation (used by the recommendation scorer)"""
+    status = _feedback_status(feedback_request)
+    if not update_recommendation_status(recommendation_id, status):
+        raise HTTPException(status_code=404, detail=f"Recommendation {recommendation_id} not found")
+    return {"success": True, "recommendation_id": recommendation_id, "status": status}
+
+@app.post("/api/alerts/{alert_id}/feedback")
+async def record_recommendation_alert_feedback(alert_id: int, feedback_request: FeedbackRequest):
+    """Record feedback from a recommendation alert's notification on the recommendation it came from"""
+    status = _feedback_status(feedback_request)
+    recommendation_id = record_alert_feedback(alert_id, status)
+    if recommendation_id is None:
+        raise HTTPException(status_code=404, detail=f"No recommendation found for alert {alert_id}")
+    return {"success": True, "recommendation_id": recommendation_id, "status": status}
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
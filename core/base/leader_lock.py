@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import logging
+from typing import Callable, Optional
+import psycopg2
+import psycopg2.extensions
+
+from core.base.pg_listener import build_dsn
+
+logger = logging.getLogger(__name__)
+
+
+def advisory_key(name: str) -> int:
+    """Map a lock name to the signed 64-bit key pg_advisory_lock expects"""
+    return int.from_bytes(hashlib.sha1(name.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+class AdvisoryLeader:
+    """Leader election through a session-level Postgres advisory lock.
+
+    Every candidate keeps trying pg_try_advisory_lock on its own connection; whoever holds the lock is
+    the leader until its connection goes away (stop, crash or network loss), at which point Postgres
+    releases the lock and a standby takes over on its next attempt. Keepalives bound how long a dead
+    leader's connection can keep the lock.
+    """
+
+    def __init__(self, name: str, dsn: str = None, retry_interval: float = 15.0,
+                 on_elected: Optional[Callable[[], None]] = None, on_demoted: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.key = advisory_key(name)
+        self.dsn = dsn or build_dsn()
+        self.retry_interval = retry_interval
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.running = False
+        self.thread = None
+        self._conn = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start campaigning in a daemon thread"""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name=f"leader-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Give up leadership (closing the connection releases the lock) and stop campaigning"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self._close()
+
+    def _connect(self):
+        self._conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=10, keepalives_interval=5, keepalives_count=3)
+        self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+    def _close(self):
+        self._set_leader(False)
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _set_leader(self, leader: bool):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        callback = self.on_elected if leader else self.on_demoted
+        logger.info(f"👑 Became leader for {self.name}" if leader else f"👑 Lost leadership for {self.name}")
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"❌ Leader callback failed for {self.name}: {e}")
+
+    def _run(self):
+        while self.running:
+            try:
+                if self._conn is None:
+                    self._connect()
+                with self._conn.cursor() as cur:
+                    if self.is_leader:
+                        # Still holding the lock as long as the session is alive
+                        cur.execute("SELECT 1")
+                    else:
+                        cur.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                        self._set_leader(bool(cur.fetchone()[0]))
+            except Exception as e:
+                logger.error(f"❌ Leader election error for {self.name}: {e}")
+                self._close()
+            self._stop_event.wait(self.retry_interval)
+
+    def get_status(self) -> dict:
+        return {"name": self.name, "is_leader": self.is_leader, "connected": self._conn is not None}
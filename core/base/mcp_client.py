@@ -100,6 +100,27 @@ class MCPClient():
                             return "Activity added successfully."
         except Exception as e:
             return f"Error adding activity: {str(e)}"   
+
+    async def capture_information(self, user_input: str) -> str:
+        """Extract user info, events and activities in one pass on the MCP server."""
+        try:
+            async with asyncio.timeout(30):
+                async with stdio_client(self.server_params) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        
+                        result = await session.call_tool(
+                            "capture_information",
+                            arguments={"user_input": user_input}
+                        )
+                        
+                        if hasattr(result, 'content') and result.content:
+                            content = result.content[0] if isinstance(result.content, list) else result.content
+                            return content.text if hasattr(content, 'text') else str(content)
+                        else:
+                            return "Information captured successfully."
+        except Exception as e:
+            return f"Error capturing information: {str(e)}"
             
 
 def init_mcp_client() -> MCPClient:
@@ -150,6 +171,14 @@ def add_activity_information(user_input: str, mcp_client: MCPClient) -> str:
     except Exception as e:
         return f"Error adding activity: {str(e)}"
 
+def capture_user_information(user_input: str, mcp_client: MCPClient) -> str:
+    """Extract user info, events and activities with a single extraction call."""
+    try:
+        captured_info = asyncio.run(mcp_client.capture_information(user_input))
+        return captured_info
+    except Exception as e:
+        return f"Error capturing information: {str(e)}"
+
 def initialize_session(db):
     """Initialize single persistent session"""
     if "single_session_id" not in st.session_state:
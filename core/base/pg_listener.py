@@ -0,0 +1,123 @@
+import os
+import json
+import select
+import threading
+import logging
+from typing import Callable, Iterable, Optional
+import psycopg2
+import psycopg2.extensions
+import dotenv
+dotenv.load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def build_dsn() -> str:
+    """Build a libpq DSN from the same environment variables as DatabaseManager"""
+    host = os.getenv('DB_HOST', 'postgres')
+    port = os.getenv('DB_PORT', '5432')
+    database = os.getenv('DB_NAME', 'chatbot_db')
+    user = os.getenv('DB_USER', 'chatbot_user')
+    password = os.getenv('DB_PASSWORD', 'chatbot_password')
+    return f"host={host} port={port} dbname={database} user={user} password={password}"
+
+
+class PgListener:
+    """Background LISTEN on one or more Postgres channels.
+
+    Blocks in select() on the connection socket, so an idle listener costs nothing. Payloads are
+    JSON-decoded when possible and passed to on_notify(channel, payload). on_reconnect runs after every
+    (re)connect so callers can resync state for notifications missed while disconnected.
+    """
+
+    def __init__(self, channels: Iterable[str], on_notify: Callable[[str, object], None],
+                 on_reconnect: Optional[Callable[[], None]] = None, dsn: str = None,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0):
+        self.channels = list(channels)
+        self.on_notify = on_notify
+        self.on_reconnect = on_reconnect
+        self.dsn = dsn or build_dsn()
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.running = False
+        self.connected = False
+        self.thread = None
+        self._conn = None
+        # Self-pipe so stop() can interrupt select() immediately
+        self._wake_r, self._wake_w = os.pipe()
+
+    def start(self):
+        """Start listening in a daemon thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"pg-listener-{'-'.join(self.channels)}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop listening and close the connection"""
+        if not self.running:
+            return
+        self.running = False
+        os.write(self._wake_w, b"x")
+        if self.thread:
+            self.thread.join(timeout=5)
+        self._close()
+
+    def _connect(self):
+        self._conn = psycopg2.connect(self.dsn)
+        self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self._conn.cursor() as cur:
+            for channel in self.channels:
+                cur.execute(f"LISTEN {channel};")
+        self.connected = True
+        logger.info(f"👂 Listening on Postgres channels: {', '.join(self.channels)}")
+
+    def _close(self):
+        self.connected = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while self.running:
+            try:
+                self._connect()
+                delay = self.reconnect_delay
+                if self.on_reconnect:
+                    self.on_reconnect()
+                self._listen()
+            except Exception as e:
+                logger.error(f"❌ Postgres listener error: {e}")
+            finally:
+                self._close()
+
+            if self.running:
+                # Back off before reconnecting, but wake up at once on stop()
+                ready, _, _ = select.select([self._wake_r], [], [], delay)
+                if ready:
+                    os.read(self._wake_r, 1024)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _listen(self):
+        while self.running:
+            ready, _, _ = select.select([self._conn, self._wake_r], [], [])
+            if self._wake_r in ready:
+                os.read(self._wake_r, 1024)
+                continue
+
+            self._conn.poll()
+            while self._conn.notifies:
+                notify = self._conn.notifies.pop(0)
+                try:
+                    payload = json.loads(notify.payload) if notify.payload else None
+                except ValueError:
+                    payload = notify.payload
+                try:
+                    self.on_notify(notify.channel, payload)
+                except Exception as e:
+                    logger.error(f"❌ Error handling notification on {notify.channel}: {e}")
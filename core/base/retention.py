@@ -0,0 +1,241 @@
+import sys
+import os
+import json
+import gzip
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.base.alchemy_storage import DatabaseManager
+from database.alchemy_models import DB_PARTITIONING
+from database.partitioning import PARTITIONED_TABLES, drop_partitions_before
+
+logger = logging.getLogger(__name__)
+
+RETENTION_CHUNK_SIZE = int(os.environ.get("RETENTION_CHUNK_SIZE", "1000"))
+RETENTION_CHUNK_PAUSE = float(os.environ.get("RETENTION_CHUNK_PAUSE", "0.1"))  # seconds between chunks
+# Empty to delete without archiving; otherwise rows are written here before they are deleted
+RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "")
+RETENTION_ARCHIVE_FORMAT = os.environ.get("RETENTION_ARCHIVE_FORMAT", "jsonl")  # jsonl (gzip) or parquet
+
+
+class RetentionPolicy:
+    """Rows of table whose age_column is older than days (and that match condition) are expired; days None: off"""
+
+    def __init__(self, name: str, table: str, key: str, age_column: str, days: Optional[int], condition: str = None, archive: bool = True):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.age_column = age_column
+        self.days = days
+        self.condition = condition
+        self.archive = archive
+
+    def expired_sql(self) -> str:
+        """SQL predicate (using :cutoff) of the rows this policy expires"""
+        condition = f" AND ({self.condition})" if self.condition else ""
+        return f"{self.age_column} < :cutoff{condition}"
+
+    def delete_chunk_sql(self, keyset: bool):
+        # Keyset pagination on the primary key: every chunk after the first starts after the last deleted key,
+        # so rows that are kept (or locked by someone else) are never scanned twice
+        condition = f"AND {self.condition}" if self.condition else ""
+        after = f"AND {self.key} > :after" if keyset else ""
+        return text(f"""
+            WITH chunk AS (
+                SELECT {self.key}
+                FROM {self.table}
+                WHERE {self.age_column} < :cutoff
+                {after}
+                {condition}
+                ORDER BY {self.key}
+                LIMIT :chunk_size
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM {self.table} t
+            USING chunk
+            WHERE t.{self.key} = chunk.{self.key}
+            RETURNING t.*
+        """)
+
+
+def _opt_in_days(variable: str) -> Optional[int]:
+    """Age limit of an opt-in policy: None (policy off) unless the variable is set"""
+    value = os.environ.get(variable, "").strip()
+    return int(value) if value else None
+
+
+# Only sent alerts expire by default; chat history, activities and finished extraction jobs are user data or
+# audit trail and are deleted only when their RETENTION_*_DAYS variable is set explicitly
+DEFAULT_POLICIES = [
+    RetentionPolicy("alerts", "alert", "alert_id", "created_at",
+                    int(os.environ.get("RETENTION_ALERT_DAYS", "30")), condition="status = 'sent'"),
+    RetentionPolicy("chat_messages", "chat_messages", "message_id", "created_at",
+                    _opt_in_days("RETENTION_CHAT_DAYS")),
+    RetentionPolicy("chat_summaries", "chat_summaries", "id", "last_update",
+                    _opt_in_days("RETENTION_CHAT_DAYS")),
+    # Sessions go only once their messages are gone, so no cascade can turn one chunk into an unbounded delete
+    RetentionPolicy("chat_sessions", "chat_sessions", "session_id", "last_updated",
+                    _opt_in_days("RETENTION_CHAT_DAYS"),
+                    condition="NOT EXISTS (SELECT 1 FROM chat_messages m WHERE m.session_id = chat_sessions.session_id)"),
+    RetentionPolicy("activities", "activities", "id", "start_at",
+                    _opt_in_days("RETENTION_ACTIVITY_DAYS")),
+    RetentionPolicy("extraction_jobs", "extraction_jobs", "job_id", "finished_at",
+                    _opt_in_days("RETENTION_JOB_DAYS"), condition="status IN ('done', 'failed')", archive=False),
+]
+
+
+class RetentionEngine:
+    """Deletes expired rows in bounded chunks, optionally archiving them first.
+
+    Each chunk is its own short transaction (DELETE ... RETURNING on at most chunk_size keys), followed by a
+    pause, so locks stay short and WAL is produced gradually instead of in one large burst. Archived rows
+    are written before the chunk commits; if writing the archive fails the chunk is rolled back.
+    """
+
+    def __init__(self, db: DatabaseManager = None, policies: List[RetentionPolicy] = None, chunk_size: int = RETENTION_CHUNK_SIZE,
+                 chunk_pause: float = RETENTION_CHUNK_PAUSE, archive_dir: str = RETENTION_ARCHIVE_DIR,
+                 archive_format: str = RETENTION_ARCHIVE_FORMAT):
+        self.db = db or DatabaseManager()
+        self.policies = {policy.name: policy for policy in (policies or DEFAULT_POLICIES)}
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.archive_dir = archive_dir
+        self.archive_format = archive_format
+
+    def run(self, policy_names: Iterable[str] = None, days: int = None) -> Dict[str, Dict]:
+        """Apply the given policies (all enabled ones by default, in order); days overrides each policy's age limit"""
+        names = list(policy_names) if policy_names else [name for name, policy in self.policies.items() if policy.days is not None]
+        return {name: self.apply(self.policies[name], days) for name in names if days is not None or self.policies[name].days is not None}
+
+    def apply(self, policy: RetentionPolicy, days: int = None) -> Dict:
+        """Delete every expired row of one policy. Returns deleted/chunks/seconds/rows_per_second/archive"""
+        cutoff = datetime.now() - timedelta(days=days if days is not None else policy.days)
+        writer = ArchiveWriter(self.archive_dir, policy.table, self.archive_format) if self.archive_dir and policy.archive else None
+        first_chunk, next_chunk = policy.delete_chunk_sql(keyset=False), policy.delete_chunk_sql(keyset=True)
+        start = time.perf_counter()
+        deleted, chunks, after, error = 0, 0, None, None
+
+        # Whole months past the cutoff go with one DROP each, but only when every row in them is expired by this
+        # policy (age and condition); the chunked pass below handles the rest, so both deployments keep the same rows
+        dropped = []
+        if DB_PARTITIONING and policy.table in PARTITIONED_TABLES:
+            counts = []
+            dropped = drop_partitions_before(
+                self.db.engine, policy.table, cutoff,
+                archive=lambda partition: counts.append(self._export_partition(partition, policy.key, writer)),
+                expired=policy.expired_sql()
+            )
+            deleted += sum(counts)
+
+        while True:
+            with self.db.get_session() as session:
+                try:
+                    rows = session.execute(first_chunk if after is None else next_chunk, {
+                        "cutoff": cutoff,
+                        "after": after,
+                        "chunk_size": self.chunk_size
+                    }).mappings().all()
+                    if rows and writer:
+                        writer.write([dict(row) for row in rows])
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    error = str(e)
+                    logger.error(f"❌ Retention {policy.name} stopped after {deleted} rows: {e}")
+                    break
+
+            if not rows:
+                break
+            deleted += len(rows)
+            chunks += 1
+            after = max(row[policy.key] for row in rows)
+            if len(rows) < self.chunk_size:
+                break
+            time.sleep(self.chunk_pause)
+
+        seconds = time.perf_counter() - start
+        report = {
+            "deleted": deleted,
+            "chunks": chunks,
+            "partitions_dropped": dropped,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(deleted / seconds, 1) if seconds > 0 else None,
+            "archive": writer.paths if writer else [],
+            "cutoff": cutoff.isoformat(),
+            "error": error
+        }
+        if deleted:
+            logger.info(f"🗑️ Retention {policy.name}: {deleted} rows in {chunks} chunks ({report['rows_per_second']} rows/s)")
+        return report
+
+
+    def _export_partition(self, partition: str, key: str, writer: Optional["ArchiveWriter"]) -> int:
+        """Count (and archive, when writer is set) the rows of a partition about to be dropped"""
+        with self.db.get_session() as session:
+            if not writer:
+                return session.execute(text(f"SELECT COUNT(*) FROM {partition}")).scalar()
+            exported, after = 0, None
+            while True:
+                keyset = f"WHERE {key} > :after" if after is not None else ""
+                rows = session.execute(text(
+                    f"SELECT * FROM {partition} {keyset} ORDER BY {key} LIMIT :chunk_size"
+                ), {"after": after, "chunk_size": self.chunk_size}).mappings().all()
+                if not rows:
+                    return exported
+                writer.write([dict(row) for row in rows])
+                exported += len(rows)
+                after = rows[-1][key]
+
+
+class ArchiveWriter:
+    """Writes archived rows to <archive_dir>/<table>/ as gzip JSONL (one file per run) or Parquet (one file per chunk)"""
+
+    def __init__(self, archive_dir: str, table: str, archive_format: str = "jsonl"):
+        self.directory = os.path.join(archive_dir, table)
+        self.prefix = f"{table}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self.archive_format = archive_format
+        if archive_format == "parquet":
+            try:
+                import pandas  # noqa: F401
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.warning("⚠️ pandas/pyarrow not installed; archiving as gzip JSONL instead of Parquet")
+                self.archive_format = "jsonl"
+        self.paths: List[str] = []
+        self._chunks = 0
+
+    def write(self, rows: List[Dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        self._chunks += 1
+        if self.archive_format == "parquet":
+            import pandas as pd
+            path = os.path.join(self.directory, f"{self.prefix}-{self._chunks:05d}.parquet")
+            plain = [{column: _plain(value) for column, value in row.items()} for row in rows]
+            pd.DataFrame(plain).to_parquet(path, index=False)
+            self.paths.append(path)
+            return
+
+        path = os.path.join(self.directory, f"{self.prefix}.jsonl.gz")
+        with gzip.open(path, "at", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+        if path not in self.paths:
+            self.paths.append(path)
+
+
+def _plain(value):
+    """Parquet-friendly value (UUIDs, datetimes, arrays... as strings)"""
+    return value if value is None or isinstance(value, (int, float, bool, str)) else str(value)
+
+
+# Global retention engine instance
+retention_engine = RetentionEngine()
+
+def apply_retention(policy_names: Iterable[str] = None, days: Optional[int] = None) -> Dict[str, Dict]:
+    """Delete (and archive) expired rows of the given retention policies"""
+    return retention_engine.run(policy_names, days)
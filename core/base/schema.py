@@ -40,6 +40,9 @@ class ActivityAnalysis(BaseModel):
     frequency_per_month: Annotated[Optional[int], Field(description="Estimated frequency of the activity per month (0-30)")]
     description: Annotated[Optional[str], Field(description="Brief summary of the user's activity habits related to this activity type, including any notable trends or suggestions")]
 
+class ActivityNarrative(BaseModel):
+    description: Annotated[Optional[str], Field(description="Brief summary of the user's habits for this activity type, consistent with the given statistics")]
+
 class Recommendation(BaseModel):
     recommendation_type: Annotated[Optional[str], Field(description="Type of recommendation (e.g., activity, event, alert)")]
     title: Annotated[Optional[str], Field(description="Title of the recommendation")]
@@ -50,6 +53,9 @@ class Recommendation(BaseModel):
     shown_at: Annotated[Optional[str], Field(description="Timestamp when the recommendation was shown to the user, in ISO format")]
     status: Annotated[Optional[str], Field(description="Status of the recommendation (e.g., pending, accepted, rejected)")]
 
+class RecommendationBatch(BaseModel):
+    recommendations: Annotated[list[Recommendation], Field(description="The requested recommendations, each one distinct from the others")]
+
 class AlertInformation(BaseModel):
     alert_type: Annotated[Optional[str], Field(description="Type of the alert (e.g., reminder, notification)")]
     title: Annotated[Optional[str], Field(description="Title of the alert")]
@@ -58,4 +64,10 @@ class AlertInformation(BaseModel):
     recurrence: Annotated[Optional[str], Field(description="Recurrence pattern of the alert (e.g., daily, weekly)")]
     priority: Annotated[Optional[str], Field(description="Priority level of the alert (e.g., high, medium, low)")]
     status: Annotated[Optional[str], Field(description="Status of the alert (e.g., active, resolved)")] 
-    source: Annotated[Optional[str], Field(description="Source of the alert (e.g., user input, system generated, event, activity)")]
\ No newline at end of file
+    source: Annotated[Optional[str], Field(description="Source of the alert (e.g., user input, system generated, event, activity)")]
+
+class UnifiedExtraction(BaseModel):
+    user_info: Annotated[Optional[UserInformation], Field(description="Personal information about the user mentioned in the message, or null if none")]
+    event_intent: Annotated[Optional[str], Field(description="What the user wants to do with events: CREATE, UPDATE, SEARCH, or NONE if no event is mentioned")]
+    events: Annotated[Optional[list[EventInformation]], Field(description="Scheduled, one-time events to create or update (empty if none)")]
+    activities: Annotated[Optional[list[ActivitiesInformation]], Field(description="Routine, habitual or casual activities mentioned (empty if none)")]
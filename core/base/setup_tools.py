@@ -1,4 +1,6 @@
 import asyncio
+import os
+import streamlit as st
 from langchain_tavily import TavilySearch
 from langchain.tools import StructuredTool
 from core.base.mcp_client import (
@@ -6,8 +8,19 @@ from core.base.mcp_client import (
     mcp_history_tool, 
     update_user_information, 
     add_event_information, 
-    add_activity_information
+    add_activity_information,
+    capture_user_information
 )
+from agent.bg_running.extraction_queue import ASYNC_CAPTURE, enqueue_extraction
+
+# "separate" exposes one tool per extractor, "unified" exposes a single capture tool (one LLM call per message)
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "separate").lower()
+
+def run_or_enqueue(job_type: str, user_input: str, run_inline) -> str:
+    """Run an extraction tool inline, or queue it for the extraction workers when ASYNC_CAPTURE is on"""
+    if ASYNC_CAPTURE:
+        return enqueue_extraction(job_type, user_input, st.session_state.get('single_session_id'))
+    return run_inline(user_input)
 
 def setup_tools(mcp_client: MCPClient) -> list:
     """Setup and return all tools"""
@@ -16,8 +29,8 @@ def setup_tools(mcp_client: MCPClient) -> list:
     retrieve_tool = StructuredTool.from_function(
         func=lambda session_id: mcp_history_tool(session_id, mcp_client),
         name="retrieve_chat_history",
-        description="""Use this tool when the user asks about previous messages, past conversations, personal information, 
-        or mentions something discussed earlier. This tool retrieves relevant parts of the conversation history to help you answer questions about past interactions.
+        description="""Use this tool when the user asks about older conversations that are not in the recent messages or the
+        conversation summary already given to you. This tool retrieves relevant parts of the conversation history to help you answer questions about past interactions.
         If there is useful information in the chat history, answer based on that information no creative.""",
         args_schema={
             "type": "object",
@@ -32,7 +45,7 @@ def setup_tools(mcp_client: MCPClient) -> list:
     )
 
     extract_user_info_tool = StructuredTool.from_function(
-        func=lambda user_input: update_user_information(user_input, mcp_client),
+        func=lambda user_input: run_or_enqueue("user_info", user_input, lambda text: update_user_information(text, mcp_client)),
         name="extract_user_info",
         description="""Use this tool to extract user information from the input string, even lack of field.
         Here is table schema: user_profile(id, user_name, phone_number, year_of_birth, address, major, additional_info, created_at, updated_at)
@@ -58,7 +71,7 @@ def setup_tools(mcp_client: MCPClient) -> list:
     )
 
     extract_event_info_tool = StructuredTool.from_function(
-        func=lambda user_input: add_event_information(user_input, mcp_client),
+        func=lambda user_input: run_or_enqueue("event", user_input, lambda text: add_event_information(text, mcp_client)),
         name="add_event",
         description="""Use this tool AUTOMATICALLY whenever the user mentions a scheduled, purpose-driven event, appointment, meeting, or reminder that is not a regular habit. This tool is for one-time or infrequent occurrences with a specific goal (e.g., a meeting, doctor's appointment, or deadline).
 
@@ -103,7 +116,7 @@ def setup_tools(mcp_client: MCPClient) -> list:
     )
 
     extract_activity_tool = StructuredTool.from_function(
-        func=lambda user_input: add_activity_information(user_input, mcp_client),
+        func=lambda user_input: run_or_enqueue("activity", user_input, lambda text: add_activity_information(text, mcp_client)),
         name="add_activity",
         description="""Use this tool to extract information from the input message when the user refers to routine, habitual, or casual activities that occur regularly or spontaneously, such as personal routines, hobbies, or daily tasks (e.g., eating, playing football, watching TV).
 
@@ -145,4 +158,26 @@ def setup_tools(mcp_client: MCPClient) -> list:
         },
     )
 
+    if EXTRACTION_MODE == "unified":
+        capture_tool = StructuredTool.from_function(
+            func=lambda user_input: run_or_enqueue("capture", user_input, lambda text: capture_user_information(text, mcp_client)),
+            name="capture_information",
+            description="""Use this tool AUTOMATICALLY whenever the user shares personal information, mentions a scheduled event
+        (meeting, appointment, deadline, reminder), wants to update or look up an event, or mentions a routine/habitual activity
+        (eating, jogging, hobbies). One call extracts and saves user profile fields, events and activities together, in any language.
+
+        Call it once per user message with the complete message; do not split the message into several calls.""",
+            args_schema={
+                "type": "object",
+                "properties": {
+                    "user_input": {
+                        "type": "string",
+                        "description": "The complete user message containing personal, event or activity information."
+                    }
+                },
+                "required": ["user_input"]
+            },
+        )
+        return [search_tool, retrieve_tool, capture_tool]
+
     return [search_tool, retrieve_tool, extract_user_info_tool, extract_event_info_tool, extract_activity_tool]
@@ -331,39 +331,16 @@ Comprehensive Summary:"""
         return {}
 
     def cleanup_old_data(self, days_old: int = 90) -> bool:
-        """Clean up old data (sessions, messages older than specified days)"""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cur:
-                    # Delete old sessions and their related data
-                    cur.execute("""
-                        DELETE FROM chat_sessions 
-                        WHERE created_at < CURRENT_TIMESTAMP - INTERVAL '%s days'
-                    """, (days_old,))
-                    
-                    sessions_deleted = cur.rowcount
-                    
-                    # Delete old activities
-                    cur.execute("""
-                        DELETE FROM activities 
-                        WHERE start_at < CURRENT_TIMESTAMP - INTERVAL '%s days'
-                    """, (days_old,))
-                    
-                    activities_deleted = cur.rowcount
-                    
-                    conn.commit()
-                    
-                    print(f"🧹 Cleanup completed: {sessions_deleted} sessions, {activities_deleted} activities deleted")
-                    return True
-                    
-            except psycopg2.Error as e:
-                print(f"Error during cleanup: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+        """Clean up old data (chat history, activities older than specified days) in bounded chunks"""
+        from core.base.retention import apply_retention
+        try:
+            report = apply_retention(["chat_messages", "chat_summaries", "chat_sessions", "activities"], days=days_old)
+            deleted = ", ".join(f"{result['deleted']} {name}" for name, result in report.items())
+            print(f"🧹 Cleanup completed: {deleted} deleted")
+            return not any(result["error"] for result in report.values())
+        except Exception as e:
+            print(f"Error during cleanup: {e}")
+            return False
 
     def test_connection(self) -> bool:
         """Test database connection"""
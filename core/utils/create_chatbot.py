@@ -1,6 +1,8 @@
 import streamlit as st
 from core.base.schema import State
 from core.utils.get_user_profile_context import get_user_profile_context
+from core.utils.prompt_assembler import assemble_chat_context
+from tools.retrieve_history import get_recent_context
 
 
 def create_chatbot_function(llm_with_tools):
@@ -11,13 +13,11 @@ def create_chatbot_function(llm_with_tools):
         user_info = get_user_profile_context()
         messages = state["messages"].copy()
         
-        # Create system message with custom prompt and user profile
-        system_message = {
-            "role": "system", 
-            "content": user_info
-        }
-
-        messages.insert(0, system_message)
+        # System prompt, profile, rolling summary and recent turns packed into the token budget,
+        # so questions about recent context need no retrieve_chat_history round trip
+        current_input = messages[0].content if messages and hasattr(messages[0], 'content') else ""
+        history, summary = get_recent_context(state.get("session_id"), current_input)
+        messages = assemble_chat_context(user_info, summary, history) + messages
         
         # Debug: Print current settings
         print("="*50)
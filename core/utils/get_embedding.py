@@ -31,6 +31,18 @@ def get_embedding(text: str, model: str = "text-embedding-ada-002"):
         traceback.print_exc()
         raise e
 
+def get_embeddings(texts: list, model: str = "text-embedding-ada-002") -> list:
+    """Get OpenAI embeddings for several texts in one request (same order as texts)"""
+    if not texts:
+        return []
+    embedding_model = OpenAIEmbeddings(
+        model=model,
+        api_key=openai_api,
+        base_url="https://warranty-api-dev.picontechnology.com:8443",
+    )
+    print(f"🔍 Generating {len(texts)} embeddings")
+    return embedding_model.embed_documents(list(texts))
+
 # # Get input from the user
 # user_input = input("Enter text to embed: ")
 
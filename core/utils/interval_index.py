@@ -0,0 +1,123 @@
+import bisect
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Events without a (valid) end time are taken to last this long, as in the SQL overlap checks
+EVENT_DEFAULT_DURATION = timedelta(hours=1)
+
+
+class IntervalIndex:
+    """Intervals [start, end) sorted by start, for overlap queries without scanning every interval.
+
+    The intervals are kept sorted by start with a segment tree of the maximum end over them. A query
+    bisects to the intervals starting before its end, then descends only into subtrees whose maximum
+    end lies after its start: O(log n + k log n) for k overlaps, however long some stored intervals are.
+    Intervals added after the last build wait in a short buffer that queries scan; the tree is rebuilt
+    (O(n log n)) once the buffer outgrows REBUILD_BUFFER, so interleaved adds and queries stay cheap.
+    """
+
+    REBUILD_BUFFER = 32
+
+    def __init__(self):
+        self._starts = []
+        self._entries = []  # (start, end, item), in the order of _starts once built
+        self._max_end = []  # segment tree (1-based heap layout) of the maximum end, None for empty leaves
+        self._size = 0
+        self._buffer = []  # (start, end, item) added since the last build, in insertion order
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._buffer)
+
+    def add(self, start, end, item: Any = None):
+        """Insert the interval [start, end) carrying item"""
+        self._buffer.append((start, end, item))
+
+    def _build(self):
+        """Merge the buffer into the intervals sorted by start (stable: equal starts keep insertion order) and rebuild the tree"""
+        if not self._buffer:
+            return
+        self._entries.extend(self._buffer)
+        self._buffer = []
+        self._entries.sort(key=lambda entry: entry[0])
+        self._starts = [start for start, _, _ in self._entries]
+        self._size = 1
+        while self._size < len(self._entries):
+            self._size *= 2
+        self._max_end = [None] * (2 * self._size)
+        for position, (_, end, _) in enumerate(self._entries):
+            self._max_end[self._size + position] = end
+        for node in range(self._size - 1, 0, -1):
+            left, right = self._max_end[2 * node], self._max_end[2 * node + 1]
+            self._max_end[node] = left if right is None or (left is not None and left >= right) else right
+
+    def _collect(self, node: int, low: int, high: int, limit: int, start, found: List[tuple]):
+        """Append, by start, the entries among positions [low, high) of node and below limit that end after start"""
+        if low >= limit or self._max_end[node] is None or self._max_end[node] <= start:
+            return
+        if high - low == 1:
+            found.append(self._entries[low])
+            return
+        middle = (low + high) // 2
+        self._collect(2 * node, low, middle, limit, start, found)
+        self._collect(2 * node + 1, middle, high, limit, start, found)
+
+    def overlapping(self, start, end) -> List[Any]:
+        """Items of all intervals overlapping [start, end), by start"""
+        if len(self._buffer) > self.REBUILD_BUFFER:
+            self._build()
+        limit = max(end, start)
+        found = []
+        if self._entries:
+            self._collect(1, 0, self._size, bisect.bisect_left(self._starts, limit), start, found)
+        if self._buffer:
+            # Buffered intervals were added after the built ones, so merge puts them second among equal starts
+            buffered = sorted((entry for entry in self._buffer if entry[0] < limit and entry[1] > start), key=lambda entry: entry[0])
+            found = list(heapq.merge(found, buffered, key=lambda entry: entry[0]))
+        return [item for _, _, item in found]
+
+    def overlaps(self, start, end) -> bool:
+        """Whether any interval overlaps [start, end)"""
+        return bool(self.overlapping(start, end))
+
+    def overlapping_pairs(self) -> List[Tuple[Any, Any]]:
+        """Every pair of overlapping intervals once, earlier start first (sorted sweep, O(n log n + pairs))"""
+        self._build()
+        pairs, active = [], []  # active: heap of (end, position, item) still running at the current start
+        for position, (start, end, item) in enumerate(self._entries):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            pairs.extend((other, item) for _, _, other in sorted(active, key=lambda entry: entry[1]))
+            heapq.heappush(active, (end, position, item))
+        return pairs
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    """Naive datetime of a datetime or ISO string (stored event times are naive local times)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    return None
+
+
+def event_interval(event: dict) -> Optional[Tuple[datetime, datetime]]:
+    """[start_time, end_time) of an event dict; None without a readable start time"""
+    start = _to_datetime(event.get('start_time'))
+    if start is None:
+        return None
+    end = _to_datetime(event.get('end_time'))
+    return start, end if end and end > start else start + EVENT_DEFAULT_DURATION
+
+
+def build_event_index(events: Iterable[dict]) -> IntervalIndex:
+    """Interval index of the events that have a start time, carrying the event dicts"""
+    index = IntervalIndex()
+    for event in events:
+        interval = event_interval(event)
+        if interval:
+            index.add(*interval, event)
+    return index
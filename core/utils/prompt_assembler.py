@@ -0,0 +1,109 @@
+import os
+import threading
+from typing import List, Optional
+
+# Total tokens the chatbot prompt may use before the current turn is appended
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get("CHAT_CONTEXT_TOKEN_BUDGET", "3000"))
+# How many recent stored messages are considered for the prompt
+CHAT_RECENT_MESSAGES = int(os.environ.get("CHAT_RECENT_MESSAGES", "12"))
+# Upper bound for the rolling summary share of the budget
+CHAT_SUMMARY_TOKEN_LIMIT = int(os.environ.get("CHAT_SUMMARY_TOKEN_LIMIT", "800"))
+# Upper bound for what retrieve_chat_history hands back to the model
+CHAT_HISTORY_TOOL_TOKENS = int(os.environ.get("CHAT_HISTORY_TOOL_TOKENS", "1500"))
+TOKENIZER_ENCODING = os.environ.get("TOKENIZER_ENCODING", "o200k_base")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """Load the tiktoken encoding once; None means fall back to a character estimate"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    print(f"⚠️ tiktoken encoding unavailable ({e}), estimating tokens from characters")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally (about 4 characters per token without tiktoken)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "tail") -> str:
+    """Cut text to max_tokens, keeping the most recent part (tail) or the start (head)"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        kept = tokens[-max_tokens:] if keep == "tail" else tokens[:max_tokens]
+        text = encoding.decode(kept)
+    else:
+        max_chars = max_tokens * 4
+        text = text[-max_chars:] if keep == "tail" else text[:max_chars]
+    return f"...{text}" if keep == "tail" else f"{text}..."
+
+def _message_tokens(message: dict) -> int:
+    # ~4 tokens of per-message overhead in the chat format
+    return count_tokens(message.get("content") or "") + 4
+
+
+class PromptAssembler:
+    """Packs system prompt, profile, rolling summary and recent messages into a token budget"""
+
+    def __init__(self, token_budget: int = CHAT_CONTEXT_TOKEN_BUDGET, recent_messages: int = CHAT_RECENT_MESSAGES,
+                 summary_token_limit: int = CHAT_SUMMARY_TOKEN_LIMIT):
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_token_limit = summary_token_limit
+
+    def assemble(self, system_prompt: str, summary: str = "", history: Optional[List[dict]] = None) -> List[dict]:
+        """Build the prompt prefix: system message (with summary) followed by as many recent messages as fit.
+
+        system_prompt already contains the persona and profile and is always kept. The most recent history
+        messages win over older ones; the summary is trimmed to what is left, up to summary_token_limit.
+        """
+        remaining = self.token_budget - count_tokens(system_prompt)
+
+        # Newest first, stop at the first message that does not fit so the kept window stays contiguous
+        recent = []
+        reserve = min(self.summary_token_limit, max(remaining // 4, 0)) if summary else 0
+        for message in reversed((history or [])[-self.recent_messages:]):
+            cost = _message_tokens(message)
+            if cost > remaining - reserve:
+                break
+            recent.append({"role": message["role"], "content": message["content"]})
+            remaining -= cost
+        recent.reverse()
+
+        content = system_prompt
+        if summary:
+            summary = truncate_to_tokens(summary, min(remaining, self.summary_token_limit))
+            if summary:
+                content += f"\n\nCONVERSATION SUMMARY (older messages):\n{summary}"
+                remaining -= count_tokens(summary)
+
+        print(f"🧮 Prompt context: {len(recent)} recent messages, ~{self.token_budget - remaining} tokens of {self.token_budget}")
+        return [{"role": "system", "content": content}] + recent
+
+
+# Global prompt assembler instance
+prompt_assembler = PromptAssembler()
+
+def assemble_chat_context(system_prompt: str, summary: str = "", history: Optional[List[dict]] = None) -> List[dict]:
+    """Assemble the chatbot prompt prefix within the configured token budget"""
+    return prompt_assembler.assemble(system_prompt, summary, history)
@@ -0,0 +1,47 @@
+import os
+import time
+import threading
+from typing import Optional
+
+# Requests per minute shared by every background LLM caller of this process
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_REQUEST_BURST = int(os.environ.get("LLM_REQUEST_BURST", "5"))
+
+
+class RateLimiter:
+    """Thread-safe token bucket: rate tokens per period seconds, holding at most burst tokens"""
+
+    def __init__(self, rate: float, period: float = 60.0, burst: int = 1):
+        self.rate = rate
+        self.period = period
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate / self.period)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a token is available; False if none became available within timeout seconds"""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) * self.period / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+# Global limiter for background LLM calls (0 disables limiting)
+llm_rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, 60.0, LLM_REQUEST_BURST)
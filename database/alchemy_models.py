@@ -2,7 +2,7 @@ from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime, B
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from pgvector.sqlalchemy import Vector
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from typing import List, Optional, Dict, Any
 import uuid
@@ -12,6 +12,16 @@ import pytz
 
 Base = declarative_base()
 
+# Opt-in native range partitioning of chat_messages (by created_at) and alert (by trigger_time).
+# Postgres requires the partition key in the primary key, so it joins message_id/alert_id there.
+DB_PARTITIONING = os.environ.get("DB_PARTITIONING", "false").lower() == "true"
+
+# Opt-in exclusion constraint: Postgres rejects a user's events whose time ranges overlap (needs btree_gist)
+EVENT_EXCLUSION_CONSTRAINT = os.environ.get("EVENT_EXCLUSION_CONSTRAINT", "false").lower() == "true"
+
+def _partitioned_by(column: str) -> dict:
+    return {'postgresql_partition_by': f'RANGE ({column})'} if DB_PARTITIONING else {}
+
 class User(Base):
     __tablename__ = 'users'
     
@@ -52,12 +62,13 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = 'chat_messages'
+    __table_args__ = _partitioned_by('created_at')
     
     message_id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String(100), ForeignKey('chat_sessions.session_id'), nullable=False)
     content = Column(Text)
     role = Column(String(50))
-    created_at = Column(DateTime, default=func.current_timestamp())
+    created_at = Column(DateTime, default=func.current_timestamp(), primary_key=DB_PARTITIONING)
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
@@ -100,6 +111,12 @@ class ActivityAnalysis(Base):
     frequency_per_month = Column(Integer, default=0)
     last_updated = Column(DateTime, default=func.current_timestamp())
     description = Column(Text, default='No description provided')
+    occurrence_count = Column(Integer, default=0)
+    last_seen = Column(DateTime)
+    # Running aggregates new activities are folded into (agent/recommendation/activity_stats.py),
+    # and the statistics the description was written for
+    aggregates = Column(JSONB)
+    narrative_baseline = Column(JSONB)
     
     # Relationships
     user = relationship("User")
@@ -144,6 +161,7 @@ class Recommendation(Base):
 
 class Alert(Base):
     __tablename__ = 'alert'
+    __table_args__ = _partitioned_by('trigger_time')
     
     alert_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), nullable=False)
@@ -152,12 +170,15 @@ class Alert(Base):
     alert_type = Column(String(50), nullable=False)
     title = Column(String(100), nullable=False)
     message = Column(Text, nullable=False)
-    trigger_time = Column(DateTime, nullable=False)
+    trigger_time = Column(DateTime, nullable=False, primary_key=DB_PARTITIONING)
     recurrence = Column(String(50))
     priority = Column(String(20), default='medium')
     status = Column(String(20), default='pending')
     source = Column(String(50), default='llm')
     created_at = Column(DateTime, default=func.current_timestamp())
+    # Set by the background service instance that is sending the alert (see claim_alerts)
+    claimed_by = Column(String(100))
+    claim_expires_at = Column(DateTime)
     
     # Relationships
     user = relationship("User", back_populates="alerts")
@@ -185,7 +206,8 @@ class NotificationHistory(Base):
     
     notification_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), nullable=False)
-    alert_id = Column(Integer, ForeignKey('alert.alert_id'))
+    # A partitioned alert table has no unique key on alert_id alone, so there is no foreign key then
+    alert_id = Column(Integer, *([] if DB_PARTITIONING else [ForeignKey('alert.alert_id')]))
     title = Column(String(100), nullable=False)
     message = Column(Text, nullable=False)
     priority = Column(String(20), default='medium')
@@ -194,18 +216,228 @@ class NotificationHistory(Base):
     
     # Relationships
     user = relationship("User")
-    alert = relationship("Alert")
+    alert = relationship("Alert", primaryjoin="foreign(NotificationHistory.alert_id) == Alert.alert_id")
+
+class ExtractionJob(Base):
+    __tablename__ = 'extraction_jobs'
+    
+    job_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), nullable=False)
+    session_id = Column(String(100))
+    job_type = Column(String(50), nullable=False)  # user_info, event, activity, capture
+    user_input = Column(Text, nullable=False)
+    status = Column(String(20), default='queued')  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    result = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime, default=func.current_timestamp())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    not_before = Column(DateTime)  # retry backoff: a failed job is not claimed again before this time
+    
+    # Relationships
+    user = relationship("User")
+
+class ActivityTypeSynonym(Base):
+    __tablename__ = 'activity_type_synonyms'
+    
+    # Per-user map from an activity name/tag to its canonical activity type (term = canonical_type for the type itself)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), primary_key=True)
+    term = Column(String(100), primary_key=True)
+    canonical_type = Column(String(100), nullable=False)
+    similarity = Column(Float)  # cosine similarity to canonical_type when the term was mapped
+    embedding = Column(Vector(1536))
+    created_at = Column(DateTime, default=func.current_timestamp())
+    
+    # Relationships
+    user = relationship("User")
+
+class RecommendationFingerprint(Base):
+    __tablename__ = 'recommendation_fingerprints'
+    
+    # Inputs of a user's last recommendation generation; unchanged inputs skip the next one
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of analyses, upcoming events and time bucket
+    generated_at = Column(DateTime, default=func.current_timestamp())
+    recommendation_count = Column(Integer, default=0)
+    
+    # Relationships
+    user = relationship("User")
+
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+    
+    job_name = Column(String(100), primary_key=True)
+    last_started_at = Column(DateTime)
+    last_finished_at = Column(DateTime)
+    last_status = Column(String(20))  # running, success, failed
+    last_error = Column(Text)
+    last_duration_ms = Column(Integer)
+    run_count = Column(Integer, default=0)
 
 # Create indexes for performance
 Index('idx_users_username', User.user_name)
 Index('idx_users_email', User.email)
 Index('idx_chat_sessions_user_id', ChatSession.user_id)
-Index('idx_chat_messages_session_id', ChatMessage.session_id)
+Index('idx_chat_messages_session_created', ChatMessage.session_id, ChatMessage.created_at)
 Index('idx_activities_user_id', Activity.user_id)
-Index('idx_events_user_id', Event.user_id)
+Index('idx_activities_pending_user_start', Activity.user_id, Activity.start_at.desc().nullslast(), postgresql_where=(Activity.status == 'pending'))
+Index('idx_event_user_start', Event.user_id, Event.start_time)
 Index('idx_events_start_time', Event.start_time)
 Index('idx_alerts_user_id', Alert.user_id)
 Index('idx_alerts_trigger_time', Alert.trigger_time)
 Index('idx_alerts_status', Alert.status)
+# Hot alert paths only ever look at pending alerts, which stay a small fraction of the table
+Index('idx_alert_pending_user_trigger', Alert.user_id, Alert.trigger_time, postgresql_where=(Alert.status == 'pending'))
+Index('idx_alert_pending_trigger', Alert.trigger_time, postgresql_where=(Alert.status == 'pending'))
+# At most one pending alert per user, type and title (conflict target of create_system_alerts); a unique index
+# on a partitioned table must include the partition key, so partitioned alerts keep a plain lookup index
+Index('idx_alert_pending_dedup' if DB_PARTITIONING else 'uq_alert_pending_dedup', Alert.user_id, Alert.alert_type, Alert.title,
+      unique=not DB_PARTITIONING, postgresql_where=(Alert.status == 'pending'))
 Index('idx_fcm_tokens_user_id', FCMToken.user_id)
-Index('idx_fcm_tokens_active', FCMToken.is_active)
\ No newline at end of file
+Index('idx_fcm_tokens_active', FCMToken.is_active)
+Index('idx_fcm_tokens_user_active', FCMToken.user_id, postgresql_where=(FCMToken.is_active == True))
+Index('idx_extraction_jobs_status', ExtractionJob.status, ExtractionJob.job_id)
+Index('idx_extraction_jobs_user_status', ExtractionJob.user_id, ExtractionJob.status)
+
+# Indexes for the hot queries; create_all() only creates indexes together with new tables
+HOT_QUERY_INDEXES = [
+    # get_due_alerts(user): user_id + pending + trigger_time range
+    "CREATE INDEX IF NOT EXISTS idx_alert_pending_user_trigger ON alert(user_id, trigger_time) WHERE status = 'pending'",
+    # Scheduler load, all-user due alerts, expiry of missed alerts: pending + trigger_time range
+    "CREATE INDEX IF NOT EXISTS idx_alert_pending_trigger ON alert(trigger_time) WHERE status = 'pending'",
+    # alert_exists / create_system_alerts: one pending alert per user + type + title. Duplicates left by the old
+    # check-then-insert path are cancelled (oldest kept) before the unique index replaces the plain one
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('alert')) THEN
+            CREATE INDEX IF NOT EXISTS idx_alert_pending_dedup ON alert(user_id, alert_type, title) WHERE status = 'pending';
+        ELSIF to_regclass('uq_alert_pending_dedup') IS NULL THEN
+            UPDATE alert a SET status = 'cancelled'
+            FROM alert b
+            WHERE a.status = 'pending' AND b.status = 'pending' AND a.user_id = b.user_id
+              AND a.alert_type = b.alert_type AND a.title = b.title AND a.alert_id > b.alert_id;
+            CREATE UNIQUE INDEX uq_alert_pending_dedup ON alert(user_id, alert_type, title) WHERE status = 'pending';
+            DROP INDEX IF EXISTS idx_alert_pending_dedup;
+        END IF;
+    END $$;
+    """,
+    # get_chat_history / get_recent_messages: one session, ordered by time
+    "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages(session_id, created_at)",
+    # get_pending_activities: user + pending, newest first
+    "CREATE INDEX IF NOT EXISTS idx_activities_pending_user_start ON activities(user_id, start_at DESC NULLS LAST) WHERE status = 'pending'",
+    # get_upcoming_events: user + start_time range
+    "CREATE INDEX IF NOT EXISTS idx_event_user_start ON event(user_id, start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_fcm_tokens_user_active ON fcm_tokens(user_id) WHERE is_active",
+    # Prefixes of the composites above: dropping them saves a write per insert
+    "DROP INDEX IF EXISTS idx_chat_messages_session_id",
+    "DROP INDEX IF EXISTS idx_event_user_id",
+    "DROP INDEX IF EXISTS idx_events_user_id",
+]
+
+# Idempotent DDL that create_all() cannot express (triggers, functions); run once per process by DatabaseManager
+SCHEMA_UPGRADES = HOT_QUERY_INDEXES + [
+    # Alert claim lease, so several background service instances never send the same alert
+    "ALTER TABLE alert ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(100)",
+    "ALTER TABLE alert ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMP",
+    # Terminal status of alerts whose user has no registered device when they are due
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conrelid = to_regclass('alert') AND conname = 'alert_status_check'
+              AND pg_get_constraintdef(oid) LIKE '%skipped_no_device%'
+        ) THEN
+            ALTER TABLE alert DROP CONSTRAINT IF EXISTS alert_status_check;
+            ALTER TABLE alert ADD CONSTRAINT alert_status_check
+                CHECK (status IN ('pending', 'sent', 'failed', 'cancelled', 'skipped_no_device'));
+        END IF;
+    END $$;
+    """,
+    # Retry backoff of failed extraction jobs
+    "ALTER TABLE extraction_jobs ADD COLUMN IF NOT EXISTS not_before TIMESTAMP",
+    # Incremental activity analysis
+    "ALTER TABLE activities_analysis ADD COLUMN IF NOT EXISTS occurrence_count INTEGER DEFAULT 0",
+    "ALTER TABLE activities_analysis ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP",
+    "ALTER TABLE activities_analysis ADD COLUMN IF NOT EXISTS aggregates JSONB",
+    "ALTER TABLE activities_analysis ADD COLUMN IF NOT EXISTS narrative_baseline JSONB",
+    # Alert changes are published on the alert_changes channel for the alert scheduler
+    """
+    CREATE OR REPLACE FUNCTION notify_alert_change() RETURNS trigger AS $$
+    DECLARE
+        changed RECORD;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+        PERFORM pg_notify('alert_changes', json_build_object(
+            'op', TG_OP,
+            'alert_id', changed.alert_id,
+            'status', changed.status,
+            'trigger_time', changed.trigger_time
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'alert_change_notify') THEN
+            CREATE TRIGGER alert_change_notify
+            AFTER INSERT OR UPDATE OF status, trigger_time OR DELETE ON alert
+            FOR EACH ROW EXECUTE FUNCTION notify_alert_change();
+        END IF;
+    END;
+    $$;
+    """,
+    # Token changes invalidate the token directory cache of the affected user in every process
+    """
+    CREATE OR REPLACE FUNCTION notify_fcm_token_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('fcm_token_changes', OLD.user_id::text);
+        ELSE
+            PERFORM pg_notify('fcm_token_changes', NEW.user_id::text);
+            IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+                PERFORM pg_notify('fcm_token_changes', OLD.user_id::text);
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'fcm_token_change_notify') THEN
+            CREATE TRIGGER fcm_token_change_notify
+            AFTER INSERT OR UPDATE OF user_id, token, is_active OR DELETE ON fcm_tokens
+            FOR EACH ROW EXECUTE FUNCTION notify_fcm_token_change();
+        END IF;
+    END;
+    $$;
+    """,
+]
+
+if EVENT_EXCLUSION_CONSTRAINT:
+    # Skipped (with a warning) while overlapping events exist; events without a valid end_time last one hour
+    SCHEMA_UPGRADES += [
+        "CREATE EXTENSION IF NOT EXISTS btree_gist",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'event_no_overlap') THEN
+                ALTER TABLE event ADD CONSTRAINT event_no_overlap EXCLUDE USING gist (
+                    user_id WITH =,
+                    tsrange(start_time, CASE WHEN end_time > start_time THEN end_time ELSE start_time + INTERVAL '1 hour' END) WITH &&
+                );
+            END IF;
+        END;
+        $$;
+        """,
+    ]
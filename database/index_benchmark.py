@@ -0,0 +1,187 @@
+"""Benchmark of the hot-query indexes (HOT_QUERY_INDEXES in database/alchemy_models.py).
+
+Builds a scratch schema with realistic row counts, then runs every hot query with only the old
+single-column indexes and again after adding its composite/partial index, reporting the median
+execution time, buffers touched, the index used and the index size.
+
+Usage:
+    python -m database.index_benchmark               # ~1M alerts, ~1M messages (a few minutes)
+    python -m database.index_benchmark --scale 0.1   # 10x smaller
+    python -m database.index_benchmark --keep        # keep the index_benchmark schema afterwards
+"""
+import sys
+import os
+import json
+import statistics
+import argparse
+import psycopg2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.base.pg_listener import build_dsn
+
+SCHEMA = "index_benchmark"
+
+# Row counts at --scale 1
+ROWS = {"users": 5000, "alerts": 1_000_000, "sessions": 50_000, "messages": 1_000_000, "activities": 500_000, "events": 300_000}
+
+SETUP_SQL = """
+CREATE TABLE alert (
+    alert_id SERIAL PRIMARY KEY, user_id UUID NOT NULL, alert_type VARCHAR(50) NOT NULL, title VARCHAR(100) NOT NULL,
+    message TEXT NOT NULL, trigger_time TIMESTAMP NOT NULL, priority VARCHAR(20) NOT NULL, status VARCHAR(20) NOT NULL,
+    created_at TIMESTAMP NOT NULL
+);
+CREATE TABLE chat_messages (
+    message_id SERIAL PRIMARY KEY, session_id VARCHAR(100) NOT NULL, content TEXT, role VARCHAR(50), created_at TIMESTAMP
+);
+CREATE TABLE activities (
+    id SERIAL PRIMARY KEY, user_id UUID NOT NULL, name VARCHAR(100) NOT NULL, start_at TIMESTAMP, status VARCHAR(20)
+);
+CREATE TABLE event (
+    event_id SERIAL PRIMARY KEY, user_id UUID NOT NULL, event_name VARCHAR(100) NOT NULL, start_time TIMESTAMP
+);
+
+CREATE TEMP TABLE bench_users AS
+SELECT md5(i::text)::uuid AS user_id, i FROM generate_series(1, %(users)s) i;
+
+-- Alerts: spread over the last 180 days and the next 30; only recent/future ones are still pending
+INSERT INTO alert (user_id, alert_type, title, message, trigger_time, priority, status, created_at)
+SELECT u.user_id,
+       (ARRAY['system', 'event', 'activity'])[1 + i %% 3],
+       'Reminder ' || (i %% 200),
+       'Message ' || i,
+       t.trigger_time,
+       (ARRAY['low', 'medium', 'high'])[1 + i %% 3],
+       CASE WHEN t.trigger_time > NOW() THEN 'pending' WHEN i %% 10 = 0 THEN 'failed' ELSE 'sent' END,
+       t.trigger_time - INTERVAL '1 day'
+FROM generate_series(1, %(alerts)s) i
+JOIN bench_users u ON u.i = 1 + i %% %(users)s
+CROSS JOIN LATERAL (SELECT NOW() - INTERVAL '180 days' + (random() * INTERVAL '210 days') AS trigger_time) t;
+
+INSERT INTO chat_messages (session_id, content, role, created_at)
+SELECT 'session-' || (1 + i %% %(sessions)s), 'Message ' || i, (ARRAY['user', 'assistant'])[1 + i %% 2],
+       NOW() - (random() * INTERVAL '180 days')
+FROM generate_series(1, %(messages)s) i;
+
+INSERT INTO activities (user_id, name, start_at, status)
+SELECT u.user_id, 'Activity ' || (i %% 50), NOW() - (random() * INTERVAL '365 days'),
+       CASE WHEN i %% 20 = 0 THEN 'pending' ELSE 'analyzed' END
+FROM generate_series(1, %(activities)s) i
+JOIN bench_users u ON u.i = 1 + i %% %(users)s;
+
+INSERT INTO event (user_id, event_name, start_time)
+SELECT u.user_id, 'Event ' || i, NOW() - INTERVAL '300 days' + (random() * INTERVAL '365 days')
+FROM generate_series(1, %(events)s) i
+JOIN bench_users u ON u.i = 1 + i %% %(users)s;
+
+-- Indexes that existed before the hot-query indexes
+CREATE INDEX idx_alert_user_id ON alert(user_id);
+CREATE INDEX idx_alert_trigger_time ON alert(trigger_time);
+CREATE INDEX idx_alert_status ON alert(status);
+CREATE INDEX idx_chat_messages_session_id ON chat_messages(session_id);
+CREATE INDEX idx_chat_messages_created_at ON chat_messages(created_at);
+CREATE INDEX idx_activities_user_id ON activities(user_id);
+CREATE INDEX idx_activities_status ON activities(status);
+CREATE INDEX idx_activities_start_at ON activities(start_at);
+CREATE INDEX idx_event_user_id ON event(user_id);
+CREATE INDEX idx_event_start_time ON event(start_time);
+ANALYZE;
+"""
+
+USER_ID = "(SELECT md5('42')::uuid)"
+
+# name -> (index DDL, query)
+CASES = {
+    "get_due_alerts (one user)": (
+        "CREATE INDEX idx_alert_pending_user_trigger ON alert(user_id, trigger_time) WHERE status = 'pending'",
+        f"SELECT * FROM alert WHERE user_id = {USER_ID} AND status = 'pending' "
+        "AND trigger_time >= NOW() AND trigger_time <= NOW() + INTERVAL '60 minutes' ORDER BY priority DESC, trigger_time"
+    ),
+    "get_all_due_alerts / scheduler load": (
+        "CREATE INDEX idx_alert_pending_trigger ON alert(trigger_time) WHERE status = 'pending'",
+        "SELECT alert_id, trigger_time FROM alert WHERE status = 'pending' "
+        "AND trigger_time >= NOW() AND trigger_time <= NOW() + INTERVAL '60 minutes'"
+    ),
+    "alert_exists": (
+        "CREATE INDEX idx_alert_pending_dedup ON alert(user_id, alert_type, title) WHERE status = 'pending'",
+        f"SELECT COUNT(*) FROM alert WHERE user_id = {USER_ID} AND title = 'Reminder 42' "
+        "AND alert_type = 'system' AND status = 'pending'"
+    ),
+    "get_chat_history": (
+        "CREATE INDEX idx_chat_messages_session_created ON chat_messages(session_id, created_at)",
+        "SELECT * FROM chat_messages WHERE session_id = 'session-42' ORDER BY created_at ASC LIMIT 100"
+    ),
+    "get_recent_messages": (
+        "CREATE INDEX idx_chat_messages_session_created ON chat_messages(session_id, created_at)",
+        "SELECT role, content FROM chat_messages WHERE session_id = 'session-42' "
+        "ORDER BY created_at DESC, message_id DESC LIMIT 12"
+    ),
+    "get_pending_activities": (
+        "CREATE INDEX idx_activities_pending_user_start ON activities(user_id, start_at DESC NULLS LAST) WHERE status = 'pending'",
+        f"SELECT * FROM activities WHERE user_id = {USER_ID} AND status = 'pending' ORDER BY start_at DESC NULLS LAST"
+    ),
+    "get_upcoming_events": (
+        "CREATE INDEX idx_event_user_start ON event(user_id, start_time)",
+        f"SELECT * FROM event WHERE user_id = {USER_ID} AND start_time >= NOW() "
+        "AND start_time <= NOW() + INTERVAL '1 day' ORDER BY start_time"
+    ),
+}
+
+
+def used_indexes(plan: dict) -> set:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= used_indexes(child)
+    return names
+
+def measure(cur, query: str, runs: int) -> dict:
+    """Median execution time over runs (after one warm-up) with buffers and indexes of the last plan"""
+    times, result = [], None
+    for _ in range(runs + 1):
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+        result = cur.fetchone()[0][0]
+        times.append(result["Execution Time"])
+    plan = result["Plan"]
+    return {
+        "ms": statistics.median(times[1:]),
+        "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "indexes": ", ".join(sorted(used_indexes(plan))) or plan["Node Type"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the row counts")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark schema")
+    args = parser.parse_args()
+
+    rows = {name: max(int(count * args.scale), 1) for name, count in ROWS.items()}
+    conn = psycopg2.connect(build_dsn())
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        print(f"🏗️ Building {SCHEMA} with {json.dumps(rows)}...")
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+        cur.execute(SETUP_SQL, rows)
+
+        print(f"\n{'query':38} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'buffers':>15}  index used (after) / size")
+        for name, (index_ddl, query) in CASES.items():
+            index_name = index_ddl.split()[2]
+            cur.execute(f"DROP INDEX IF EXISTS {index_name}")
+            before = measure(cur, query, args.runs)
+            cur.execute(index_ddl)
+            cur.execute(f"ANALYZE; SELECT pg_size_pretty(pg_relation_size('{index_name}'))")
+            size = cur.fetchone()[0]
+            after = measure(cur, query, args.runs)
+            speedup = before["ms"] / after["ms"] if after["ms"] else float("inf")
+            print(f"{name:38} {before['ms']:10.3f} {after['ms']:10.3f} {speedup:7.1f}x "
+                  f"{before['buffers']:>7}->{after['buffers']:<7}  {after['indexes']} / {size}")
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -72,6 +72,10 @@ CREATE TABLE IF NOT EXISTS activities_analysis (
     frequency_per_month INTEGER DEFAULT 0,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     description TEXT DEFAULT 'No description provided',
+    occurrence_count INTEGER DEFAULT 0,
+    last_seen TIMESTAMP,
+    aggregates JSONB,
+    narrative_baseline JSONB,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
@@ -120,9 +124,11 @@ CREATE TABLE IF NOT EXISTS alert (
     trigger_time TIMESTAMP NOT NULL,
     recurrence VARCHAR(50),
     priority VARCHAR(20) NOT NULL DEFAULT 'medium',
-    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed', 'cancelled')),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed', 'cancelled', 'skipped_no_device')),
     source VARCHAR(50) NOT NULL DEFAULT 'llm',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    claimed_by VARCHAR(100),
+    claim_expires_at TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (activity_analysis_id) REFERENCES activities_analysis(id) ON DELETE SET NULL,
     FOREIGN KEY (event_id) REFERENCES event(event_id) ON DELETE SET NULL
@@ -169,6 +175,56 @@ CREATE TABLE IF NOT EXISTS user_sessions (
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
+-- Create extraction_jobs table (async capture queue)
+CREATE TABLE IF NOT EXISTS extraction_jobs (
+    job_id SERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    session_id VARCHAR(100),
+    job_type VARCHAR(50) NOT NULL CHECK (job_type IN ('user_info', 'event', 'activity', 'capture')),
+    user_input TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    not_before TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+-- Create activity_type_synonyms table (activity names/tags -> canonical activity type, per user)
+CREATE TABLE IF NOT EXISTS activity_type_synonyms (
+    user_id UUID NOT NULL,
+    term VARCHAR(100) NOT NULL,
+    canonical_type VARCHAR(100) NOT NULL,
+    similarity FLOAT,
+    embedding vector(1536),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, term),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+-- Create recommendation_fingerprints table (inputs of each user's last recommendation generation)
+CREATE TABLE IF NOT EXISTS recommendation_fingerprints (
+    user_id UUID PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    recommendation_count INTEGER DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+-- Create job_runs table (last run of each periodic background job)
+CREATE TABLE IF NOT EXISTS job_runs (
+    job_name VARCHAR(100) PRIMARY KEY,
+    last_started_at TIMESTAMP,
+    last_finished_at TIMESTAMP,
+    last_status VARCHAR(20) CHECK (last_status IN ('running', 'success', 'failed')),
+    last_error TEXT,
+    last_duration_ms INTEGER,
+    run_count INTEGER NOT NULL DEFAULT 0
+);
+
 -- Create views for multi-user support
 CREATE OR REPLACE VIEW pending_alerts_view AS
 SELECT a.alert_id, a.user_id, a.title, a.message, a.priority, a.trigger_time 
@@ -224,6 +280,51 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Publish alert changes on the alert_changes channel (consumed by the alert scheduler)
+CREATE OR REPLACE FUNCTION notify_alert_change() RETURNS trigger AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    PERFORM pg_notify('alert_changes', json_build_object(
+        'op', TG_OP,
+        'alert_id', changed.alert_id,
+        'status', changed.status,
+        'trigger_time', changed.trigger_time
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS alert_change_notify ON alert;
+CREATE TRIGGER alert_change_notify
+AFTER INSERT OR UPDATE OF status, trigger_time OR DELETE ON alert
+FOR EACH ROW EXECUTE FUNCTION notify_alert_change();
+
+-- Publish the user_id of changed FCM tokens (invalidates the token directory cache)
+CREATE OR REPLACE FUNCTION notify_fcm_token_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('fcm_token_changes', OLD.user_id::text);
+    ELSE
+        PERFORM pg_notify('fcm_token_changes', NEW.user_id::text);
+        IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+            PERFORM pg_notify('fcm_token_changes', OLD.user_id::text);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS fcm_token_change_notify ON fcm_tokens;
+CREATE TRIGGER fcm_token_change_notify
+AFTER INSERT OR UPDATE OF user_id, token, is_active OR DELETE ON fcm_tokens
+FOR EACH ROW EXECUTE FUNCTION notify_fcm_token_change();
+
 -- Function to get user by ID or create default user
 CREATE OR REPLACE FUNCTION get_or_create_default_user()
 RETURNS UUID AS $$
@@ -254,19 +355,26 @@ CREATE INDEX IF NOT EXISTS idx_users_is_active ON users(is_active);
 
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_id ON chat_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_start_time ON chat_sessions(start_time);
-CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON chat_messages(session_id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages(session_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at);
 CREATE INDEX IF NOT EXISTS idx_chat_summaries_session_id ON chat_summaries(session_id);
 
 CREATE INDEX IF NOT EXISTS idx_activities_user_id ON activities(user_id);
 CREATE INDEX IF NOT EXISTS idx_activities_start_at ON activities(start_at);
 CREATE INDEX IF NOT EXISTS idx_activities_status ON activities(status);
+CREATE INDEX IF NOT EXISTS idx_activities_pending_user_start ON activities(user_id, start_at DESC NULLS LAST) WHERE status = 'pending';
 CREATE INDEX IF NOT EXISTS idx_activities_tags ON activities USING GIN (tags);
 
 CREATE INDEX IF NOT EXISTS idx_activities_analysis_user_id ON activities_analysis(user_id);
 CREATE INDEX IF NOT EXISTS idx_activities_analysis_activity_type ON activities_analysis(activity_type);
 
-CREATE INDEX IF NOT EXISTS idx_event_user_id ON event(user_id);
+CREATE INDEX IF NOT EXISTS idx_event_user_start ON event(user_id, start_time);
+-- Optional (EVENT_EXCLUSION_CONSTRAINT=true): reject a user's overlapping events
+-- CREATE EXTENSION IF NOT EXISTS btree_gist;
+-- ALTER TABLE event ADD CONSTRAINT event_no_overlap EXCLUDE USING gist (
+--     user_id WITH =,
+--     tsrange(start_time, CASE WHEN end_time > start_time THEN end_time ELSE start_time + INTERVAL '1 hour' END) WITH &&
+-- );
 CREATE INDEX IF NOT EXISTS idx_event_start_time ON event(start_time);
 
 CREATE INDEX IF NOT EXISTS idx_recommendation_user_id ON recommendation(user_id);
@@ -275,12 +383,20 @@ CREATE INDEX IF NOT EXISTS idx_recommendation_session_id ON recommendation(sessi
 CREATE INDEX IF NOT EXISTS idx_alert_user_id ON alert(user_id);
 CREATE INDEX IF NOT EXISTS idx_alert_trigger_time ON alert(trigger_time);
 CREATE INDEX IF NOT EXISTS idx_alert_status ON alert(status);
+CREATE INDEX IF NOT EXISTS idx_alert_pending_user_trigger ON alert(user_id, trigger_time) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_alert_pending_trigger ON alert(trigger_time) WHERE status = 'pending';
+-- One pending alert per user, type and title: conflict target of the bulk alert insert
+CREATE UNIQUE INDEX IF NOT EXISTS uq_alert_pending_dedup ON alert(user_id, alert_type, title) WHERE status = 'pending';
 
 CREATE INDEX IF NOT EXISTS idx_notification_history_user_id ON notification_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_notification_history_alert_id ON notification_history(alert_id);
 
 CREATE INDEX IF NOT EXISTS idx_fcm_tokens_user_id ON fcm_tokens(user_id);
 CREATE INDEX IF NOT EXISTS idx_fcm_tokens_is_active ON fcm_tokens(is_active);
+CREATE INDEX IF NOT EXISTS idx_fcm_tokens_user_active ON fcm_tokens(user_id) WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_extraction_jobs_status ON extraction_jobs(status, job_id);
+CREATE INDEX IF NOT EXISTS idx_extraction_jobs_user_status ON extraction_jobs(user_id, status);
 
 CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id ON user_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions(expires_at);
@@ -0,0 +1,241 @@
+"""Native range partitioning of chat_messages and alert (enabled with DB_PARTITIONING=true).
+
+Tables are split into monthly partitions named <table>_pYYYYMM plus a <table>_default catch-all.
+Future partitions are created ahead of time (PARTITION_MONTHS_AHEAD), retention drops whole
+partitions, and queries that filter on the partition column only touch the matching months.
+
+Converting existing, unpartitioned tables is an explicit offline step:
+    DB_PARTITIONING=true python -m database.partitioning migrate
+"""
+import sys
+import os
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.alchemy_models import Base, DB_PARTITIONING, SCHEMA_UPGRADES
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+
+# table -> (partition column, id column)
+PARTITIONED_TABLES: Dict[str, Tuple[str, str]] = {
+    "chat_messages": ("created_at", "message_id"),
+    "alert": ("trigger_time", "alert_id"),
+}
+
+# Foreign keys of the partitioned tables (CREATE TABLE ... LIKE does not copy them)
+PARTITIONED_TABLE_FOREIGN_KEYS = {
+    "chat_messages": [
+        "FOREIGN KEY (session_id) REFERENCES chat_sessions(session_id) ON DELETE CASCADE",
+    ],
+    "alert": [
+        "FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE",
+        "FOREIGN KEY (activity_analysis_id) REFERENCES activities_analysis(id) ON DELETE SET NULL",
+        "FOREIGN KEY (event_id) REFERENCES event(event_id) ON DELETE SET NULL",
+    ],
+}
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def add_months(value: datetime, months: int) -> datetime:
+    month = value.month - 1 + months
+    return datetime(value.year + month // 12, month % 12 + 1, 1)
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month.year}{month.month:02d}"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND pg_table_is_visible(c.oid)
+    """), {"table": table}).first() is not None
+
+def list_partitions(conn, table: str) -> List[str]:
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :table AND pg_table_is_visible(p.oid)
+        ORDER BY c.relname
+    """), {"table": table}).fetchall()
+    return [row[0] for row in rows]
+
+
+def create_month_partition(conn, table: str, month: datetime) -> bool:
+    """Create the partition of one month; rows of that month already in the default partition are moved into it"""
+    column, _ = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    if name in list_partitions(conn, table):
+        return False
+
+    bounds = {"lower": month, "upper": add_months(month, 1)}
+    default = f"{table}_default"
+    in_default = conn.execute(text(
+        f"SELECT 1 FROM {default} WHERE {column} >= :lower AND {column} < :upper LIMIT 1"
+    ), bounds).first() is not None
+
+    if not in_default:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+        ))
+    else:
+        # Attaching a range the default partition already holds rows for fails, so move those rows first
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {column} >= :lower AND {column} < :upper RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), bounds)
+        conn.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+        ))
+    logger.info(f"🧩 Created partition {name}")
+    return True
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = PARTITION_MONTHS_AHEAD) -> Dict[str, List[str]]:
+    """Create the default partition and every monthly partition from this month to months_ahead (idempotent)"""
+    created: Dict[str, List[str]] = {}
+    for table in PARTITIONED_TABLES:
+        created[table] = []
+        try:
+            with engine.begin() as conn:
+                if not is_partitioned(conn, table):
+                    logger.warning(f"⚠️ {table} is not partitioned; run: python -m database.partitioning migrate")
+                    continue
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+            current = month_start(datetime.now())
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                # One transaction per partition, so a failure does not undo the others
+                with engine.begin() as conn:
+                    if create_month_partition(conn, table, month):
+                        created[table].append(partition_name(table, month))
+        except Exception as e:
+            logger.error(f"❌ Error creating partitions of {table}: {e}")
+    return created
+
+
+def drop_partitions_before(engine: Engine, table: str, cutoff: datetime,
+                           archive: Optional[Callable[[str], None]] = None, expired: Optional[str] = None) -> List[str]:
+    """Detach and drop the monthly partitions of table that end at or before cutoff.
+
+    expired is an optional SQL predicate (may use :cutoff) that every row must match for its partition to be
+    dropped; partitions still holding other rows are kept for the row-by-row retention pass.
+    archive(partition_name) is called before each drop and can copy the partition's rows elsewhere.
+    """
+    dropped = []
+    with engine.connect() as conn:
+        if not is_partitioned(conn, table):
+            return dropped
+        partitions = list_partitions(conn, table)
+
+    def holds_kept_rows(conn, name: str) -> bool:
+        if not expired:
+            return False
+        return conn.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {name} WHERE NOT COALESCE(({expired}), false))"
+        ), {"cutoff": cutoff}).scalar()
+
+    for name in partitions:
+        suffix = name[len(table) + 2:]
+        if not name.startswith(f"{table}_p") or len(suffix) != 6 or not suffix.isdigit():
+            continue
+        upper = add_months(datetime(int(suffix[:4]), int(suffix[4:]), 1), 1)
+        if upper > cutoff:
+            continue
+        with engine.connect() as conn:
+            if holds_kept_rows(conn, name):
+                continue
+        if archive:
+            archive(name)
+        with engine.begin() as conn:
+            # Checked again under the lock, as rows may have changed since the first check (a partition kept here
+            # was archived already; its rows are archived again when the chunked pass deletes them)
+            conn.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+            if holds_kept_rows(conn, name):
+                continue
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+        logger.info(f"🗑️ Dropped partition {name}")
+    return dropped
+
+
+def migrate_table(engine: Engine, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD) -> bool:
+    """Convert an existing table into a partitioned one in a single transaction (locks the table while copying)"""
+    column, id_column = PARTITIONED_TABLES[table]
+    legacy = f"{table}_unpartitioned"
+    with engine.begin() as conn:
+        if is_partitioned(conn, table):
+            logger.info(f"✅ {table} is already partitioned")
+            return False
+
+        conn.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+        # Views keep pointing at the renamed table unless they are redefined against the new one
+        views = conn.execute(text("""
+            SELECT DISTINCT v.relname, pg_get_viewdef(v.oid)
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.refobjid = CAST(:table AS regclass) AND v.relname <> :table
+        """), {"table": table}).fetchall()
+        oldest = conn.execute(text(f"SELECT MIN({column}) FROM {table}")).scalar()
+
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey"))
+        conn.execute(text(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ({column})"
+        ))
+        conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({id_column}, {column})"))
+        for foreign_key in PARTITIONED_TABLE_FOREIGN_KEYS.get(table, []):
+            conn.execute(text(f"ALTER TABLE {table} ADD {foreign_key}"))
+        conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+        month = month_start(oldest or datetime.now())
+        last = add_months(month_start(datetime.now()), months_ahead)
+        while month <= last:
+            create_month_partition(conn, table, month)
+            month = add_months(month, 1)
+
+        conn.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {table}_{id_column}_seq OWNED BY {table}.{id_column}"))
+        for view_name, definition in views:
+            conn.execute(text(f"CREATE OR REPLACE VIEW {view_name} AS {definition}"))
+        if table == "alert":
+            conn.execute(text("ALTER TABLE notification_history DROP CONSTRAINT IF EXISTS notification_history_alert_id_fkey"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+
+        # Indexes and triggers were dropped with the old table; recreate them on the partitioned one
+        for index in Base.metadata.tables[table].indexes:
+            index.create(bind=conn, checkfirst=True)
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
+
+    logger.info(f"✅ Migrated {table} to monthly partitions")
+    return True
+
+
+if __name__ == "__main__":
+    from core.base.alchemy_storage import DatabaseManager
+
+    if not DB_PARTITIONING:
+        print("⚠️ Set DB_PARTITIONING=true so the application uses the partitioned schema")
+        sys.exit(1)
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    engine = DatabaseManager().engine
+    if command == "migrate":
+        for table in PARTITIONED_TABLES:
+            migrate_table(engine, table)
+    print(f"🧩 Partitions created: {ensure_partitions(engine)}")
@@ -10,6 +10,7 @@ from typing import Optional, List
 from agent.extract_user_info.agent import save_user_information
 from agent.extract_event.agent import save_event_extraction_agent
 from agent.recommendation.activity_extractor import extract_and_store_activities
+from agent.unified_extraction.agent import capture_information as unified_capture_information
 import json
 
 load_dotenv()
@@ -137,6 +138,26 @@ async def add_activity(user_input: str) -> str:
     except Exception as e:
         return f"Error creating activity: {str(e)}"
 
+@mcp.tool()
+async def capture_information(user_input: str) -> str:
+    """
+    Extract user information, events and activities from one message in a single LLM call.
+    
+    Args:
+        user_input (str): The complete user message.
+        
+    Returns:
+        str: Summary of what was saved or an error message.
+    """
+    try:
+        result = unified_capture_information(user_input)
+        if result:
+            return result
+        else:
+            return "Failed to capture information."
+    except Exception as e:
+        return f"Error capturing information: {str(e)}"
+
 @mcp.tool()
 async def test_mcp_server() -> str:
     """
@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agent.bg_running.fake_fcm_server import start_fake_fcm_server
+from agent.bg_running.notification_client import NotificationClient
+
+
+def _make_client():
+    server, base_url = start_fake_fcm_server()
+    return server, NotificationClient(base_url=base_url, project_id="test-project", pool_size=4)
+
+def test_send_success():
+    """A valid token is delivered and counted"""
+    server, client = _make_client()
+    try:
+        result = client.send(NotificationClient.build_message("device-1", "Meeting", "Starts in 10 minutes", {"alert_id": 7}))
+        assert result["success"]
+        assert result["message_id"].startswith("projects/test-project/messages/")
+        assert server.received[0]["data"] == {"alert_id": "7"}
+
+        metrics = client.get_metrics()
+        assert metrics["sent"] == 1 and metrics["failed"] == 0
+        assert metrics["latency_ms"]["p50"] is not None
+    finally:
+        server.shutdown()
+
+def test_error_classification():
+    """Dead tokens are final, transient errors are retryable"""
+    server, client = _make_client()
+    try:
+        unregistered = client.send(NotificationClient.build_message("unregistered-1", "t", "b"))
+        assert not unregistered["success"] and unregistered["code"] == "UNREGISTERED"
+        assert unregistered["token_invalid"] and not unregistered["retryable"]
+
+        invalid = client.send(NotificationClient.build_message("invalid-1", "t", "b"))
+        assert invalid["code"] == "INVALID_ARGUMENT" and not invalid["retryable"]
+
+        flaky = client.send(NotificationClient.build_message("flaky-1", "t", "b"))
+        assert flaky["code"] == "UNAVAILABLE" and flaky["retryable"]
+        assert client.send(NotificationClient.build_message("flaky-1", "t", "b"))["success"]
+
+        assert client.get_metrics()["errors"] == {"UNREGISTERED": 1, "INVALID_ARGUMENT": 1, "UNAVAILABLE": 1}
+    finally:
+        server.shutdown()
+
+def test_send_each_reuses_one_session():
+    """Concurrent sends keep input order and share the pooled session"""
+    server, client = _make_client()
+    try:
+        tokens = [f"device-{i}" for i in range(20)] + ["unregistered-x"]
+        results = client.send_each([NotificationClient.build_message(token, "t", "b") for token in tokens])
+        assert [r["success"] for r in results] == [True] * 20 + [False]
+
+        session = client.session
+        client.send(NotificationClient.build_message("device-21", "t", "b"))
+        assert client.session is session
+        assert len(server.received) == 22
+    finally:
+        server.shutdown()
+
+def test_network_error_is_retryable():
+    """An unreachable endpoint is reported, not raised"""
+    client = NotificationClient(base_url="http://127.0.0.1:9", project_id="test-project", timeout=1)
+    result = client.send(NotificationClient.build_message("device-1", "t", "b"))
+    assert not result["success"] and result["code"] == "NETWORK_ERROR" and result["retryable"]
+
+
+if __name__ == "__main__":
+    test_send_success()
+    test_error_classification()
+    test_send_each_reuses_one_session()
+    test_network_error_is_retryable()
+    print("✅ Notification client tests passed")
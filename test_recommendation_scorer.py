@@ -0,0 +1,43 @@
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agent.recommendation.recommendation_scorer import RecommendationScorer
+
+
+NOW = datetime(2026, 10, 19, 20, 0)
+CANDIDATES = [
+    {"title": "Go for an evening run", "content": "", "recommendation_type": "activity", "score": 8},
+    {"title": "Read a book tonight", "content": "", "recommendation_type": "wellness", "score": 7},
+]
+
+def _history(title, status, recommendation_type="wellness", count=1):
+    shown_at = NOW - timedelta(days=30)
+    return [{"title": title, "status": status, "recommendation_type": recommendation_type, "shown_at": shown_at}
+            for _ in range(count)]
+
+def _titles(ranked):
+    return [candidate["title"] for candidate in ranked]
+
+def test_rejected_title_is_suppressed():
+    """A candidate repeating a rejected recommendation is dropped, the others are kept"""
+    scorer = RecommendationScorer(top_k=3)
+    history = _history("Go for an evening run", "rejected", "activity")
+    assert _titles(scorer.rank(CANDIDATES, [], [], history, NOW)) == ["Read a book tonight"]
+
+def test_feedback_changes_ranking():
+    """Accepting similar recommendations moves a candidate ahead of one the LLM scored higher"""
+    scorer = RecommendationScorer(top_k=3)
+    assert _titles(scorer.rank(CANDIDATES, [], [], [], NOW)) == ["Go for an evening run", "Read a book tonight"]
+
+    history = _history("Read a book before bed", "accepted", count=5)
+    assert _titles(scorer.rank(CANDIDATES, [], [], history, NOW)) == ["Read a book tonight", "Go for an evening run"]
+
+def test_rejections_lower_the_feedback_score():
+    """Rejecting similar (but not repeated) recommendations lowers the feedback feature"""
+    scorer = RecommendationScorer(top_k=3)
+    feedback_column = list(scorer.weights).index("feedback")
+    neutral = scorer.score(CANDIDATES, [], [], [], NOW)[1, feedback_column]
+    rejected = scorer.score(CANDIDATES, [], [], _history("Read a book before bed", "rejected", count=5), NOW)[1, feedback_column]
+    assert rejected < neutral
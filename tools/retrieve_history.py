@@ -1,6 +1,8 @@
 import streamlit as st
 from dotenv import load_dotenv
+from typing import List, Tuple
 from core.base.alchemy_storage import DatabaseManager
+from core.utils.prompt_assembler import CHAT_HISTORY_TOOL_TOKENS, CHAT_RECENT_MESSAGES, truncate_to_tokens
 
 
 db = DatabaseManager()
@@ -13,10 +15,30 @@ def retrieval_tool(session_id: str) -> str:
             # print(f"Retrieved chat history for session {session_id}: {history}")
             # print("=" * 100)
             formatted_history = "".join(f"{msg}" for msg in history)
-            return formatted_history
+            # Keep the most recent part so the tool result stays within budget
+            return truncate_to_tokens(formatted_history, CHAT_HISTORY_TOOL_TOKENS)
         else:
             return f"No chat history found for session {session_id}."
     else:
         print("No session ID provided.")
-    
-    return "No chat history available."
\ No newline at end of file
+
+    return "No chat history available."
+
+def get_recent_context(session_id: str, current_input: str = "", limit: int = CHAT_RECENT_MESSAGES) -> Tuple[List[dict], str]:
+    """Get (recent messages, rolling summary) of a session for the chatbot prompt"""
+    if not session_id:
+        return [], ""
+
+    # One extra message because the current user turn is already saved before the graph runs
+    history = db.get_recent_messages(session_id, limit + 1)
+    if history and history[-1]['role'] == 'user' and history[-1]['content'] == current_input:
+        history = history[:-1]
+    history = history[-limit:]
+
+    # Summary rows also hold raw copies of the newest messages; skip what is already in history
+    recent_contents = {message['content'] for message in history}
+    summary = "\n".join(
+        entry for entry in db.get_session_summary(session_id)
+        if entry and entry not in recent_contents and entry != current_input
+    )
+    return history, summary